@@ -0,0 +1,100 @@
+"""
+Measures how many concurrent requests one process sustains through
+library_app.aio_repository.
+
+Usage: python benchmarks/bench_async.py [--books N] [--requests N]
+           [--concurrency 1,10,100,1000] [--backend sqlite|config] [--cache]
+
+Each concurrency level keeps that many coroutines in flight, each issuing a
+Zipf-skewed mix of lookups (books by author, borrowers of a book, a page of
+available books). Reports throughput, latency percentiles and the peak
+number of threads, which stays bounded by the pool capacity however many
+requests are in flight.
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import time
+
+from common import repository, scratch_database, summarize
+
+from library_app import aio_repository
+from library_app.datagen import ZipfSampler, generate_catalog
+
+
+async def run_level(concurrency, requests, books, authors, rng):
+    book = ZipfSampler(books, 1.0, rng)
+    author = ZipfSampler(authors, 1.1, rng)
+    calls = [
+        lambda: aio_repository.search_books_by_author(author()),
+        lambda: aio_repository.get_patrons_with_book(book()),
+        lambda: aio_repository.get_available_books_page(rng.randrange(books), 20),
+    ]
+    latencies = []
+    peak_threads = threading.active_count()
+    remaining = requests
+
+    async def client():
+        nonlocal remaining, peak_threads
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            await rng.choice(calls)()
+            latencies.append(time.perf_counter() - start)
+            peak_threads = max(peak_threads, threading.active_count())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    stats = summarize(latencies, time.perf_counter() - start)
+    stats["peak_threads"] = peak_threads
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", default="1,10,100,1000")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backend", choices=["sqlite", "config"], default="sqlite")
+    parser.add_argument("--cache", action="store_true", help="leave the query cache on")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    with scratch_database(args.backend) as backend:
+        conn = backend.connect()
+        try:
+            print(f"Generating {args.books} books...")
+            written = generate_catalog(conn, args.books, seed=args.seed)
+        finally:
+            conn.close()
+
+        repository.query_cache.enabled = args.cache
+        rng = random.Random(args.seed)
+        print(
+            f"{'in flight':>10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'threads':>9}"
+        )
+        try:
+            for concurrency in levels:
+                stats = asyncio.run(
+                    run_level(
+                        concurrency,
+                        args.requests,
+                        written["Book"],
+                        written["Author"],
+                        rng,
+                    )
+                )
+                print(
+                    f"{concurrency:>10}{stats['throughput']:>10.0f}"
+                    f"{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+                    f"{stats['peak_threads']:>9}"
+                )
+        finally:
+            aio_repository.shutdown()
+
+
+if __name__ == "__main__":
+    main()
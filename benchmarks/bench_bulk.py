@@ -0,0 +1,86 @@
+"""
+Compares returning books one at a time against return_books_bulk().
+
+Usage: python benchmarks/bench_bulk.py [--books N]
+
+Inserts N scratch books checked out to patron 1, times both return paths,
+then deletes the scratch rows again.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+from library_app import repository  # noqa: E402
+
+TITLE_PREFIX = "bench-bulk-"
+
+
+def insert_books(count):
+    conn = repository.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT INTO Book (book_title, publish_year, times_checked_out, is_checked, author_id) VALUES (%s, 2000, 0, 0, 1)",  # noqa: E501
+            [(f"{TITLE_PREFIX}{i}",) for i in range(count)],
+        )
+        conn.commit()
+        cursor.execute(
+            "SELECT book_id FROM Book WHERE book_title LIKE %s", (f"{TITLE_PREFIX}%",)
+        )
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def delete_books(book_ids):
+    conn = repository.get_connection()
+    try:
+        cursor = conn.cursor()
+        rows = [(book_id,) for book_id in book_ids]
+        cursor.executemany("DELETE FROM OpenLoan WHERE book_id = %s", rows)
+        cursor.executemany(
+            "DELETE FROM TransactionRecord WHERE transaction_id IN (SELECT transaction_id FROM Transaction WHERE book_id = %s)",  # noqa: E501
+            rows,
+        )
+        cursor.executemany("DELETE FROM Transaction WHERE book_id = %s", rows)
+        cursor.executemany("DELETE FROM Book WHERE book_id = %s", rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--books", type=int, default=10000)
+    args = parser.parse_args()
+
+    book_ids = insert_books(args.books)
+    items = [(1, book_id) for book_id in book_ids]
+    try:
+        repository.check_out_books_bulk(items)
+        start = time.perf_counter()
+        for patron_id, book_id in items:
+            repository.return_book_transaction(patron_id, book_id)
+        single = time.perf_counter() - start
+
+        repository.check_out_books_bulk(items)
+        start = time.perf_counter()
+        results = repository.return_books_bulk(items)
+        bulk = time.perf_counter() - start
+        failed = sum(1 for r in results if r["status"] != "success")
+    finally:
+        delete_books(book_ids)
+        repository.close_pool()
+
+    print(f"returns:       {len(items)}")
+    print(f"one at a time: {single:8.3f}s ({len(items) / single:10.1f}/s)")
+    print(f"bulk:          {bulk:8.3f}s ({len(items) / bulk:10.1f}/s)")
+    print(f"speedup:       {single / bulk:8.2f}x")
+    print(f"failed:        {failed}")
+
+
+if __name__ == "__main__":
+    main()
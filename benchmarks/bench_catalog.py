@@ -0,0 +1,105 @@
+"""
+Compares the catalog snapshot with the tuple lists the repository returns.
+
+Usage: python benchmarks/bench_catalog.py [--books N] [--lookups N] [--changes N]
+
+A throwaway SQLite catalog of --books books is generated. The memory held by
+today's lists (get_available_books, get_borrowed_books, get_authors and
+get_patrons) is measured with tracemalloc against a loaded CatalogSnapshot,
+and both are scaled to a million books. Then an availability check is timed
+as a scan of the available list and as a snapshot lookup, and a refresh
+after --changes checkouts is timed against a full load.
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from common import repository, scratch_database
+
+from library_app.catalog import CatalogSnapshot
+from library_app.datagen import generate_catalog
+
+
+def allocated(build):
+    """Returns (result, bytes still allocated once build() returns)."""
+    tracemalloc.start()
+    try:
+        result = build()
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def tuple_lists():
+    return [
+        repository.get_available_books(),
+        repository.get_borrowed_books(),
+        repository.get_authors(),
+        repository.get_patrons(),
+    ]
+
+
+def loaded_snapshot():
+    snapshot = CatalogSnapshot()
+    snapshot.load()
+    return snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--books", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--changes", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with scratch_database("sqlite") as backend:
+        conn = backend.connect()
+        try:
+            generate_catalog(conn, args.books, seed=args.seed)
+        finally:
+            conn.close()
+        repository.query_cache.enabled = False
+
+        lists, lists_bytes = allocated(tuple_lists)
+        snapshot, snapshot_bytes = allocated(loaded_snapshot)
+        books = len(lists[0]) + len(lists[1])
+        print(f"{'storage':<14}{'MB':>10}{'MB per 1M books':>17}")
+        for name, size in (("tuple lists", lists_bytes), ("snapshot", snapshot_bytes)):
+            print(f"{name:<14}{size / 1e6:>10.1f}{size / books:>17.1f}")
+        print(f"snapshot.memory_bytes(): {snapshot.memory_bytes() / 1e6:.1f} MB")
+
+        ids = [rng.randint(1, books) for _ in range(args.lookups)]
+        available = lists[0]
+        start = time.perf_counter()
+        for book_id in ids:
+            book_id in [book[0] for book in available]
+        scan = (time.perf_counter() - start) / len(ids)
+        start = time.perf_counter()
+        for book_id in ids:
+            snapshot.is_available(book_id)
+        lookup = (time.perf_counter() - start) / len(ids)
+        print(
+            f"\nAvailability check: list scan {scan * 1e6:.1f}us, "
+            f"snapshot {lookup * 1e6:.3f}us"
+        )
+
+        for _ in range(args.changes):
+            repository.check_out_book_transaction(1, rng.randint(1, books))
+        start = time.perf_counter()
+        rows = snapshot.refresh()
+        refresh = time.perf_counter() - start
+        start = time.perf_counter()
+        snapshot.load()
+        load = time.perf_counter() - start
+        print(
+            f"Refresh after {args.changes} checkouts: {refresh * 1000:.1f}ms "
+            f"({rows} rows re-read); full load {load * 1000:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Measures what repository instrumentation costs per call.
+
+Usage: python benchmarks/bench_metrics.py [--calls N] [--backend sqlite|config]
+
+Each call is timed three ways: bypassing the instrumentation decorator,
+through it with DB_METRICS_ENABLED off, and with it on. A cached read shows
+the fixed cost per call; an uncached read adds the per-statement cost.
+"""
+
+import argparse
+import time
+from unittest.mock import patch
+
+from common import config, repository, scratch_database
+
+from library_app import metrics
+
+
+def mean_us(func, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--backend", choices=["sqlite", "config"], default="sqlite")
+    args = parser.parse_args()
+
+    workloads = [
+        ("cached get_authors", repository.get_authors, True),
+        (
+            "uncached get_patrons_with_book",
+            lambda: repository.get_patrons_with_book(1),
+            False,
+        ),
+    ]
+    uninstrumented = {
+        "cached get_authors": repository.get_authors.__wrapped__,
+        "uncached get_patrons_with_book": lambda: (
+            repository.get_patrons_with_book.__wrapped__(1)
+        ),
+    }
+
+    print(f"{'call':<32}{'bare us':>10}{'off us':>10}{'on us':>10}{'on cost':>10}")
+    with scratch_database(args.backend):
+        for name, func, cached in workloads:
+            with patch.object(repository.query_cache, "enabled", cached):
+                func()
+                bare = mean_us(uninstrumented[name], args.calls)
+                with patch.object(config, "DB_METRICS_ENABLED", False):
+                    off = mean_us(func, args.calls)
+                with patch.object(config, "DB_METRICS_ENABLED", True):
+                    on = mean_us(func, args.calls)
+                metrics.reset()
+            print(f"{name:<32}{bare:>10.2f}{off:>10.2f}{on:>10.2f}{on - bare:>+10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Compares repository calls per second with and without the connection pool.
+
+Usage: python benchmarks/bench_pool.py [--calls N] [--threads N]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+from library_app import repository  # noqa: E402
+from library_app.backends import get_backend  # noqa: E402
+
+
+def unpooled_get_authors():
+    conn = get_backend().connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT author_id, author_name FROM Author")
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+def run(func, calls, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for _ in executor.map(lambda _: func(), range(calls)):
+            pass
+    return calls / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    unpooled = run(unpooled_get_authors, args.calls, args.threads)
+    pooled = run(repository.get_authors, args.calls, args.threads)
+    repository.close_pool()
+
+    print(f"unpooled: {unpooled:10.1f} calls/s")
+    print(f"pooled:   {pooled:10.1f} calls/s")
+    print(f"speedup:  {pooled / unpooled:10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Benchmarks every repository function against a synthetic catalog.
+
+Usage: python benchmarks/bench_repository.py [--books N] [--iterations N]
+           [--backend sqlite|config] [--output results.json] [--compare old.json]
+
+By default a throwaway SQLite database is generated with library_app.datagen,
+so no database server is needed. --backend config benchmarks the database
+configured in the environment instead (generated rows are appended to it).
+Results are printed as latency percentiles and throughput and can be saved
+as JSON; --compare prints the change against an earlier run.
+"""
+
+import argparse
+import json
+import platform
+import random
+import time
+from datetime import datetime, timezone
+
+from common import repository, scratch_database, summarize
+
+from library_app.datagen import (
+    TITLE_ADJECTIVES,
+    TITLE_NOUNS,
+    ZipfSampler,
+    generate_catalog,
+)
+
+
+def _consume(stream):
+    return sum(1 for _ in stream)
+
+
+def build_cases(books, authors, patrons, iterations, rng):
+    """Returns (name, function, args iterable factory) for each benchmark."""
+    book = ZipfSampler(books, 1.0, rng)
+    author = ZipfSampler(authors, 1.1, rng)
+    patron = ZipfSampler(patrons, 0.8, rng)
+    full = max(3, iterations // 50)
+    checked_out = []
+    bulk_checked_out = []
+
+    def repeat(count, make_args):
+        return lambda: (make_args() for _ in range(count))
+
+    def check_out(patron_id, book_id):
+        result = repository.check_out_book_transaction(patron_id, book_id)
+        if result["status"] == "success":
+            checked_out.append((patron_id, book_id))
+        return result
+
+    def check_out_bulk(items):
+        results = repository.check_out_books_bulk(items)
+        bulk_checked_out.append(
+            [item for item, r in zip(items, results) if r["status"] == "success"]
+        )
+        return results
+
+    def search_terms():
+        # A full word and a prefix, e.g. "silent riv"
+        return (f"{rng.choice(TITLE_ADJECTIVES)} {rng.choice(TITLE_NOUNS)[:3]}",)
+
+    return [
+        ("get_authors", repository.get_authors, repeat(full, tuple)),
+        ("get_patrons", repository.get_patrons, repeat(full, tuple)),
+        ("get_available_books", repository.get_available_books, repeat(full, tuple)),
+        ("get_borrowed_books", repository.get_borrowed_books, repeat(full, tuple)),
+        (
+            "iter_available_books",
+            lambda: _consume(repository.iter_available_books()),
+            repeat(full, tuple),
+        ),
+        (
+            "iter_borrowed_books",
+            lambda: _consume(repository.iter_borrowed_books()),
+            repeat(full, tuple),
+        ),
+        (
+            "iter_authors",
+            lambda: _consume(repository.iter_authors()),
+            repeat(full, tuple),
+        ),
+        (
+            "iter_patrons",
+            lambda: _consume(repository.iter_patrons()),
+            repeat(full, tuple),
+        ),
+        (
+            "get_authors_page",
+            repository.get_authors_page,
+            repeat(iterations, lambda: (rng.randrange(authors), 20)),
+        ),
+        (
+            "get_patrons_page",
+            repository.get_patrons_page,
+            repeat(iterations, lambda: (rng.randrange(patrons), 20)),
+        ),
+        (
+            "get_available_books_page",
+            repository.get_available_books_page,
+            repeat(iterations, lambda: (rng.randrange(books), 20)),
+        ),
+        (
+            "get_borrowed_books_page",
+            repository.get_borrowed_books_page,
+            repeat(iterations, lambda: (rng.randrange(books), 20)),
+        ),
+        (
+            "search_books_by_author",
+            repository.search_books_by_author,
+            repeat(iterations, lambda: (author(),)),
+        ),
+        ("search_books", repository.search_books, repeat(iterations, search_terms)),
+        (
+            "get_patrons_with_book",
+            repository.get_patrons_with_book,
+            repeat(iterations, lambda: (book(),)),
+        ),
+        (
+            "check_out_book_transaction",
+            check_out,
+            repeat(iterations, lambda: (patron(), book())),
+        ),
+        (
+            "return_book_transaction",
+            repository.return_book_transaction,
+            lambda: checked_out,
+        ),
+        (
+            "check_out_books_bulk",
+            check_out_bulk,
+            repeat(
+                max(1, iterations // 20),
+                lambda: ([(patron(), book()) for _ in range(100)],),
+            ),
+        ),
+        (
+            "return_books_bulk",
+            repository.return_books_bulk,
+            lambda: ((items,) for items in bulk_checked_out),
+        ),
+    ]
+
+
+def run_case(func, args_iterable):
+    latencies = []
+    start = time.perf_counter()
+    for args in args_iterable:
+        call_start = time.perf_counter()
+        func(*args)
+        latencies.append(time.perf_counter() - call_start)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def print_results(results, baseline=None):
+    header = f"{'function':<28}{'calls':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>12}"
+    if baseline:
+        header += f"{'p99 chg':>10}{'ops/s chg':>11}"
+    print(header)
+    for name, stats in results.items():
+        line = (
+            f"{name:<28}{stats['calls']:>7}{stats['p50_ms']:>10.3f}"
+            f"{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}{stats['throughput']:>12.1f}"
+        )
+        old = (baseline or {}).get(name)
+        if old and old["p99_ms"] and old["throughput"]:
+            line += f"{_change(stats['p99_ms'], old['p99_ms']):>10}"
+            line += f"{_change(stats['throughput'], old['throughput']):>11}"
+        print(line)
+
+
+def _change(new, old):
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backend", choices=["sqlite", "config"], default="sqlite")
+    parser.add_argument("--cache", action="store_true", help="leave the query cache on")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="compare against an earlier JSON run")
+    args = parser.parse_args()
+
+    with scratch_database(args.backend) as backend:
+        conn = backend.connect()
+        try:
+            print(f"Generating {args.books} books...")
+            start = time.perf_counter()
+            generate_catalog(conn, args.books, seed=args.seed)
+            cursor = conn.cursor()
+            sizes = {}
+            for table, column in [
+                ("Book", "book_id"),
+                ("Author", "author_id"),
+                ("Patron", "patron_id"),
+            ]:
+                cursor.execute(f"SELECT MAX({column}) FROM {table}")
+                sizes[table] = cursor.fetchone()[0]
+            print(f"Generated in {time.perf_counter() - start:.1f}s")
+        finally:
+            conn.close()
+
+        repository.query_cache.enabled = args.cache
+        rng = random.Random(args.seed)
+        cases = build_cases(
+            sizes["Book"], sizes["Author"], sizes["Patron"], args.iterations, rng
+        )
+        results = {}
+        for name, func, make_args in cases:
+            results[name] = run_case(func, make_args())
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+
+    if args.output:
+        report = {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "backend": backend.name,
+                "books": args.books,
+                "iterations": args.iterations,
+                "seed": args.seed,
+                "cache": args.cache,
+                "python": platform.python_version(),
+            },
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
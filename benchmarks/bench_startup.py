@@ -0,0 +1,124 @@
+"""
+Measures how long main.py takes to start, and fails over a budget.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--budget-ms MS] [--top N]
+
+Each command is run --runs times in a fresh interpreter against a seeded
+SQLite database; the median wall time beyond a bare `python -c pass` is
+checked against --budget-ms. The slowest imports of `main.py --help`, from
+`python -X importtime`, are listed, and importing the database driver or
+python-dotenv there counts as a failure: both belong to the first query.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from common import config, scratch_database
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+MAIN = os.path.join(ROOT, "src", "library_app", "main.py")
+COMMANDS = [
+    ("python -c pass", ["-c", "pass"]),
+    ("main.py --help", [MAIN, "--help"]),
+    ("main.py list-available --limit 5", [MAIN, "list-available", "--limit", "5"]),
+    ("main.py search pride", [MAIN, "search", "pride"]),
+]
+# Modules main.py --help must not import
+DEFERRED = ("mysql", "dotenv")
+
+
+def run_ms(argv, env, runs):
+    """Median wall time of `python argv` in milliseconds."""
+    subprocess.run([sys.executable, *argv], env=env, stdout=subprocess.DEVNULL)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *argv], env=env, stdout=subprocess.DEVNULL, check=True
+        )
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def import_times(argv, env):
+    """Returns {module: (self us, cumulative us)} from python -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *argv],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line.split(":", 1)[1].split("|")
+        modules[name.strip()] = (int(own), int(cumulative))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=100.0,
+        help="allowed median time beyond bare interpreter startup",
+    )
+    parser.add_argument("--top", type=int, default=10, help="slowest imports listed")
+    args = parser.parse_args()
+
+    failed = False
+    with scratch_database("sqlite"):
+        env = dict(
+            os.environ,
+            PYTHONPATH=os.path.join(ROOT, "src"),
+            DB_BACKEND="sqlite",
+            SQLITE_PATH=config.SQLITE_PATH,
+        )
+        # Time imports from cached bytecode, as an installed package has it;
+        # the first run of each command writes the .pyc files
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+        print(f"{'command':<36}{'median ms':>10}{'startup ms':>12}")
+        baseline = None
+        for name, argv in COMMANDS:
+            ms = run_ms(argv, env, args.runs)
+            if baseline is None:
+                baseline = ms
+                print(f"{name:<36}{ms:>10.1f}")
+                continue
+            cost = ms - baseline
+            over = cost > args.budget_ms
+            failed |= over
+            flag = "  over budget" if over else ""
+            print(f"{name:<36}{ms:>10.1f}{cost:>12.1f}{flag}")
+
+        modules = import_times([MAIN, "--help"], env)
+
+    print("\nSlowest imports of main.py --help (self ms, cumulative ms):")
+    slowest = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)
+    for module, (own, cumulative) in slowest[: args.top]:
+        print(f"  {module:<34}{own / 1000:>8.1f}{cumulative / 1000:>8.1f}")
+
+    eager = sorted(
+        module
+        for module in modules
+        if any(module == name or module.startswith(name + ".") for name in DEFERRED)
+    )
+    if eager:
+        failed = True
+        print(f"\nImported at startup, expected on first query: {', '.join(eager)}")
+
+    print(f"\nBudget: {args.budget_ms:.0f}ms beyond interpreter startup")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Measures what preparing statements once per connection saves on the hottest
+repository queries.
+
+Usage: python benchmarks/bench_statements.py [--books N] [--calls N]
+           [--backend sqlite|config]
+
+Each query is timed with DB_PREPARED_STATEMENTS off (parsed on every call)
+and on (parsed once per connection), with the query cache disabled so every
+call reaches the database. Prepare and execute counts are printed for the
+prepared run.
+"""
+
+import argparse
+import random
+import time
+from unittest.mock import patch
+
+from common import config, repository, scratch_database, summarize
+
+from library_app import statements
+from library_app.datagen import ZipfSampler, generate_catalog
+
+
+def hot_queries(books, authors, rng):
+    book = ZipfSampler(books, 1.0, rng)
+    author = ZipfSampler(authors, 1.1, rng)
+    # (name, statement it runs, callable, argument factory)
+    return [
+        (
+            "search_books_by_author",
+            "books_by_author",
+            repository.search_books_by_author,
+            author,
+        ),
+        (
+            "get_patrons_with_book",
+            "patrons_with_book",
+            repository.get_patrons_with_book,
+            book,
+        ),
+        (
+            "get_available_books_page",
+            "available_books_page",
+            lambda after_id: repository.get_available_books_page(after_id, 20),
+            lambda: rng.randrange(books),
+        ),
+        (
+            "search_books",
+            "search_books",
+            repository.search_books,
+            lambda: "silent riv",
+        ),
+    ]
+
+
+def time_calls(func, make_arg, calls):
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(calls):
+        arg = make_arg()
+        call_start = time.perf_counter()
+        func(arg)
+        latencies.append(time.perf_counter() - call_start)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backend", choices=["sqlite", "config"], default="sqlite")
+    args = parser.parse_args()
+
+    with scratch_database(args.backend) as backend:
+        conn = backend.connect()
+        try:
+            print(f"Generating {args.books} books...")
+            written = generate_catalog(conn, args.books, seed=args.seed)
+        finally:
+            conn.close()
+        repository.query_cache.enabled = False
+
+        results = {}
+        for prepared in (False, True):
+            # New connections pick up the setting (SQLite sizes its cache on connect)
+            repository.close_pool()
+            statements.reset_stats()
+            rng = random.Random(args.seed)
+            with patch.object(config, "DB_PREPARED_STATEMENTS", prepared):
+                for name, _, func, make_arg in hot_queries(
+                    written["Book"], written["Author"], rng
+                ):
+                    results[name, prepared] = time_calls(func, make_arg, args.calls)
+        counts = statements.stats()
+        repository.close_pool()
+
+    print(
+        f"{'query':<26}{'plain us':>10}{'prepared us':>13}{'saved':>8}"
+        f"{'prepares':>10}{'executes':>10}"
+    )
+    for name, statement, _, _ in hot_queries(1, 1, random.Random()):
+        plain = results[name, False]["mean_ms"] * 1000
+        prepared = results[name, True]["mean_ms"] * 1000
+        count = counts.get(statement, {"prepares": 0, "executes": 0})
+        print(
+            f"{name:<26}{plain:>10.1f}{prepared:>13.1f}"
+            f"{(plain - prepared) / plain * 100:>7.1f}%"
+            f"{count['prepares']:>10}{count['executes']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Times the typeahead index behind find_patrons() and find_authors().
+
+Usage: python benchmarks/bench_typeahead.py [--names N] [--lookups N]
+
+A NameIndex of --names generated person names is built in memory, then
+--lookups prefixes of one to six characters (cut from random names, at
+their first or last word) are looked up with the CLI's page size. Reports
+the build time, the index's entries, lookup latency percentiles against the
+one millisecond budget for a keystroke, and the time to rename one entry.
+"""
+
+import argparse
+import random
+import time
+
+from common import percentile
+
+from library_app.datagen import _person_name
+from library_app.typeahead import NameIndex
+
+BUDGET_MS = 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--names", type=int, default=1000000)
+    parser.add_argument("--lookups", type=int, default=10000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    names = [_person_name(rng) for _ in range(args.names)]
+    start = time.perf_counter()
+    index = NameIndex(enumerate(names, 1))
+    build = time.perf_counter() - start
+    print(
+        f"Built {len(index)} names ({len(index._entries)} entries) " f"in {build:.1f}s"
+    )
+
+    prefixes = []
+    for _ in range(args.lookups):
+        word = rng.choice(rng.choice(names).split())
+        prefixes.append(word[: rng.randint(1, 6)])
+    latencies = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        index.find(prefix, args.limit)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    p50, p99 = (percentile(latencies, pct) * 1000 for pct in (50, 99))
+    verdict = "within" if p99 <= BUDGET_MS else "over"
+    print(
+        f"Lookup: p50 {p50:.3f}ms, p99 {p99:.3f}ms, "
+        f"max {latencies[-1] * 1000:.3f}ms ({verdict} the {BUDGET_MS}ms budget)"
+    )
+
+    start = time.perf_counter()
+    for key in range(1, 101):
+        index.set(key, _person_name(rng))
+    print(f"Rename: {(time.perf_counter() - start) * 10:.3f}ms per name")
+
+
+if __name__ == "__main__":
+    main()
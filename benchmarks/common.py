@@ -0,0 +1,73 @@
+"""Helpers shared by the benchmark scripts."""
+
+import io
+import os
+import sys
+import tempfile
+from contextlib import contextmanager, redirect_stdout
+from unittest.mock import patch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+from library_app import config, repository  # noqa: E402
+from library_app.backends import get_backend  # noqa: E402
+from library_app.migrations import migrate  # noqa: E402
+from library_app.schema import populate  # noqa: E402
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(
+        0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1)
+    )
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed):
+    """Latency percentiles in milliseconds and throughput in calls per second."""
+    ordered = sorted(latencies)
+    calls = len(ordered)
+    return {
+        "calls": calls,
+        "mean_ms": sum(ordered) / calls * 1000 if calls else 0.0,
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p95_ms": percentile(ordered, 95) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+        "max_ms": (ordered[-1] if ordered else 0.0) * 1000,
+        "throughput": calls / elapsed if elapsed else 0.0,
+    }
+
+
+@contextmanager
+def scratch_database(backend="sqlite"):
+    """
+    Points the repository at a database for the duration of a benchmark.
+
+    For "sqlite" a throwaway database file is created, migrated and seeded,
+    so no outside service is needed. Any other value uses the database
+    configured in the environment as-is.
+    """
+    if backend != "sqlite":
+        yield get_backend()
+        repository.close_pool()
+        return
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "bench.db")
+        with patch.object(config, "DB_BACKEND", "sqlite"), patch.object(
+            config, "SQLITE_PATH", path
+        ):
+            repository.close_pool()
+            backend = get_backend()
+            conn = backend.connect()
+            try:
+                migrate(conn, backend)
+                with redirect_stdout(io.StringIO()):
+                    populate(conn)
+            finally:
+                conn.close()
+            try:
+                yield backend
+            finally:
+                repository.close_pool()
@@ -0,0 +1,139 @@
+"""
+Load-tests the HTTP API and reports requests/sec and latency for checkout
+and search.
+
+Usage: python benchmarks/load_test_server.py [--url http://host:port]
+           [--clients N] [--duration SECONDS] [--books N] [--workers N]
+
+Without --url a server is started in-process on a throwaway SQLite catalog
+generated with library_app.datagen. Each client holds one keep-alive
+connection and loops: search for a title, check out a Zipf-popular book and
+return it again when the checkout succeeded.
+"""
+
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from urllib.parse import quote, urlsplit
+
+from common import scratch_database, summarize
+
+from library_app.datagen import (
+    TITLE_ADJECTIVES,
+    TITLE_NOUNS,
+    ZipfSampler,
+    generate_catalog,
+)
+from library_app.server import LibraryServer
+
+
+class Client:
+    def __init__(self, host, port):
+        self.conn = http.client.HTTPConnection(host, port, timeout=30)
+        self.latencies = {"search": [], "checkout": [], "return": []}
+        self.statuses = {}
+
+    def call(self, name, method, path, body=None):
+        payload = None if body is None else json.dumps(body)
+        start = time.perf_counter()
+        self.conn.request(method, path, payload)
+        response = self.conn.getresponse()
+        data = json.loads(response.read())
+        self.latencies[name].append(time.perf_counter() - start)
+        key = f"{name} {response.status}"
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+        return response.status, data
+
+
+def run_client(client, deadline, books, patrons, seed):
+    rng = random.Random(seed)
+    book = ZipfSampler(books, 1.0, rng)
+    patron = ZipfSampler(patrons, 0.8, rng)
+    while time.perf_counter() < deadline:
+        query = f"{rng.choice(TITLE_ADJECTIVES)} {rng.choice(TITLE_NOUNS)[:3]}"
+        client.call("search", "GET", f"/books/search?q={quote(query)}")
+        item = {"patron_id": patron(), "book_id": book()}
+        status, _ = client.call("checkout", "POST", "/checkout", item)
+        if status == 200:
+            client.call("return", "POST", "/return", item)
+    client.conn.close()
+
+
+@contextmanager
+def local_server(args):
+    """Starts a server on a generated catalog; yields (host, port, sizes)."""
+    with scratch_database("sqlite") as backend:
+        conn = backend.connect()
+        try:
+            print(f"Generating {args.books} books...")
+            written = generate_catalog(conn, args.books, seed=args.seed)
+        finally:
+            conn.close()
+        server = LibraryServer(("127.0.0.1", 0), workers=args.workers)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            yield "127.0.0.1", server.server_port, written
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="load-test a running server instead")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.url:
+        url = urlsplit(args.url)
+        target = nullcontext((url.hostname, url.port or 80, None))
+    else:
+        target = local_server(args)
+
+    with target as (host, port, written):
+        books = written["Book"] if written else args.books
+        patrons = written["Patron"] if written else max(args.books // 10, 1)
+        clients = [Client(host, port) for _ in range(args.clients)]
+        deadline = time.perf_counter() + args.duration
+        threads = [
+            threading.Thread(
+                target=run_client,
+                args=(client, deadline, books, patrons, args.seed + i),
+            )
+            for i, client in enumerate(clients)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+    total = sum(len(lat) for client in clients for lat in client.latencies.values())
+    print(f"{args.clients} clients, {elapsed:.1f}s, {total / elapsed:.0f} requests/s")
+    print(f"{'endpoint':<10}{'calls':>8}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}")
+    for name in ("search", "checkout", "return"):
+        latencies = [value for client in clients for value in client.latencies[name]]
+        stats = summarize(latencies, elapsed)
+        print(
+            f"{name:<10}{stats['calls']:>8}{stats['throughput']:>9.0f}"
+            f"{stats['p50_ms']:>9.2f}{stats['p99_ms']:>9.2f}"
+        )
+    statuses = {}
+    for client in clients:
+        for key, count in client.statuses.items():
+            statuses[key] = statuses.get(key, 0) + count
+    print("statuses:", ", ".join(f"{k}: {v}" for k, v in sorted(statuses.items())))
+
+
+if __name__ == "__main__":
+    main()
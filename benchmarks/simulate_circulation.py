@@ -0,0 +1,331 @@
+"""
+Simulates opening-hour circulation: many patrons searching, checking out and
+returning books at once through the repository functions.
+
+Usage: python benchmarks/simulate_circulation.py [--patrons N] [--duration SECONDS]
+           [--books N] [--zipf S] [--max-loans N] [--think SECONDS]
+           [--backend sqlite|config] [--cache] [--json] [--output summary.json]
+
+Each simulated patron is a thread acting as one patron of a catalog
+generated with library_app.datagen (a throwaway SQLite file by default, or
+the configured database with --backend config). In a loop it picks a book by
+Zipf popularity, searches for its title and tries to check it out; once it
+holds --max-loans books it returns the one it has had longest.
+
+Reported per operation: calls, throughput, latency percentiles and outcomes.
+A checkout of a book someone else holds is a conflict. Database errors that
+the repository retried (deadlocks, lock timeouts, SQLite busy) are counted
+through a span hook. Invariants are checked while the run is in progress and
+once more at the end:
+
+- no book checked out twice, as seen by the simulated patrons and as more
+  than one unreturned loan per book in the loan history;
+- Book.is_checked set exactly for the books with an OpenLoan row;
+- no OpenLoan row pointing at a loan that has been returned.
+
+The run ends with a JSON summary (on stdout with --json, in --output), and
+exits with status 1 if any invariant was violated.
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timezone
+
+from common import repository, scratch_database, summarize
+
+from library_app import metrics
+from library_app.backends import get_backend
+from library_app.datagen import ZipfSampler, generate_catalog
+
+OPERATIONS = ("search", "checkout", "return")
+
+INVARIANTS = {
+    "double_checkouts": """
+        SELECT COUNT(*) FROM (
+            SELECT Transaction.book_id
+            FROM Transaction
+            JOIN TransactionRecord
+                ON TransactionRecord.transaction_id = Transaction.transaction_id
+            WHERE TransactionRecord.date_return IS NULL
+            GROUP BY Transaction.book_id
+            HAVING COUNT(*) > 1
+        ) doubled
+    """,
+    "is_checked_mismatches": """
+        SELECT COUNT(*)
+        FROM Book
+        LEFT JOIN OpenLoan ON OpenLoan.book_id = Book.book_id
+        WHERE Book.is_checked <> CASE WHEN OpenLoan.book_id IS NULL THEN 0 ELSE 1 END
+    """,
+    "returned_open_loans": """
+        SELECT COUNT(*)
+        FROM OpenLoan
+        JOIN TransactionRecord
+            ON TransactionRecord.transaction_id = OpenLoan.transaction_id
+        WHERE TransactionRecord.date_return IS NOT NULL
+    """,
+}
+
+
+class Simulation:
+    """State shared by the simulated patrons and the invariant checker."""
+
+    def __init__(self, holders):
+        # book_id -> patron_id for every book the database says is out
+        self.holders = holders
+        self.latencies = defaultdict(list)
+        self.outcomes = defaultdict(Counter)
+        self.db_errors = Counter()
+        self.live_double_checkouts = []
+        self.violations = Counter()
+        self.checks = 0
+        self.lock = threading.Lock()
+
+    def record(self, operation, seconds, outcome):
+        with self.lock:
+            self.latencies[operation].append(seconds)
+            self.outcomes[operation][outcome] += 1
+
+    def count_errors(self, span):
+        # Span hook: every database error a repository call hit, retried or not
+        if span.kind == "call" and span.errors:
+            with self.lock:
+                self.db_errors[span.name] += span.errors
+
+    def check_invariants(self, conn):
+        cursor = conn.cursor()
+        found = {}
+        for name, sql in INVARIANTS.items():
+            cursor.execute(sql)
+            found[name] = cursor.fetchone()[0]
+        # Read a fresh snapshot next time
+        conn.commit()
+        with self.lock:
+            self.checks += 1
+            for name, count in found.items():
+                self.violations[name] = max(self.violations[name], count)
+
+
+def _outcome(result):
+    if result["status"] == "success":
+        return "success"
+    if "not available" in result["message"]:
+        return "conflict"
+    if result["message"].startswith("Error executing SQL"):
+        return "failed"
+    return "rejected"
+
+
+def run_patron(sim, patron_id, loans, deadline, args, titles, seed):
+    rng = random.Random(seed)
+    book = ZipfSampler(len(titles), args.zipf, rng)
+    while time.perf_counter() < deadline:
+        book_id = book()
+        query = " ".join(titles[book_id].split()[1:3])
+        start = time.perf_counter()
+        repository.search_books(query)
+        sim.record("search", time.perf_counter() - start, "success")
+
+        start = time.perf_counter()
+        result = repository.check_out_book_transaction(patron_id, book_id)
+        outcome = _outcome(result)
+        sim.record("checkout", time.perf_counter() - start, outcome)
+        if outcome == "success":
+            with sim.lock:
+                if book_id in sim.holders:
+                    sim.live_double_checkouts.append(
+                        (book_id, sim.holders[book_id], patron_id)
+                    )
+                sim.holders[book_id] = patron_id
+            loans.append(book_id)
+
+        if len(loans) > args.max_loans:
+            book_id = loans.popleft()
+            # Released first: once the return commits another patron may
+            # check the book out straight away
+            with sim.lock:
+                sim.holders.pop(book_id, None)
+            start = time.perf_counter()
+            result = repository.return_book_transaction(patron_id, book_id)
+            outcome = _outcome(result)
+            sim.record("return", time.perf_counter() - start, outcome)
+            if outcome != "success":
+                with sim.lock:
+                    sim.holders[book_id] = patron_id
+                loans.appendleft(book_id)
+        if args.think:
+            time.sleep(rng.expovariate(1 / args.think))
+
+
+def run_checker(sim, backend, stop, interval):
+    conn = backend.connect()
+    try:
+        while not stop.wait(interval):
+            sim.check_invariants(conn)
+    finally:
+        conn.close()
+
+
+def build_summary(sim, args, backend_name, elapsed):
+    operations = {}
+    calls = 0
+    for operation in OPERATIONS:
+        stats = summarize(sim.latencies[operation], elapsed)
+        stats["outcomes"] = dict(sim.outcomes[operation])
+        operations[operation] = stats
+        calls += stats["calls"]
+    checkouts = operations["checkout"]["calls"]
+    writes = checkouts + operations["return"]["calls"]
+    failed = sum(sim.outcomes[operation]["failed"] for operation in OPERATIONS)
+    errors = sum(sim.db_errors.values())
+    violations = dict(sim.violations)
+    violations["live_double_checkouts"] = len(sim.live_double_checkouts)
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "backend": backend_name,
+            "books": args.books,
+            "patrons": args.patrons,
+            "duration": args.duration,
+            "zipf": args.zipf,
+            "max_loans": args.max_loans,
+            "think": args.think,
+            "cache": args.cache,
+            "seed": args.seed,
+        },
+        "elapsed": elapsed,
+        "throughput": calls / elapsed if elapsed else 0.0,
+        "operations": operations,
+        "conflict_rate": (
+            sim.outcomes["checkout"]["conflict"] / checkouts if checkouts else 0.0
+        ),
+        "db_errors": dict(sim.db_errors),
+        # Errors on a call that still succeeded were retried
+        "retries": errors - failed,
+        "retry_rate": (errors - failed) / writes if writes else 0.0,
+        "invariant_checks": sim.checks,
+        "violations": violations,
+        "ok": not any(violations.values()),
+    }
+
+
+def print_summary(summary):
+    meta = summary["meta"]
+    print(
+        f"{meta['patrons']} patrons, {summary['elapsed']:.1f}s, "
+        f"{summary['throughput']:.0f} operations/s"
+    )
+    print(f"{'operation':<10}{'calls':>8}{'ops/s':>9}{'p50 ms':>9}{'p99 ms':>9}")
+    for name, stats in summary["operations"].items():
+        print(
+            f"{name:<10}{stats['calls']:>8}{stats['throughput']:>9.0f}"
+            f"{stats['p50_ms']:>9.2f}{stats['p99_ms']:>9.2f}  "
+            + ", ".join(f"{k}: {v}" for k, v in sorted(stats["outcomes"].items()))
+        )
+    print(
+        f"conflict rate {summary['conflict_rate']:.1%}, "
+        f"retry rate {summary['retry_rate']:.1%} ({summary['retries']} retries)"
+    )
+    print(
+        f"invariants checked {summary['invariant_checks']} times: "
+        + ", ".join(f"{k}: {v}" for k, v in summary["violations"].items())
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--patrons", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--zipf", type=float, default=1.0, help="popularity skew")
+    parser.add_argument("--max-loans", type=int, default=3)
+    parser.add_argument("--think", type=float, default=0.0, help="mean pause, s")
+    parser.add_argument("--check-interval", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backend", choices=["sqlite", "config"], default="sqlite")
+    parser.add_argument("--cache", action="store_true", help="leave the query cache on")
+    parser.add_argument("--json", action="store_true", help="print only the summary")
+    parser.add_argument("--output", help="write the summary to this JSON file")
+    args = parser.parse_args()
+    log = sys.stderr if args.json else sys.stdout
+
+    with scratch_database(args.backend) as backend:
+        conn = backend.connect()
+        try:
+            print(f"Generating {args.books} books...", file=log)
+            generate_catalog(conn, args.books, seed=args.seed)
+            cursor = conn.cursor()
+            cursor.execute("SELECT book_id, book_title FROM Book")
+            titles = dict(cursor.fetchall())
+            cursor.execute("SELECT MAX(patron_id) FROM Patron")
+            if cursor.fetchone()[0] < args.patrons:
+                parser.error("--patrons exceeds the patrons in the catalog")
+            cursor.execute("SELECT book_id, patron_id FROM OpenLoan")
+            holders = dict(cursor.fetchall())
+            conn.commit()
+        finally:
+            conn.close()
+        # ZipfSampler draws ids 1..n
+        titles = [None] + [titles[book_id] for book_id in sorted(titles)]
+        repository.query_cache.enabled = args.cache
+
+        sim = Simulation(holders)
+        metrics.add_span_hook(sim.count_errors)
+        stop = threading.Event()
+        checker = threading.Thread(
+            target=run_checker,
+            args=(sim, get_backend(), stop, args.check_interval),
+            daemon=True,
+        )
+        deadline = time.perf_counter() + args.duration
+        threads = [
+            threading.Thread(
+                target=run_patron,
+                args=(
+                    sim,
+                    patron_id,
+                    deque(b for b, p in holders.items() if p == patron_id),
+                    deadline,
+                    args,
+                    titles,
+                    args.seed + patron_id,
+                ),
+            )
+            for patron_id in range(1, args.patrons + 1)
+        ]
+        start = time.perf_counter()
+        checker.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        checker.join()
+        metrics.remove_span_hook(sim.count_errors)
+
+        conn = backend.connect()
+        try:
+            sim.check_invariants(conn)
+        finally:
+            conn.close()
+
+    summary = build_summary(sim, args, backend.name, elapsed)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Summary written to {args.output}", file=log)
+    sys.exit(0 if summary["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Fires concurrent checkouts at a handful of books and verifies that no book is
+ever checked out twice.
+
+Usage: python benchmarks/stress_checkout.py [--attempts N] [--threads N] [--books N]
+
+Each successful checkout is immediately returned, so books cycle between
+patrons for the whole run. Runs against the configured backend; the target
+books must exist and be available.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+from library_app import repository  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--attempts", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--books", type=int, default=5)
+    parser.add_argument("--patrons", type=int, default=3)
+    args = parser.parse_args()
+
+    holders = {}
+    violations = []
+    counts = {"success": 0, "error": 0}
+    lock = threading.Lock()
+
+    def attempt(i):
+        patron_id = i % args.patrons + 1
+        book_id = i % args.books + 1
+        result = repository.check_out_book_transaction(patron_id, book_id)
+        with lock:
+            counts[result["status"]] += 1
+            if result["status"] != "success":
+                return
+            if holders.get(book_id) is not None:
+                violations.append((book_id, holders[book_id], patron_id))
+            holders[book_id] = patron_id
+        # Hold the book briefly so an overlapping checkout would be seen
+        time.sleep(0.001)
+        with lock:
+            holders[book_id] = None
+        repository.return_book_transaction(patron_id, book_id)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        list(executor.map(attempt, range(args.attempts)))
+    elapsed = time.perf_counter() - start
+    repository.close_pool()
+
+    print(f"attempts:           {args.attempts}")
+    print(f"successful:         {counts['success']}")
+    print(f"rejected:           {counts['error']}")
+    print(f"double checkouts:   {len(violations)}")
+    print(f"throughput:         {args.attempts / elapsed:.1f} checkouts/s")
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Moves old loans from the loan history into monthly archive tables.
+
+Usage: python scripts/archive_loans.py [--days N] [--batch-size N] [--pause S]
+
+Loans returned more than --days days ago (LOAN_ARCHIVE_AFTER_DAYS by
+default) move to LoanArchive_YYYYMM tables in short transactions of
+--batch-size loans, pausing --pause seconds between them, so it can run
+alongside circulation. Interrupting it is safe; run it again to continue.
+Run it periodically, e.g. nightly from cron.
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+from library_app.archive import archive_loans  # noqa: E402
+from library_app.backends import get_backend  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--pause", type=float, default=None)
+    args = parser.parse_args()
+
+    before = None
+    if args.days is not None:
+        before = datetime.now() - timedelta(days=args.days)
+    start = time.perf_counter()
+    conn = get_backend().connect()
+    try:
+        loans = archive_loans(
+            conn,
+            before=before,
+            batch_size=args.batch_size,
+            pause=args.pause,
+            progress=lambda loans: print(f"  {loans} loans archived"),
+        )
+    finally:
+        conn.close()
+    print(f"Archived {loans} loans in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Fails if any registry query needs a full table scan or is not checked.
+
+Usage: python scripts/check_query_plans.py [--books N]
+
+With --books, a synthetic catalog of N books (plus authors, patrons and
+loans in proportion, see library_app.datagen) is generated first so the
+optimizer plans against a realistic table size. Run it against a scratch
+database: repository writes are exercised for real.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+from library_app.backends import get_backend  # noqa: E402
+from library_app.datagen import generate_catalog  # noqa: E402
+from library_app.migrations import migrate  # noqa: E402
+from library_app.query_plans import find_full_scans  # noqa: E402
+from library_app.schema import populate  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--books", type=int, default=0)
+    args = parser.parse_args()
+
+    backend = get_backend()
+    backend.create_database()
+    conn = backend.connect()
+    try:
+        migrate(conn, backend)
+        populate(conn)
+        if args.books:
+            print(f"Seeding {args.books} books...")
+            generate_catalog(conn, args.books)
+        problems = find_full_scans(conn)
+    finally:
+        conn.close()
+
+    for problem in problems:
+        if problem["function"] is None:
+            print(
+                f"NOT CHECKED: no call in REPOSITORY_CALLS runs {problem['statement']}"
+            )
+            continue
+        print(f"FULL SCAN of {', '.join(problem['tables'])} in {problem['function']}:")
+        print(f"    {' '.join(problem['sql'].split())}")
+    if problems:
+        sys.exit(1)
+    print("All repository queries use indexes.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Deletes old entries from the CatalogChange log.
+
+Usage: python scripts/compact_catalog_changes.py [--keep N] [--batch-size N]
+
+Triggers log a change for every write to Book, Author and Patron, including
+the availability flag set by every checkout and return, so the log grows
+with circulation. This keeps the newest --keep changes
+(CATALOG_RETAIN_CHANGES by default) and deletes the rest in batches, each in
+its own transaction. Run it periodically, e.g. from cron, next to
+compact_outbox.py. Catalog snapshots and the name typeahead further behind
+than --keep changes reload in full.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+from library_app.backends import get_backend  # noqa: E402
+from library_app.catalog import compact_changes  # noqa: E402
+from library_app.sequences import BATCH_SIZE  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--keep", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    conn = get_backend().connect()
+    try:
+        deleted = compact_changes(
+            conn,
+            keep=args.keep,
+            batch_size=args.batch_size,
+            progress=lambda deleted: print(f"  {deleted} changes deleted"),
+        )
+    finally:
+        conn.close()
+    print(f"Deleted {deleted} changes in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
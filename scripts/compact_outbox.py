@@ -0,0 +1,43 @@
+"""
+Deletes old change events from the outbox.
+
+Usage: python scripts/compact_outbox.py [--keep N] [--batch-size N]
+
+Keeps the newest --keep events (OUTBOX_RETAIN_EVENTS by default) and deletes
+the rest in batches, each in its own transaction, so it can run alongside
+circulation. Run it periodically, e.g. from cron. Subscribers further behind
+than --keep events re-read their state instead of replaying.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+from library_app.backends import get_backend  # noqa: E402
+from library_app.outbox import BATCH_SIZE, compact  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--keep", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    conn = get_backend().connect()
+    try:
+        deleted = compact(
+            conn,
+            keep=args.keep,
+            batch_size=args.batch_size,
+            progress=lambda deleted: print(f"  {deleted} events deleted"),
+        )
+    finally:
+        conn.close()
+    print(f"Deleted {deleted} events in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Awaitable mirror of library_app.repository.
+
+Every function here takes the same arguments and returns the same rows and
+status dictionaries as its namesake in repository.py. Neither database
+driver the repository supports gives it a native asyncio path that shares
+the pool, cache, retries and SQL, so calls run on a bounded thread pool
+sized to the connection pool: each worker thread can always get a
+connection, and callers beyond that wait on the event loop (no thread
+each) until a slot frees up. Cancelling a waiting call costs nothing.
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from . import config, repository
+
+_executor = None
+_executor_lock = threading.Lock()
+# asyncio primitives belong to one event loop, so each loop gets its own gate
+_limits = weakref.WeakKeyDictionary()
+
+
+def _capacity():
+    return config.DB_POOL_SIZE + config.DB_POOL_MAX_OVERFLOW
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_capacity(), thread_name_prefix="aio-repository"
+                )
+    return _executor
+
+
+def _get_limit(loop):
+    limit = _limits.get(loop)
+    if limit is None:
+        limit = _limits[loop] = asyncio.Semaphore(_capacity())
+    return limit
+
+
+async def run(func, *args, **kwargs):
+    """
+    Runs a blocking repository call on the shared worker threads, in a copy
+    of the caller's context: read_from_primary() applies, and a write made
+    by the call sends the caller's later reads to the primary.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    async with _get_limit(loop):
+        try:
+            return await loop.run_in_executor(
+                _get_executor(),
+                functools.partial(context.run, func, *args, **kwargs),
+            )
+        finally:
+            repository.adopt_last_write(context)
+
+
+def shutdown():
+    """Stops the worker threads and closes the connection pool."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+    repository.close_pool()
+
+
+def _mirror(name):
+    # Looked up per call so the mirror follows patches of the sync function
+    @functools.wraps(getattr(repository, name))
+    async def call(*args, **kwargs):
+        return await run(getattr(repository, name), *args, **kwargs)
+
+    return call
+
+
+def _mirror_stream(name):
+    @functools.wraps(getattr(repository, name))
+    async def stream(fetch_size=None):
+        fetch_size = fetch_size or config.DB_FETCH_SIZE
+        rows = getattr(repository, name)(fetch_size)
+        try:
+            while True:
+                # One thread hop per fetch_size rows, not per row
+                batch = await run(_take, rows, fetch_size)
+                for row in batch:
+                    yield row
+                if len(batch) < fetch_size:
+                    return
+        finally:
+            # Closing the generator hands its connection back to the pool
+            await run(rows.close)
+
+    return stream
+
+
+def _take(rows, count):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == count:
+            break
+    return batch
+
+
+get_authors = _mirror("get_authors")
+get_available_books = _mirror("get_available_books")
+get_patrons_with_book = _mirror("get_patrons_with_book")
+get_borrowed_books_for_patron = _mirror("get_borrowed_books_for_patron")
+get_loans_for_patron = _mirror("get_loans_for_patron")
+get_return_context = _mirror("get_return_context")
+get_patrons = _mirror("get_patrons")
+get_borrowed_books = _mirror("get_borrowed_books")
+search_books_by_author = _mirror("search_books_by_author")
+search_books = _mirror("search_books")
+
+get_authors_page = _mirror("get_authors_page")
+get_patrons_page = _mirror("get_patrons_page")
+get_available_books_page = _mirror("get_available_books_page")
+get_borrowed_books_page = _mirror("get_borrowed_books_page")
+
+iter_authors = _mirror_stream("iter_authors")
+iter_patrons = _mirror_stream("iter_patrons")
+iter_available_books = _mirror_stream("iter_available_books")
+iter_borrowed_books = _mirror_stream("iter_borrowed_books")
+
+check_out_book_transaction = _mirror("check_out_book_transaction")
+return_book_transaction = _mirror("return_book_transaction")
+check_out_books_bulk = _mirror("check_out_books_bulk")
+return_books_bulk = _mirror("return_books_bulk")
@@ -0,0 +1,188 @@
+"""
+Archival of the loan history into monthly tables.
+
+Transaction and TransactionRecord get a row for every loan ever made.
+archive_loans() moves loans returned more than LOAN_ARCHIVE_AFTER_DAYS ago
+into LoanArchive_YYYYMM, one table per month of return listed in
+LoanArchivePartition, so the hot tables hold only open loans and recent
+returns however many years of history are kept. Returned loans with no
+return date, from before returns were dated (migration 0005), go to
+LoanArchive_legacy with their dates left NULL.
+
+Loans move in batches of LOAN_ARCHIVE_BATCH_SIZE, each copied and deleted in
+one short transaction that locks only its own rows, with a pause between
+batches. Every batch is moved whole or not at all, so an interrupted run
+loses nothing and the next run carries on from the loans still left. Run one
+archiver at a time.
+
+get_patron_history() reads a patron's loans from the hot tables and the
+archives alike. PatronArchiveMonth lists the months that hold each patron's
+archived loans, so only those archives are read.
+"""
+
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from . import config, statements
+from .backends import get_backend
+from .metrics import instrumented
+from .repository import connection, page_size, read_query
+
+# The archive "month" of returned loans that have no return date
+LEGACY_MONTH = 0
+
+
+def archive_table(month):
+    """Returns the name of the archive table for a YYYYMM month."""
+    if month == LEGACY_MONTH:
+        return "LoanArchive_legacy"
+    return f"LoanArchive_{month}"
+
+
+def month_of(value):
+    """
+    Returns the YYYYMM month of a DATETIME column value, or LEGACY_MONTH for
+    a NULL one.
+    """
+    if value is None:
+        return LEGACY_MONTH
+    if isinstance(value, str):
+        # SQLite returns "YYYY-MM-DD HH:MM:SS"
+        return int(value[:4] + value[5:7])
+    return value.year * 100 + value.month
+
+
+def archive_months(conn):
+    """Returns the months that have an archive table, newest first."""
+    return [row[0] for row in statements.execute(conn, "archive_months").fetchall()]
+
+
+def _create_archive(conn, backend, month):
+    # DDL commits implicitly on MySQL, so it runs outside the batch
+    table = archive_table(month)
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            transaction_id INT PRIMARY KEY,
+            librarian_id INT,
+            book_id INT,
+            patron_id INT,
+            date_issue DATETIME,
+            date_return DATETIME
+        )
+    """)
+    backend.create_index(
+        cursor, f"idx_{table.lower()}_patron", table, ("patron_id", "date_return")
+    )
+    statements.execute(conn, "add_archive_month", (month,))
+    conn.commit()
+
+
+def archive_loans(conn, before=None, batch_size=None, pause=None, progress=None):
+    """
+    Moves loans returned before `before` (a datetime; LOAN_ARCHIVE_AFTER_DAYS
+    ago by default), and any undated returned loans, from Transaction and
+    TransactionRecord to the monthly archive tables on `conn`.
+    progress(loans) is called after every batch. Returns the number of loans
+    archived.
+    """
+    backend = get_backend()
+    if before is None:
+        # Return times come from the database clock; a time zone's worth of
+        # skew does not matter at an age of days
+        before = datetime.now() - timedelta(days=config.LOAN_ARCHIVE_AFTER_DAYS)
+    cutoff = before.strftime("%Y-%m-%d %H:%M:%S")
+    batch_size = batch_size or config.LOAN_ARCHIVE_BATCH_SIZE
+    pause = config.LOAN_ARCHIVE_PAUSE if pause is None else pause
+
+    months = set(archive_months(conn))
+    # The newest loan stays: MySQL before 8.0 restarts AUTO_INCREMENT after
+    # the highest id left in the table, which would reuse archived ids
+    newest = statements.execute(conn, "latest_loan").fetchall()[0][0]
+    after_id = 0
+    archived = 0
+    while True:
+        rows = statements.execute(
+            conn, "archivable_loans", (after_id, newest, cutoff, batch_size)
+        ).fetchall()
+        if not rows:
+            break
+        by_month = defaultdict(list)
+        for transaction_id, date_return in rows:
+            by_month[month_of(date_return)].append(transaction_id)
+        for month in sorted(by_month.keys() - months):
+            _create_archive(conn, backend, month)
+            months.add(month)
+
+        for month, ids in by_month.items():
+            for chunk in statements.chunks(ids):
+                statements.execute(
+                    conn,
+                    "archive_loans",
+                    chunk,
+                    count=len(chunk),
+                    table=archive_table(month),
+                )
+                statements.execute(
+                    conn,
+                    "add_patron_archive_months",
+                    (month, *chunk, month),
+                    count=len(chunk),
+                    table=archive_table(month),
+                )
+        ids = [transaction_id for transaction_id, _ in rows]
+        for chunk in statements.chunks(ids):
+            statements.execute(conn, "delete_loan_records", chunk, count=len(chunk))
+            statements.execute(conn, "delete_loans", chunk, count=len(chunk))
+        conn.commit()
+
+        after_id = ids[-1]
+        archived += len(rows)
+        if progress:
+            progress(archived)
+        if pause:
+            time.sleep(pause)
+    conn.commit()
+    return archived
+
+
+def _history_order(row):
+    # Open loans, then the most recently returned, then undated returns
+    return (row[5], row[4] is not None, row[4], row[0])
+
+
+def _ranks_above(row, month):
+    # True if every loan archived in `month` or earlier ranks below `row`
+    if row[5]:
+        return True
+    return row[4] is not None and month_of(row[4]) > month
+
+
+@instrumented
+@read_query(ttl="DB_CACHE_TTL_CIRCULATION")
+def get_patron_history(patron_id, limit=None):
+    """
+    Returns a patron's `limit` most recent loans (DB_PAGE_SIZE by default),
+    open loans first and then by return time, newest first, from the loan
+    history and its archives: (transaction_id, book_id, book_title,
+    date_issue, date_return).
+    """
+    limit = page_size(limit)
+    with connection() as conn:
+        rows = statements.execute(conn, "patron_history", (patron_id,)).fetchall()
+        rows.sort(key=_history_order, reverse=True)
+        months = statements.execute(
+            conn, "patron_archive_months", (patron_id,)
+        ).fetchall()
+        for (month,) in months:
+            if len(rows) >= limit and _ranks_above(rows[limit - 1], month):
+                break
+            rows += statements.execute(
+                conn,
+                "archived_patron_history",
+                (patron_id, limit),
+                table=archive_table(month),
+            ).fetchall()
+            rows.sort(key=_history_order, reverse=True)
+    return [row[:5] for row in rows[:limit]]
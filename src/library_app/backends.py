@@ -0,0 +1,537 @@
+import os
+import re
+import sqlite3
+from functools import lru_cache
+
+from . import config
+
+
+def _mysql_connector():
+    # mysql-connector-python takes tens of milliseconds to import, so it is
+    # imported on first use rather than by every process that imports this
+    import mysql.connector
+
+    return mysql.connector
+
+
+def __getattr__(name):
+    # backends.mysql, e.g. for patching backends.mysql.connector.connect,
+    # imports the driver when first accessed
+    if name == "mysql":
+        import mysql.connector
+
+        return mysql
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class MySQLBackend:
+    """Talks to a MySQL server through mysql-connector-python."""
+
+    name = "mysql"
+    supports_local_infile = True
+
+    def __init__(self):
+        self._local_infile = True
+
+    @property
+    def Error(self):
+        return _mysql_connector().Error
+
+    def connect(self, database=True, local_infile_dir=None, address=None):
+        """Connects to the primary, or to the replica at "host[:port]"."""
+        kwargs = {}
+        if database:
+            kwargs["database"] = config.DB_NAME
+        if local_infile_dir:
+            # LOAD DATA LOCAL may only read files from this directory
+            kwargs["allow_local_infile_in_path"] = local_infile_dir
+        host, _, port = (address or config.DB_HOST).partition(":")
+        if port:
+            kwargs["port"] = int(port)
+        return _mysql_connector().connect(
+            host=host,
+            user=config.DB_USER,
+            passwd=config.DB_PASSWORD,
+            **kwargs,
+        )
+
+    def ping(self, conn):
+        return conn.is_connected()
+
+    def replica_addresses(self):
+        return config.DB_REPLICA_HOSTS
+
+    def is_retryable(self, err):
+        # ER_LOCK_WAIT_TIMEOUT and ER_LOCK_DEADLOCK
+        return getattr(err, "errno", None) in (1205, 1213)
+
+    def streaming_cursor(self, conn):
+        # Unbuffered: rows stay on the server until fetched
+        return conn.cursor(buffered=False)
+
+    def prepared_cursor(self, conn):
+        # Prepares its statement on the server on first execute and reuses
+        # it for as long as it is executed with the same SQL string
+        return conn.cursor(prepared=True)
+
+    def is_unpreparable(self, err):
+        # ER_UNSUPPORTED_PS: the statement cannot be prepared
+        return getattr(err, "errno", None) == 1295
+
+    def create_index(self, cursor, name, table, columns):
+        # MySQL has no CREATE INDEX IF NOT EXISTS
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.statistics WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s",  # noqa: E501
+            (table, name),
+        )
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})")
+
+    def add_on_duplicate(self, key, columns):
+        """Suffix for an INSERT that adds its values to an existing `key` row."""
+        updates = ", ".join(
+            f"{column} = {column} + VALUES({column})" for column in columns
+        )
+        return f"ON DUPLICATE KEY UPDATE {updates}"
+
+    def full_scans(self, cursor, sql, params=()):
+        """Returns the tables that the plan for `sql` reads in full."""
+        cursor.execute(f"EXPLAIN {sql}", params)
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return [row["table"] for row in rows if row["type"] == "ALL"]
+
+    def create_book_search(self, cursor):
+        """Creates and backfills the FULLTEXT-indexed BookSearch table."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS BookSearch (
+                book_id INT PRIMARY KEY,
+                book_title VARCHAR(50) NOT NULL,
+                author_name VARCHAR(50) NOT NULL,
+                FULLTEXT KEY ft_book_search (book_title, author_name)
+            )
+        """)
+        for name, ddl in _MYSQL_SEARCH_TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(ddl)
+        cursor.execute("DELETE FROM BookSearch")
+        cursor.execute("""
+            INSERT INTO BookSearch (book_id, book_title, author_name)
+            SELECT book_id, book_title, COALESCE(author_name, '')
+            FROM Book
+            LEFT JOIN Author ON Book.author_id = Author.author_id
+        """)
+
+    def create_catalog_changes(self, cursor):
+        """Creates the triggers that log catalog writes to CatalogChange."""
+        for name, ddl in _mysql_change_triggers():
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(ddl)
+
+    def book_search_query(self):
+        return """
+            SELECT Book.book_id, Book.book_title, BookSearch.author_name,
+                   publish_year, times_checked_out
+            FROM BookSearch
+            JOIN Book ON Book.book_id = BookSearch.book_id
+            WHERE MATCH (BookSearch.book_title, BookSearch.author_name)
+                  AGAINST (%s IN BOOLEAN MODE)
+            ORDER BY MATCH (BookSearch.book_title, BookSearch.author_name)
+                  AGAINST (%s IN BOOLEAN MODE) DESC
+            LIMIT %s
+        """
+
+    def book_search_params(self, terms, limit):
+        # Every term is required and matches as a prefix: +pride +prej*
+        expression = " ".join(f"+{term}*" for term in terms)
+        return (expression, expression, limit)
+
+    def load_rows(self, cursor, table, columns, rows, staging_dir=None):
+        """
+        Inserts `rows` into `table`. With a staging directory the rows are
+        written to a file there and sent with LOAD DATA LOCAL INFILE, which
+        the server parses far faster than INSERT statements. Servers with
+        local_infile disabled fall back to a multi-row INSERT.
+        """
+        if staging_dir and self._local_infile:
+            path = os.path.join(staging_dir, f"{table}.csv")
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                for row in rows:
+                    f.write(",".join(_load_data_field(value) for value in row))
+                    f.write("\n")
+            try:
+                cursor.execute(
+                    f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} CHARACTER SET utf8mb4 FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' LINES TERMINATED BY '\\n' ({', '.join(columns)})",  # noqa: E501
+                    (path,),
+                )
+                return
+            except _mysql_connector().Error as err:
+                # ER_NOT_ALLOWED_COMMAND, CR_LOAD_DATA_LOCAL_INFILE_REJECTED,
+                # ER_CLIENT_LOCAL_FILES_DISABLED
+                if err.errno not in (1148, 2068, 3948):
+                    raise
+                self._local_infile = False
+        cursor.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",  # noqa: E501
+            rows,
+        )
+
+    def create_database(self):
+        conn = self.connect(database=False)
+        try:
+            conn.cursor().execute(f"CREATE DATABASE IF NOT EXISTS {config.DB_NAME}")
+        finally:
+            conn.close()
+
+    def describe(self):
+        return f"MySQL at {config.DB_HOST} as {config.DB_USER}"
+
+
+class SQLiteBackend:
+    """
+    Runs in-process against a SQLite file in WAL mode.
+    Repository SQL is written for MySQL and translated on the fly.
+    """
+
+    name = "sqlite"
+    Error = sqlite3.Error
+    supports_local_infile = False
+
+    def connect(self, database=True, local_infile_dir=None, address=None):
+        """Opens SQLITE_PATH, or the replica file at `address`."""
+        conn = sqlite3.connect(
+            address or config.SQLITE_PATH,
+            timeout=config.SQLITE_BUSY_TIMEOUT,
+            check_same_thread=False,
+            factory=_SQLiteConnection,
+            cached_statements=(
+                max(config.DB_STATEMENT_CACHE_SIZE, 128)
+                if config.DB_PREPARED_STATEMENTS
+                else 0
+            ),
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def ping(self, conn):
+        conn.execute("SELECT 1")
+        return True
+
+    def replica_addresses(self):
+        return config.SQLITE_REPLICA_PATHS
+
+    def is_retryable(self, err):
+        return isinstance(err, sqlite3.OperationalError) and "locked" in str(err)
+
+    def streaming_cursor(self, conn):
+        # SQLite cursors already step through results lazily
+        return conn.cursor()
+
+    def prepared_cursor(self, conn):
+        # sqlite3 has no explicit prepare; it compiles each SQL string once
+        # per connection into its statement cache (sized in connect())
+        return conn.cursor()
+
+    def is_unpreparable(self, err):
+        return False
+
+    def create_index(self, cursor, name, table, columns):
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+        )
+
+    def add_on_duplicate(self, key, columns):
+        """Suffix for an INSERT that adds its values to an existing `key` row."""
+        updates = ", ".join(
+            f"{column} = {column} + excluded.{column}" for column in columns
+        )
+        return f"ON CONFLICT ({key}) DO UPDATE SET {updates}"
+
+    def full_scans(self, cursor, sql, params=()):
+        """Returns the tables that the plan for `sql` reads in full."""
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        scans = []
+        for row in cursor.fetchall():
+            detail = row[3]
+            # "SEARCH t USING INDEX ..." is a seek; "SCAN t [USING ...]" reads
+            # every row of t or of one of its indexes. A virtual table scan
+            # with an index string (e.g. an FTS5 MATCH) is a seek as well.
+            if _VIRTUAL_INDEX.search(detail):
+                continue
+            if detail.startswith("SCAN "):
+                scans.append(detail.split()[1].strip('"'))
+        return scans
+
+    def create_book_search(self, cursor):
+        """Creates and backfills the FTS5 BookSearch table."""
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS BookSearch USING fts5(
+                book_title,
+                author_name,
+                tokenize = 'unicode61 remove_diacritics 2',
+                -- Prefix indexes keep short "pri"* style queries cheap
+                prefix = '2 3'
+            )
+        """)
+        for name, ddl in _SQLITE_SEARCH_TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(ddl)
+        cursor.execute("DELETE FROM BookSearch")
+        cursor.execute("""
+            INSERT INTO BookSearch (rowid, book_title, author_name)
+            SELECT book_id, book_title, COALESCE(author_name, '')
+            FROM Book
+            LEFT JOIN Author ON Book.author_id = Author.author_id
+        """)
+
+    def create_catalog_changes(self, cursor):
+        """Creates the triggers that log catalog writes to CatalogChange."""
+        for name, ddl in _sqlite_change_triggers():
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(ddl)
+
+    def book_search_query(self):
+        return """
+            SELECT Book.book_id, Book.book_title, BookSearch.author_name,
+                   publish_year, times_checked_out
+            FROM BookSearch
+            JOIN Book ON Book.book_id = BookSearch.rowid
+            WHERE BookSearch MATCH %s
+            ORDER BY BookSearch.rank
+            LIMIT %s
+        """
+
+    def book_search_params(self, terms, limit):
+        # Every term is required and matches as a prefix: "pride"* "prej"*
+        expression = " ".join(f'"{term}"*' for term in terms)
+        return (expression, limit)
+
+    def load_rows(self, cursor, table, columns, rows, staging_dir=None):
+        """Inserts `rows` into `table` with one prepared executemany."""
+        cursor.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",  # noqa: E501
+            rows,
+        )
+
+    def create_database(self):
+        # The database file is created on first connect.
+        pass
+
+    def describe(self):
+        return f"SQLite database {config.SQLITE_PATH}"
+
+
+def _load_data_field(value):
+    # Unquoted NULL is SQL NULL; quoted strings keep a literal "NULL" a string
+    if value is None:
+        return "NULL"
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    return str(value)
+
+
+_VIRTUAL_INDEX = re.compile(r"VIRTUAL TABLE INDEX \d+:\S")
+
+_BOOK_SEARCH_AUTHOR = (
+    "COALESCE((SELECT author_name FROM Author WHERE author_id = NEW.author_id), '')"
+)
+
+# BookSearch mirrors Book titles and Author names; these triggers keep it in
+# step with every write, whichever code path makes it.
+_MYSQL_SEARCH_TRIGGERS = [
+    (
+        "book_search_insert",
+        f"""
+        CREATE TRIGGER book_search_insert AFTER INSERT ON Book FOR EACH ROW
+        INSERT INTO BookSearch (book_id, book_title, author_name)
+        VALUES (NEW.book_id, NEW.book_title, {_BOOK_SEARCH_AUTHOR})
+        """,
+    ),
+    (
+        # Fires on every checkout too, so only touch BookSearch when the
+        # indexed columns actually changed.
+        "book_search_update",
+        f"""
+        CREATE TRIGGER book_search_update AFTER UPDATE ON Book FOR EACH ROW
+        BEGIN
+            IF NEW.book_title <> OLD.book_title
+                    OR NOT (NEW.author_id <=> OLD.author_id) THEN
+                UPDATE BookSearch
+                SET book_title = NEW.book_title, author_name = {_BOOK_SEARCH_AUTHOR}
+                WHERE book_id = NEW.book_id;
+            END IF;
+        END
+        """,
+    ),
+    (
+        "book_search_delete",
+        """
+        CREATE TRIGGER book_search_delete AFTER DELETE ON Book FOR EACH ROW
+        DELETE FROM BookSearch WHERE book_id = OLD.book_id
+        """,
+    ),
+    (
+        "author_search_update",
+        """
+        CREATE TRIGGER author_search_update AFTER UPDATE ON Author FOR EACH ROW
+        UPDATE BookSearch
+        SET author_name = NEW.author_name
+        WHERE book_id IN (SELECT book_id FROM Book WHERE author_id = NEW.author_id)
+        """,
+    ),
+]
+
+_SQLITE_SEARCH_TRIGGERS = [
+    (
+        "book_search_insert",
+        f"""
+        CREATE TRIGGER book_search_insert AFTER INSERT ON Book BEGIN
+            INSERT INTO BookSearch (rowid, book_title, author_name)
+            VALUES (NEW.book_id, NEW.book_title, {_BOOK_SEARCH_AUTHOR});
+        END
+        """,
+    ),
+    (
+        "book_search_update",
+        f"""
+        CREATE TRIGGER book_search_update AFTER UPDATE OF book_title, author_id ON Book
+        BEGIN
+            UPDATE BookSearch
+            SET book_title = NEW.book_title, author_name = {_BOOK_SEARCH_AUTHOR}
+            WHERE rowid = NEW.book_id;
+        END
+        """,
+    ),
+    (
+        "book_search_delete",
+        """
+        CREATE TRIGGER book_search_delete AFTER DELETE ON Book BEGIN
+            DELETE FROM BookSearch WHERE rowid = OLD.book_id;
+        END
+        """,
+    ),
+    (
+        "author_search_update",
+        """
+        CREATE TRIGGER author_search_update AFTER UPDATE OF author_name ON Author
+        BEGIN
+            UPDATE BookSearch
+            SET author_name = NEW.author_name
+            WHERE rowid IN (SELECT book_id FROM Book WHERE author_id = NEW.author_id);
+        END
+        """,
+    ),
+]
+
+# CatalogChange numbers every write to the tables a catalog snapshot holds
+# (see catalog.py): (entity, table, key column, columns the snapshot holds).
+# Updates that leave those columns alone, e.g. times_checked_out, are not
+# logged.
+_CATALOG_TABLES = [
+    ("book", "Book", "book_id", ("book_title", "author_id", "is_checked")),
+    ("author", "Author", "author_id", ("author_name",)),
+    ("patron", "Patron", "patron_id", ("patron_name",)),
+]
+
+
+def _log_change(entity, row, key):
+    return (
+        "INSERT INTO CatalogChange (entity, entity_id) "
+        f"VALUES ('{entity}', {row}.{key})"
+    )
+
+
+def _mysql_change_triggers():
+    for entity, table, key, columns in _CATALOG_TABLES:
+        changed = " OR ".join(f"NOT (NEW.{c} <=> OLD.{c})" for c in columns)
+        yield (
+            f"{entity}_change_insert",
+            f"CREATE TRIGGER {entity}_change_insert AFTER INSERT ON {table} "
+            f"FOR EACH ROW {_log_change(entity, 'NEW', key)}",
+        )
+        yield (
+            f"{entity}_change_update",
+            f"CREATE TRIGGER {entity}_change_update AFTER UPDATE ON {table} "
+            f"FOR EACH ROW BEGIN IF {changed} THEN "
+            f"{_log_change(entity, 'NEW', key)}; END IF; END",
+        )
+        yield (
+            f"{entity}_change_delete",
+            f"CREATE TRIGGER {entity}_change_delete AFTER DELETE ON {table} "
+            f"FOR EACH ROW {_log_change(entity, 'OLD', key)}",
+        )
+
+
+def _sqlite_change_triggers():
+    for entity, table, key, columns in _CATALOG_TABLES:
+        changed = " OR ".join(f"NEW.{c} IS NOT OLD.{c}" for c in columns)
+        yield (
+            f"{entity}_change_insert",
+            f"CREATE TRIGGER {entity}_change_insert AFTER INSERT ON {table} "
+            f"BEGIN {_log_change(entity, 'NEW', key)}; END",
+        )
+        yield (
+            f"{entity}_change_update",
+            f"CREATE TRIGGER {entity}_change_update "
+            f"AFTER UPDATE OF {', '.join(columns)} ON {table} WHEN {changed} "
+            f"BEGIN {_log_change(entity, 'NEW', key)}; END",
+        )
+        yield (
+            f"{entity}_change_delete",
+            f"CREATE TRIGGER {entity}_change_delete AFTER DELETE ON {table} "
+            f"BEGIN {_log_change(entity, 'OLD', key)}; END",
+        )
+
+
+BACKENDS = {
+    MySQLBackend.name: MySQLBackend,
+    SQLiteBackend.name: SQLiteBackend,
+}
+
+
+def get_backend(name=None):
+    """Returns the storage backend selected by config.DB_BACKEND."""
+    name = (name or config.DB_BACKEND).lower()
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(
+            f"Unknown DB_BACKEND {name!r}; expected one of {', '.join(BACKENDS)}"
+        ) from None
+
+
+_TRANSLATIONS = [
+    (re.compile(r"%s"), "?"),
+    # Transaction is a reserved word in SQLite, so the table name is quoted.
+    (re.compile(r"\bTransaction\b"), '"Transaction"'),
+    (
+        re.compile(r"\bint\s+PRIMARY\s+KEY\s+AUTO_INCREMENT\b", re.IGNORECASE),
+        "INTEGER PRIMARY KEY AUTOINCREMENT",
+    ),
+]
+
+
+@lru_cache(maxsize=256)
+def translate_sqlite(sql):
+    """Rewrites MySQL-flavoured repository SQL into the SQLite dialect."""
+    for pattern, replacement in _TRANSLATIONS:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+class _SQLiteCursor(sqlite3.Cursor):
+    def execute(self, sql, params=None):
+        return super().execute(translate_sqlite(sql), params or ())
+
+    def executemany(self, sql, seq_of_params):
+        return super().executemany(translate_sqlite(sql), seq_of_params)
+
+
+class _SQLiteConnection(sqlite3.Connection):
+    def cursor(self, factory=_SQLiteCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=None):
+        return self.cursor().execute(sql, params)
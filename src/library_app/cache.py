@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class QueryCache:
+    """
+    A bounded, thread-safe LRU cache for repository read results.
+
+    Entries are keyed by (name, args), where name is the repository function.
+    Each entry expires after the TTL it was stored with. Writers invalidate
+    exactly the entries they affect via invalidate().
+    """
+
+    def __init__(self, max_entries=1024, enabled=True):
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries = OrderedDict()
+        # Bumped on every invalidation of a name so that a load which started
+        # before the invalidation cannot store its now-stale result.
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(
+            ("hits", "misses", "evictions", "expirations", "invalidations"), 0
+        )
+
+    def get_or_load(self, name, args, loader, ttl):
+        """Returns the cached value for (name, args), calling loader() on a miss."""
+        if not self.enabled or ttl <= 0:
+            return loader()
+
+        key = (name, args)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return value
+                del self._entries[key]
+                self._counters["expirations"] += 1
+            self._counters["misses"] += 1
+            generation = self._generations.get(name, 0)
+
+        value = loader()
+
+        with self._lock:
+            if self._generations.get(name, 0) == generation:
+                self._entries[key] = (value, time.monotonic() + ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._counters["evictions"] += 1
+        return value
+
+    def invalidate(self, name, args=None, where=None):
+        """
+        Drops cached entries for `name`: only the entry for `args` if given,
+        only entries whose value satisfies where(value) if given, else all.
+        """
+        with self._lock:
+            self._generations[name] = self._generations.get(name, 0) + 1
+            for key in list(self._entries):
+                if key[0] != name or (args is not None and key[1] != tuple(args)):
+                    continue
+                if where is not None and not where(self._entries[key][0]):
+                    continue
+                del self._entries[key]
+                self._counters["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            for name in {key[0] for key in self._entries}:
+                self._generations[name] = self._generations.get(name, 0) + 1
+            self._entries.clear()
+
+    def stats(self):
+        """Returns hit, miss, eviction, expiration and invalidation counters."""
+        with self._lock:
+            return dict(self._counters, size=len(self._entries))
+
+    def reset_stats(self):
+        with self._lock:
+            for counter in self._counters:
+                self._counters[counter] = 0
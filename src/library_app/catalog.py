@@ -0,0 +1,289 @@
+"""
+Compact in-memory snapshot of the catalog: books, authors and patrons.
+
+Every column is stored on its own and indexed directly by id, so a lookup is
+O(1) and no row is a Python object: book titles are UTF-8 in one buffer
+addressed by offset and length, author ids are 32-bit ints and availability
+is one bit per book. Author and patron names are interned strings, so a name
+shared by many rows is stored once.
+
+refresh() catches up without re-reading whole tables. Triggers log every
+write to Book, Author and Patron to CatalogChange under an increasing
+change_id (migrations/0007_catalog_changes.py); the snapshot remembers the
+last change_id it applied and re-reads only the rows named by newer changes.
+compact_changes() trims the log to the newest CATALOG_RETAIN_CHANGES
+changes; a snapshot further behind than that reloads in full.
+"""
+
+import sys
+import threading
+from array import array
+
+from . import config, sequences, statements
+from .repository import connection
+from .sequences import GAP_TIMEOUT
+
+_ENTITIES = ("book", "author", "patron")
+_NO_TITLE = -1
+
+CHANGE_LOG = sequences.Log(
+    "latest_catalog_change",
+    "catalog_changes_compacted_through",
+    "compact_catalog_changes",
+    "mark_catalog_changes_compacted",
+)
+
+
+def stream_rows(conn, statement):
+    """Yields the rows of `statement`, DB_FETCH_SIZE at a time."""
+    cursor = statements.execute_streaming(conn, statement)
+    while True:
+        rows = cursor.fetchmany(config.DB_FETCH_SIZE)
+        if not rows:
+            return
+        yield from rows
+
+
+def rows_by_ids(conn, statement, ids):
+    """Yields the rows of an `{ids}` statement for `ids`, a chunk per query."""
+    for chunk in statements.chunks(ids):
+        yield from statements.execute(
+            conn, statement, chunk, count=len(chunk)
+        ).fetchall()
+
+
+def changes_since(conn, version, gaps):
+    """
+    Returns the (change_id, entity, entity_id) changes after `version` and
+    those among the skipped change ids `gaps` that have appeared since, or
+    None if changes after `version` were compacted away.
+    """
+    changes = statements.execute(conn, "catalog_changes", (version,)).fetchall()
+    if sequences.compacted_past(
+        conn, CHANGE_LOG, version, changes[:1] and [changes[0][0]]
+    ):
+        return None
+    return changes + list(rows_by_ids(conn, "catalog_changes_by_ids", sorted(gaps)))
+
+
+def compact_changes(conn, keep=None, batch_size=sequences.BATCH_SIZE, progress=None):
+    """
+    Deletes all but the newest `keep` catalog changes (CATALOG_RETAIN_CHANGES
+    by default) on `conn`, `batch_size` at a time with a commit after each.
+    progress(deleted) is called after every batch. Returns the number of
+    changes deleted.
+    """
+    keep = config.CATALOG_RETAIN_CHANGES if keep is None else keep
+    return sequences.compact(conn, CHANGE_LOG, keep, batch_size, progress)
+
+
+def _set_name(names, key, name):
+    if key >= len(names):
+        names.extend([None] * (key + 1 - len(names)))
+    names[key] = None if name is None else sys.intern(name)
+
+
+class _Columns:
+    """The snapshot's storage. Book columns are indexed by book_id."""
+
+    __slots__ = (
+        "title_start",
+        "title_length",
+        "titles",
+        "book_authors",
+        "available",
+        "author_names",
+        "patron_names",
+    )
+
+    def __init__(self, max_book=0, max_author=0, max_patron=0):
+        self.title_start = array("q", [_NO_TITLE]) * (max_book + 1)
+        self.title_length = array("H", [0]) * (max_book + 1)
+        self.titles = bytearray()
+        self.book_authors = array("i", [0]) * (max_book + 1)
+        self.available = bytearray(max_book // 8 + 1)
+        self.author_names = [None] * (max_author + 1)
+        self.patron_names = [None] * (max_patron + 1)
+
+    def _reserve_books(self, book_id):
+        size = len(self.title_start)
+        if book_id < size:
+            return
+        grow = max(book_id + 1 - size, size // 8)
+        self.title_start.extend(array("q", [_NO_TITLE]) * grow)
+        self.title_length.extend(array("H", [0]) * grow)
+        self.book_authors.extend(array("i", [0]) * grow)
+        self.available.extend(bytes((size + grow) // 8 + 1 - len(self.available)))
+
+    def title(self, book_id):
+        start = self.title_start[book_id]
+        end = start + self.title_length[book_id]
+        return self.titles[start:end].decode()
+
+    def set_book(self, book_id, title, author_id, is_checked):
+        self._reserve_books(book_id)
+        encoded = title.encode()
+        if self.title_start[book_id] == _NO_TITLE or self.title(book_id) != title:
+            # A changed title is appended; the old bytes are freed by load()
+            self.title_start[book_id] = len(self.titles)
+            self.title_length[book_id] = len(encoded)
+            self.titles += encoded
+        self.book_authors[book_id] = author_id or 0
+        mask = 1 << (book_id & 7)
+        if is_checked:
+            self.available[book_id >> 3] &= ~mask
+        else:
+            self.available[book_id >> 3] |= mask
+
+    def drop_book(self, book_id):
+        if book_id < len(self.title_start):
+            self.title_start[book_id] = _NO_TITLE
+            self.title_length[book_id] = 0
+            self.book_authors[book_id] = 0
+            self.available[book_id >> 3] &= ~(1 << (book_id & 7))
+
+
+class CatalogSnapshot:
+    """
+    Books, authors and patrons held column-wise in memory. refresh() loads
+    the snapshot and later brings it up to date; reads never query.
+    """
+
+    def __init__(self):
+        # The last change_id applied, None until loaded
+        self.version = None
+        self._columns = _Columns()
+        # Skipped change_id -> time.monotonic() when first missed
+        self._gaps = {}
+        self._lock = threading.Lock()
+
+    def get_book(self, book_id):
+        """Returns (book_id, book_title, author_name, is_available), or None."""
+        columns = self._columns
+        if not 0 < book_id < len(columns.title_start):
+            return None
+        if columns.title_start[book_id] == _NO_TITLE:
+            return None
+        return (
+            book_id,
+            columns.title(book_id),
+            self.author_name(columns.book_authors[book_id]),
+            self.is_available(book_id),
+        )
+
+    def is_available(self, book_id):
+        """True if the book exists and is not checked out."""
+        available = self._columns.available
+        return 0 < book_id < len(available) * 8 and bool(
+            available[book_id >> 3] & (1 << (book_id & 7))
+        )
+
+    def available_book_ids(self):
+        """Yields the id of every available book in ascending order."""
+        for index, byte in enumerate(self._columns.available):
+            if byte:
+                for bit in range(8):
+                    if byte & (1 << bit):
+                        yield index * 8 + bit
+
+    def author_name(self, author_id):
+        """Returns the author's name, or None for an unknown id."""
+        names = self._columns.author_names
+        return names[author_id] if 0 < author_id < len(names) else None
+
+    def patron_name(self, patron_id):
+        """Returns the patron's name, or None for an unknown id."""
+        names = self._columns.patron_names
+        return names[patron_id] if 0 < patron_id < len(names) else None
+
+    def memory_bytes(self):
+        """Returns the memory held by the columns and the distinct names."""
+        columns = self._columns
+        total = sum(
+            sys.getsizeof(getattr(columns, name)) for name in _Columns.__slots__
+        )
+        names = {
+            id(name): name
+            for name in columns.author_names + columns.patron_names
+            if name is not None
+        }
+        return total + sum(sys.getsizeof(name) for name in names.values())
+
+    def load(self):
+        """Reads the whole catalog afresh. Returns the number of books read."""
+        with self._lock, connection() as conn:
+            return self._load(conn)
+
+    def _load(self, conn):
+        version, max_book, max_author, max_patron = statements.execute(
+            conn, "catalog_sizes"
+        ).fetchall()[0]
+        # Changes made from here on are re-applied by the next refresh
+        columns = _Columns(max_book, max_author, max_patron)
+        books = 0
+        for row in stream_rows(conn, "catalog_books"):
+            columns.set_book(*row)
+            books += 1
+        for author_id, name in stream_rows(conn, "authors"):
+            _set_name(columns.author_names, author_id, name)
+        for patron_id, name in stream_rows(conn, "patrons"):
+            _set_name(columns.patron_names, patron_id, name)
+
+        self._columns = columns
+        self.version = version
+        self._gaps = {}
+        return books
+
+    def refresh(self):
+        """
+        Applies the changes logged since the last load or refresh, loading
+        the whole catalog the first time. Returns the number of rows re-read.
+        """
+        if self.version is None:
+            return self.load()
+
+        with self._lock, connection() as conn:
+            changes = changes_since(conn, self.version, self._gaps)
+            if changes is None:
+                # Changes not applied yet were compacted away
+                return self._load(conn)
+            self._advance(change[0] for change in changes)
+
+            changed = {entity: set() for entity in _ENTITIES}
+            for _, entity, entity_id in changes:
+                changed[entity].add(entity_id)
+            return self._reread(conn, changed)
+
+    def _advance(self, change_ids):
+        # Skipped change ids are looked up again until they appear; see
+        # sequences.py
+        self.version, self._gaps = sequences.advance(
+            self.version, self._gaps, change_ids, GAP_TIMEOUT
+        )
+
+    def _reread(self, conn, changed):
+        # Rows that are gone were deleted
+        columns = self._columns
+        rows = 0
+        for book_id, *book in rows_by_ids(
+            conn, "catalog_books_by_ids", sorted(changed["book"])
+        ):
+            columns.set_book(book_id, *book)
+            changed["book"].discard(book_id)
+            rows += 1
+        for book_id in changed["book"]:
+            columns.drop_book(book_id)
+
+        for entity, names in (
+            ("author", columns.author_names),
+            ("patron", columns.patron_names),
+        ):
+            ids = changed[entity]
+            for key, name in rows_by_ids(conn, f"{entity}s_by_ids", sorted(ids)):
+                _set_name(names, key, name)
+                ids.discard(key)
+                rows += 1
+            for key in ids:
+                if key < len(names):
+                    names[key] = None
+        return rows
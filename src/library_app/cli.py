@@ -1,85 +1,142 @@
+from . import config
 from .repository import (
-    get_authors,
-    get_available_books,
-    get_patrons,
-    get_borrowed_books,
-    get_patrons_with_book,
+    get_authors_page,
+    get_available_books_page,
+    get_patrons_page,
+    get_return_context,
+    search_books,
     search_books_by_author,
     check_out_book_transaction,
     return_book_transaction,
 )
-
-
-def search_books_with_input():
-    authors = get_authors()
-    if authors:
-        print("Select an author to search for books:")
-        for author in authors:
-            print(f"{author[0]}. {author[1]}")
-        author_choice = input("Enter the number corresponding to the author: ")
+from .typeahead import find_authors, find_patrons
+
+
+def choose_from_pages(first_page, fetch_page, prompt, invalid_message):
+    """
+    Prints (id, name) rows one page at a time, starting with `first_page`,
+    and asks the user to pick one by id. An empty answer shows the next page,
+    unless fetch_page is None. Returns the chosen id, or None after telling
+    the user what was wrong.
+    """
+    page = first_page
+    seen = set()
+    while True:
+        for row in page:
+            print(f"{row[0]}. {row[1]}")
+            seen.add(row[0])
+
+        more = fetch_page is not None and len(page) == config.DB_PAGE_SIZE
+        if more:
+            print("(press Enter to see more)")
+        choice = input(prompt)
+        if more and choice == "":
+            page = fetch_page(after_id=page[-1][0], limit=config.DB_PAGE_SIZE)
+            continue
 
         try:
-            author_id = int(author_choice)
-            if author_id not in [author[0] for author in authors]:
-                print("Invalid author selection.")
-                return
+            chosen = int(choice)
         except ValueError:
             print("Invalid input. Please enter a number.")
-            return
-
-        books = search_books_by_author(author_id)
-        if books:
-            print("\nMatching Books:")
-            print("(book_id, book_title, author_name, publish_year, times_checked_out)")
-            for book in books:
-                print(book)
-        else:
-            print("No books found for the selected author.")
+            return None
+        if chosen not in seen:
+            print(invalid_message)
+            return None
+        return chosen
+
+
+def choose_by_name(find, fetch_page, noun, prompt, invalid_message):
+    """
+    Asks for the start of a name and lists the matching (id, name) rows from
+    find(prefix, limit); a blank answer pages through all of them with
+    fetch_page instead. Then asks the user to pick one by id, as
+    choose_from_pages() does.
+    """
+    prefix = input(
+        f"Type the start of the {noun}'s name (or press Enter to list all): "
+    ).strip()
+    if not prefix:
+        rows = fetch_page(limit=config.DB_PAGE_SIZE)
+        if not rows:
+            print(f"No {noun}s found.")
+            return None
+        return choose_from_pages(rows, fetch_page, prompt, invalid_message)
+
+    rows = find(prefix, config.DB_PAGE_SIZE)
+    if not rows:
+        print(f"No {noun}s found matching '{prefix}'.")
+        return None
+    if len(rows) == config.DB_PAGE_SIZE:
+        print("(type more of the name to narrow the list)")
+    return choose_from_pages(rows, None, prompt, invalid_message)
+
+
+def print_books(books):
+    print("\nMatching Books:")
+    print("(book_id, book_title, author_name, publish_year, times_checked_out)")
+    for book in books:
+        print(book)
+
+
+def search_books_with_input():
+    query = input(
+        "Enter a title or author to search for (leave blank to browse by author): "
+    )
+    if not query.strip():
+        browse_books_by_author_with_input()
+        return
+
+    books = search_books(query)
+    if books:
+        print_books(books)
+    else:
+        print(f"No books found matching '{query.strip()}'.")
+
+
+def browse_books_by_author_with_input():
+    print("Select an author to search for books:")
+    author_id = choose_by_name(
+        find_authors,
+        get_authors_page,
+        "author",
+        "Enter the number corresponding to the author: ",
+        "Invalid author selection.",
+    )
+    if author_id is None:
+        return
+
+    books = search_books_by_author(author_id)
+    if books:
+        print_books(books)
     else:
-        print("No authors found in the database.")
+        print("No books found for the selected author.")
 
 
 def check_out_book_with_input():
-    available_books = get_available_books()
+    available_books = get_available_books_page(limit=config.DB_PAGE_SIZE)
     if not available_books:
         print("No available books.")
         return
 
     print("\nPlease Select an Available Book to Check Out:")
-    for book in available_books:
-        print(f"{book[0]}. {book[1]}")
-
-    book_choice = input("Enter the number corresponding to the book to check out: ")
-
-    try:
-        book_id = int(book_choice)
-        if book_id not in [book[0] for book in available_books]:
-            print("Invalid book selection.")
-            return
-    except ValueError:
-        print("Invalid input. Please enter a number.")
-        return
-
-    patrons = get_patrons()
-    if not patrons:
-        print("No patrons found.")
+    book_id = choose_from_pages(
+        available_books,
+        get_available_books_page,
+        "Enter the number corresponding to the book to check out: ",
+        "Invalid book selection.",
+    )
+    if book_id is None:
         return
 
     print("\n Which Patron are You?:")
-    for patron in patrons:
-        print(f"{patron[0]}. {patron[1]}")
-
-    patron_choice = input(
-        "Enter the number corresponding to the patron to check out the book: "
+    patron_id = choose_by_name(
+        find_patrons,
+        get_patrons_page,
+        "patron",
+        "Enter the number corresponding to the patron to check out the book: ",
+        "Invalid patron selection.",
     )
-
-    try:
-        patron_id = int(patron_choice)
-        if patron_id not in [patron[0] for patron in patrons]:
-            print("Invalid patron selection.")
-            return
-    except ValueError:
-        print("Invalid input. Please enter a number.")
+    if patron_id is None:
         return
 
     result = check_out_book_transaction(patron_id, book_id)
@@ -87,11 +144,6 @@ def check_out_book_with_input():
 
 
 def return_book_with_input():
-    borrowed_books = get_borrowed_books()
-    if not borrowed_books:
-        print("No borrowed books.")
-        return
-
     return_book_question = input("\nwould you like to return a book?(y/n): ")
     if return_book_question.lower() == "y":
         print("Continuing...")
@@ -103,44 +155,39 @@ def return_book_with_input():
         return  # Added return to stop if invalid input
 
     print("\nPlease select which patron you are:")
-    patrons = get_patrons()
-    if not patrons:
-        print("No patrons found.")
+    patron_id = choose_by_name(
+        find_patrons,
+        get_patrons_page,
+        "patron",
+        "enter the number coorasponding to your name: ",
+        "Invalid patron selection.",
+    )
+    if patron_id is None:
         return
 
-    for patron in patrons:
-        print(f"{patron[0]}. {patron[1]}")
-
-    patron_choice = input("enter the number coorasponding to your name: ")
-
-    print("\nList of Borrowed Books:")
-    for book in borrowed_books:
-        print(f"{book[0]}. {book[1]}")
-
-    book_choice = input("Enter the number corresponding to the book to return: ")
-
-    try:
-        book_id = int(book_choice)
-        if book_id not in [book[0] for book in borrowed_books]:
-            print("Invalid book selection.")
-            return
-    except ValueError:
-        print("Invalid input. Please enter a number.")
+    # The patron's own loans, with titles and authors, in one round trip
+    context = get_return_context(patron_id)
+    if not context:
+        print("\nPatron not found.")
         return
-
-    patrons_with_book = get_patrons_with_book(book_id)
-    if not patrons_with_book:
-        print("\nNo patrons found who borrowed this book.")
+    patron_name = context[0][0]
+    loans = [
+        (book_id, f"{title} by {author}" if author else title)
+        for _, book_id, title, author, _ in context
+        if book_id is not None
+    ]
+    if not loans:
+        print(f"\n{patron_name} has no borrowed books.")
         return
 
-    try:
-        patron_id = int(patron_choice)
-        if patron_id not in [patron[0] for patron in patrons_with_book]:
-            print("\nYou have not checked out the selected book!")
-            print("You are currently only able to return books you have checked out :(")
-            return
-    except ValueError:
-        print("\nInvalid input. Please enter a number.")
+    print(f"\nBooks borrowed by {patron_name}:")
+    book_id = choose_from_pages(
+        loans,
+        None,
+        "Enter the number corresponding to the book to return: ",
+        "Invalid book selection.",
+    )
+    if book_id is None:
         return
 
     result = return_book_transaction(patron_id, book_id)
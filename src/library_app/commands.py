@@ -0,0 +1,251 @@
+"""
+Non-interactive command line for scripts.
+
+    main.py search pride [--limit N] [--json]
+    main.py search --author 1
+    main.py checkout PATRON_ID BOOK_ID
+    main.py return PATRON_ID BOOK_ID
+    main.py list-available [--after-id N] [--limit N | --all]
+    main.py list-borrowed [--after-id N] [--limit N | --all]
+    main.py batch [FILE]
+
+Lists print one tab-separated row per line, or a JSON array with --json,
+each row written as it is read.
+Checkout and return print the outcome's message, or its status dictionary
+with --json, and exit with status 1 when it failed.
+
+batch runs one command per line of FILE (or stdin), in one process and on
+one pooled connection. Blank lines and lines starting with # are skipped.
+Each command's result is printed as it completes, as a tab-separated
+"line, ok|error, summary" row or a JSON object with --json, and the total
+throughput goes to stderr.
+"""
+
+import argparse
+import json
+import shlex
+import sys
+import time
+
+from . import repository
+from .repository import BOOK_COLUMNS, BOOK_DETAIL_COLUMNS, BORROWED_COLUMNS
+
+
+class CommandError(Exception):
+    """A batch line could not be parsed; the message says why."""
+
+
+class CommandHelp(Exception):
+    """A batch line asked for help; the message is the help text."""
+
+
+class _ArgumentParser(argparse.ArgumentParser):
+    # In a batch a bad line is reported and skipped instead of exiting
+    def error(self, message):
+        raise CommandError(message)
+
+
+class _BatchArgumentParser(_ArgumentParser):
+    # --help on a batch line is that line's result; nothing ends the batch
+    def print_help(self, file=None):
+        raise CommandHelp(self.format_help().rstrip())
+
+    def exit(self, status=0, message=None):
+        raise CommandError(message or f"exited with status {status}")
+
+
+def _rows(columns, rows):
+    # Lazy, so a streamed list is written as it is read
+    return (dict(zip(columns, row)) for row in rows)
+
+
+def search(args):
+    if args.author is not None:
+        rows = repository.search_books_by_author(args.author)
+    elif args.query:
+        rows = repository.search_books(" ".join(args.query), args.limit)
+    else:
+        raise CommandError("search needs a query or --author")
+    return True, _rows(BOOK_DETAIL_COLUMNS, rows)
+
+
+def checkout(args):
+    result = repository.check_out_book_transaction(args.patron_id, args.book_id)
+    return result["status"] == "success", result
+
+
+def return_book(args):
+    result = repository.return_book_transaction(args.patron_id, args.book_id)
+    return result["status"] == "success", result
+
+
+def list_available(args):
+    if args.all:
+        rows = repository.iter_available_books()
+    else:
+        rows = repository.get_available_books_page(args.after_id, args.limit)
+    return True, _rows(BOOK_COLUMNS, rows)
+
+
+def list_borrowed(args):
+    if args.all:
+        rows = repository.iter_borrowed_books()
+    else:
+        rows = repository.get_borrowed_books_page(args.after_id, args.limit)
+    return True, _rows(BORROWED_COLUMNS, rows)
+
+
+def _add_page_arguments(parser):
+    parser.add_argument("--after-id", type=int, default=0)
+    parser.add_argument("--limit", type=int, help="default: DB_PAGE_SIZE")
+    parser.add_argument("--all", action="store_true", help="stream every row")
+
+
+def build_parser(batch=True):
+    """
+    Returns the parser for one command line. batch=False returns the parser
+    for the lines of a batch: it leaves out batch and never exits.
+    """
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--json", action="store_true", help="print JSON")
+
+    parser_class = _ArgumentParser if batch else _BatchArgumentParser
+    parser = parser_class(
+        prog="main.py", description="Run one library operation and exit."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("search", parents=[common], help="search books")
+    command.add_argument("query", nargs="*", help="title or author words")
+    command.add_argument("--author", type=int, help="list books by author id")
+    command.add_argument("--limit", type=int, help="default: DB_PAGE_SIZE")
+    command.set_defaults(handler=search)
+
+    for name, handler in (("checkout", checkout), ("return", return_book)):
+        command = commands.add_parser(name, parents=[common], help=f"{name} a book")
+        command.add_argument("patron_id", type=int)
+        command.add_argument("book_id", type=int)
+        command.set_defaults(handler=handler)
+
+    for name, handler in (
+        ("list-available", list_available),
+        ("list-borrowed", list_borrowed),
+    ):
+        command = commands.add_parser(name, parents=[common], help=f"{name} books")
+        _add_page_arguments(command)
+        command.set_defaults(handler=handler)
+
+    if batch:
+        command = commands.add_parser(
+            "batch", parents=[common], help="run commands from a file"
+        )
+        command.add_argument(
+            "file", nargs="?", default="-", help="command file (default: stdin)"
+        )
+        command.set_defaults(handler=None)
+    return parser
+
+
+def write(payload, as_json, out=None):
+    """
+    Writes a command's result to `out` (stdout by default). Rows are
+    written one at a time as they are read, so a streamed list is never
+    held in memory whole.
+    """
+    out = out or sys.stdout
+    if isinstance(payload, dict):
+        out.write((json.dumps(payload) if as_json else payload["message"]) + "\n")
+    elif as_json:
+        # The same text as json.dumps() of the whole list
+        out.write("[")
+        for index, row in enumerate(payload):
+            out.write((", " if index else "") + json.dumps(row))
+        out.write("]\n")
+    else:
+        for row in payload:
+            out.write("\t".join(str(value) for value in row.values()) + "\n")
+
+
+def _summary(payload):
+    if isinstance(payload, dict):
+        return payload["message"]
+    return f"{sum(1 for _ in payload)} rows"
+
+
+def run_batch(lines, as_json=False, out=print, err=None):
+    """
+    Runs one command per line and reports each result through `out`.
+    Returns (commands run, commands failed).
+    """
+    err = err or (lambda message: print(message, file=sys.stderr))
+    parser = build_parser(batch=False)
+    ran = failed = 0
+    start = time.perf_counter()
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        ran += 1
+        try:
+            args = parser.parse_args(shlex.split(line))
+            ok, payload = args.handler(args)
+            # Read a streamed list here, so a failure while reading it is
+            # this line's error; text output only needs the row count
+            if as_json and not isinstance(payload, dict):
+                payload = list(payload)
+            summary = None if as_json else _summary(payload)
+        except CommandHelp as help_text:
+            ok, payload = True, {"status": "success", "message": str(help_text)}
+            summary = payload["message"]
+        except (CommandError, ValueError) as error:
+            ok, payload = False, {"status": "error", "message": str(error)}
+            summary = payload["message"]
+        if not ok:
+            failed += 1
+
+        if as_json:
+            out(
+                json.dumps(
+                    {"line": number, "command": line, "ok": ok, "result": payload}
+                )
+            )
+        else:
+            out(f"{number}\t{'ok' if ok else 'error'}\t{summary}")
+
+    elapsed = time.perf_counter() - start
+    rate = ran / elapsed if elapsed else 0.0
+    err(
+        f"Ran {ran} commands in {elapsed:.2f}s ({rate:.0f} commands/s): "
+        f"{ran - failed} ok, {failed} failed"
+    )
+    return ran, failed
+
+
+def main(argv=None):
+    """Runs one command line; returns the process exit status."""
+    parser = build_parser()
+    try:
+        args = parser.parse_args(argv)
+    except CommandError as error:
+        parser.print_usage(sys.stderr)
+        print(f"{parser.prog}: error: {error}", file=sys.stderr)
+        return 2
+
+    try:
+        if args.command == "batch":
+            if args.file == "-":
+                _, failed = run_batch(sys.stdin, args.json)
+            else:
+                with open(args.file) as lines:
+                    _, failed = run_batch(lines, args.json)
+            return 1 if failed else 0
+
+        try:
+            ok, payload = args.handler(args)
+        except CommandError as error:
+            print(f"{parser.prog}: error: {error}", file=sys.stderr)
+            return 2
+        write(payload, args.json)
+        return 0 if ok else 1
+    finally:
+        repository.close_pool()
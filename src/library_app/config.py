@@ -1,9 +1,159 @@
+"""
+Settings, read from the environment and a .env file.
+
+Nothing is read at import: the .env file is parsed, and every setting
+computed, the first time any setting is accessed. Commands that never reach
+the database (--help) skip python-dotenv entirely. Read settings as
+config.NAME where they are used, which is also what lets tests patch them.
+"""
+
 import os
-from dotenv import load_dotenv
+import threading
+
+_lock = threading.Lock()
+_settings = None
+
+
+def _list(value):
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _load():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    # Storage backend: "mysql" for a MySQL server, "sqlite" for an in-process file.
+    DB_BACKEND = os.getenv("DB_BACKEND", "mysql")
+    SQLITE_PATH = os.getenv("SQLITE_PATH", "library.db")
+    SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "5"))
+
+    DB_HOST = os.getenv("DB_HOST", "localhost")
+    DB_USER = os.getenv("DB_USER", "root")
+    DB_PASSWORD = os.getenv("DB_PASSWORD", "password")
+    DB_NAME = os.getenv("DB_NAME", "library_db")
+
+    # Connection pool settings. Size is the number of idle connections kept open;
+    # overflow connections are opened under load and closed when returned.
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+    DB_POOL_RECYCLE = float(os.getenv("DB_POOL_RECYCLE", "3600"))
+
+    # Write transactions that hit a deadlock or lock wait timeout are retried with
+    # exponential backoff starting at DB_RETRY_BACKOFF seconds.
+    DB_RETRY_ATTEMPTS = int(os.getenv("DB_RETRY_ATTEMPTS", "5"))
+    DB_RETRY_BACKOFF = float(os.getenv("DB_RETRY_BACKOFF", "0.05"))
+
+    # In-process cache for repository reads. Reference lists (authors, patrons)
+    # rarely change; circulation lists are invalidated on every checkout and
+    # return in this process, and the TTL bounds staleness from other processes.
+    DB_CACHE_ENABLED = os.getenv("DB_CACHE_ENABLED", "true").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+    DB_CACHE_MAX_ENTRIES = int(os.getenv("DB_CACHE_MAX_ENTRIES", "1024"))
+    DB_CACHE_TTL_REFERENCE = float(os.getenv("DB_CACHE_TTL_REFERENCE", "300"))
+    DB_CACHE_TTL_CIRCULATION = float(os.getenv("DB_CACHE_TTL_CIRCULATION", "5"))
+
+    # Rows pulled per round trip by the streaming iter_* reads, and rows per page
+    # for the keyset-paginated *_page reads and the CLI menus.
+    DB_FETCH_SIZE = int(os.getenv("DB_FETCH_SIZE", "1000"))
+    DB_PAGE_SIZE = int(os.getenv("DB_PAGE_SIZE", "20"))
+
+    # Repository statements are prepared once per connection and reused. Up to
+    # DB_STATEMENT_CACHE_SIZE are kept per connection, least recently used first
+    # out. Turn DB_PREPARED_STATEMENTS off to measure the difference.
+    DB_PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "true").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+    DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "64"))
+
+    # Repository instrumentation (see metrics.py). Statements taking at least
+    # DB_SLOW_QUERY_MS milliseconds are kept in an in-memory log of the last
+    # DB_SLOW_QUERY_LOG_SIZE, and appended as JSON lines to DB_SLOW_QUERY_LOG if
+    # it names a file.
+    DB_METRICS_ENABLED = os.getenv("DB_METRICS_ENABLED", "false").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+    DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "100"))
+    DB_SLOW_QUERY_LOG_SIZE = int(os.getenv("DB_SLOW_QUERY_LOG_SIZE", "100"))
+    DB_SLOW_QUERY_LOG = os.getenv("DB_SLOW_QUERY_LOG", "")
+
+    # Read replicas: "host[:port]" for MySQL or file paths for SQLite, comma
+    # separated. Repository reads go to a healthy replica picked round_robin or
+    # by least_latency (DB_REPLICA_SELECTION). Writes, and reads by a thread
+    # (or an HTTP client) within DB_REPLICA_STICKY_SECONDS of its own last
+    # committed write, go to the primary. A replica that fails is ejected, and health-checked again
+    # after DB_REPLICA_EJECT_SECONDS.
+    DB_REPLICA_HOSTS = _list(os.getenv("DB_REPLICA_HOSTS", ""))
+    SQLITE_REPLICA_PATHS = _list(os.getenv("SQLITE_REPLICA_PATHS", ""))
+    DB_REPLICA_SELECTION = os.getenv("DB_REPLICA_SELECTION", "round_robin")
+    DB_REPLICA_STICKY_SECONDS = float(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))
+    DB_REPLICA_EJECT_SECONDS = float(os.getenv("DB_REPLICA_EJECT_SECONDS", "30"))
+
+    # Catalog change log (catalog.py). Compaction (scripts/compact_catalog_changes.py)
+    # keeps the newest CATALOG_RETAIN_CHANGES changes; a snapshot further behind
+    # than that reloads in full.
+    CATALOG_RETAIN_CHANGES = int(os.getenv("CATALOG_RETAIN_CHANGES", "100000"))
+
+    # Patron and author name typeahead (typeahead.py) catches up with catalog
+    # writes at most every TYPEAHEAD_REFRESH_SECONDS.
+    TYPEAHEAD_REFRESH_SECONDS = float(os.getenv("TYPEAHEAD_REFRESH_SECONDS", "5"))
+
+    # Change events (outbox.py). Subscribers read up to OUTBOX_BATCH_SIZE events
+    # per query and, when started, poll every OUTBOX_POLL_INTERVAL seconds.
+    # Compaction (scripts/compact_outbox.py) keeps the newest
+    # OUTBOX_RETAIN_EVENTS events; a subscriber further behind than that
+    # re-reads its state instead of replaying.
+    OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "1000"))
+    OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))
+    OUTBOX_RETAIN_EVENTS = int(os.getenv("OUTBOX_RETAIN_EVENTS", "100000"))
+
+    # Loan archival (archive.py). Loans returned more than
+    # LOAN_ARCHIVE_AFTER_DAYS days ago move to monthly archive tables,
+    # LOAN_ARCHIVE_BATCH_SIZE loans per transaction with LOAN_ARCHIVE_PAUSE
+    # seconds between transactions.
+    LOAN_ARCHIVE_AFTER_DAYS = int(os.getenv("LOAN_ARCHIVE_AFTER_DAYS", "365"))
+    LOAN_ARCHIVE_BATCH_SIZE = int(os.getenv("LOAN_ARCHIVE_BATCH_SIZE", "500"))
+    LOAN_ARCHIVE_PAUSE = float(os.getenv("LOAN_ARCHIVE_PAUSE", "0.05"))
+
+    # HTTP API (main.py serve). Each worker thread serves one request at a time;
+    # keep-alive connections wait for their next request without a worker.
+    # Idle connections and slow requests are dropped after SERVE_REQUEST_TIMEOUT.
+    SERVE_HOST = os.getenv("SERVE_HOST", "127.0.0.1")
+    SERVE_PORT = int(os.getenv("SERVE_PORT", "8000"))
+    SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", "16"))
+    SERVE_REQUEST_TIMEOUT = float(os.getenv("SERVE_REQUEST_TIMEOUT", "5"))
+    # Larger request bodies are refused with 413 before they are read
+    SERVE_MAX_BODY_BYTES = int(os.getenv("SERVE_MAX_BODY_BYTES", "65536"))
+
+    return {name: value for name, value in locals().items() if name.isupper()}
 
-load_dotenv()
 
-DB_HOST = os.getenv("DB_HOST", "localhost")
-DB_USER = os.getenv("DB_USER", "root")
-DB_PASSWORD = os.getenv("DB_PASSWORD", "password")
-DB_NAME = os.getenv("DB_NAME", "library_db")
+def __getattr__(name):
+    global _settings
+    if _settings is None:
+        with _lock:
+            if _settings is None:
+                settings = _load()
+                for key, value in settings.items():
+                    # Keep anything assigned before the first read
+                    globals().setdefault(key, value)
+                _settings = settings
+    if name in _settings:
+        # Also reached after a setting is deleted, as patch.object does when
+        # it undoes a patch made before the first read: the loaded value
+        # comes back
+        return globals().setdefault(name, _settings[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
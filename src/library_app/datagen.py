@@ -0,0 +1,264 @@
+"""
+Deterministic synthetic catalog generator for benchmarks and plan checks.
+
+The same seed and sizes always produce the same rows. Popularity is skewed
+the way real circulation is: a few authors write most of the books, a few
+books account for most loans and a few patrons borrow most often. Rows are
+generated and inserted in fixed-size batches, so memory stays flat from a
+thousand rows to tens of millions.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+FIRST_NAMES = [
+    "Ada", "Alan", "Alice", "Amara", "Bea", "Carlos", "Chen", "Dara", "Elena",
+    "Femi", "Grace", "Hana", "Ivan", "Jonas", "Kai", "Leila", "Marta", "Noah",
+    "Olga", "Priya", "Quinn", "Rosa", "Sven", "Tariq", "Uma", "Viktor", "Wen",
+    "Ximena", "Yusuf", "Zoe",
+]  # fmt: skip
+LAST_NAMES = [
+    "Abbott", "Banerjee", "Castillo", "Dubois", "Eriksen", "Fischer", "Garcia",
+    "Hughes", "Ito", "Jensen", "Kowalski", "Larsen", "Moreau", "Nakamura",
+    "Okafor", "Petrov", "Quinlan", "Rossi", "Santos", "Tanaka", "Ueda", "Varga",
+    "Weber", "Xu", "Yilmaz", "Zhang",
+]  # fmt: skip
+TITLE_ADJECTIVES = [
+    "Silent", "Hidden", "Last", "Broken", "Golden", "Distant", "Secret", "Wild",
+    "Burning", "Frozen", "Lost", "Quiet", "Crimson", "Endless", "Forgotten",
+    "Hollow", "Iron", "Little", "Midnight", "Northern",
+]  # fmt: skip
+TITLE_NOUNS = [
+    "River", "Garden", "Kingdom", "Letter", "Harbor", "Mountain", "Library",
+    "Orchard", "Storm", "Voyage", "Winter", "Empire", "Forest", "Island",
+    "Lantern", "Mirror", "Promise", "Shadow", "Tower", "Witness",
+]  # fmt: skip
+
+BATCH_SIZE = 10000
+# Generated loans are issued over the year before this date
+HISTORY_END = datetime(2025, 1, 1)
+
+
+def zipf_rank(rng, n, s=1.0):
+    """
+    Draws a rank in [1, n] whose probability falls off as rank ** -s.
+    Uses the continuous inverse CDF, so it needs no per-rank tables.
+    """
+    u = rng.random()
+    if s == 1.0:
+        rank = n**u
+    else:
+        rank = ((n ** (1 - s) - 1) * u + 1) ** (1 / (1 - s))
+    return min(int(rank), n)
+
+
+class ZipfSampler:
+    """
+    Samples ids 1..n with Zipf-distributed popularity. Popular ranks are
+    scattered across the id range rather than bunched at the lowest ids.
+    """
+
+    def __init__(self, n, s=1.0, rng=None):
+        self.n = n
+        self.s = s
+        self.rng = rng or random.Random()
+        # Any step coprime with n turns rank -> id into a permutation
+        self._step = next(
+            step for step in (7919, 104729, 1299709, 15485863) if n % step != 0
+        )
+
+    def __call__(self):
+        rank = zipf_rank(self.rng, self.n, self.s)
+        return (rank - 1) * self._step % self.n + 1
+
+
+def _person_name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def _book_title(rng, number):
+    return f"The {rng.choice(TITLE_ADJECTIVES)} {rng.choice(TITLE_NOUNS)} {number}"
+
+
+def _timestamp(value):
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _next_id(cursor, table, column):
+    cursor.execute(f"SELECT COALESCE(MAX({column}), 0) FROM {table}")
+    return cursor.fetchone()[0] + 1
+
+
+def _insert_batches(conn, cursor, sql, rows, batch_size, progress, table):
+    batch = []
+    inserted = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            cursor.executemany(sql, batch)
+            conn.commit()
+            inserted += len(batch)
+            batch = []
+            if progress:
+                progress(table, inserted)
+    if batch:
+        cursor.executemany(sql, batch)
+        conn.commit()
+        inserted += len(batch)
+        if progress:
+            progress(table, inserted)
+    return inserted
+
+
+def generate_catalog(
+    conn,
+    books,
+    authors=None,
+    patrons=None,
+    loans=None,
+    checked_out_ratio=0.03,
+    seed=42,
+    batch_size=BATCH_SIZE,
+    progress=None,
+):
+    """
+    Appends a synthetic catalog to the database behind `conn`.
+
+    Sizes default to proportions of `books`: one author per 20 books, one
+    patron per 10 books and one historical loan per 2 books. About
+    `checked_out_ratio` of the books are currently out, each with an open
+    loan as its latest Transaction row and an OpenLoan row. Every loan has a
+    dated TransactionRecord. progress(table, rows) is called after every
+    batch. Returns the number of rows written per table.
+    """
+    authors = authors or max(books // 20, 1)
+    patrons = patrons or max(books // 10, 1)
+    loans = books // 2 if loans is None else loans
+    rng = random.Random(seed)
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT MIN(librarian_id) FROM Librarian")
+    librarian_id = cursor.fetchone()[0]
+    if librarian_id is None:
+        cursor.execute(
+            "INSERT INTO Librarian (librarian_name) VALUES (%s)",
+            ("Generated Librarian",),
+        )
+        conn.commit()
+        librarian_id = cursor.lastrowid
+
+    first_author = _next_id(cursor, "Author", "author_id")
+    first_book = _next_id(cursor, "Book", "book_id")
+    first_patron = _next_id(cursor, "Patron", "patron_id")
+    first_transaction = _next_id(cursor, "Transaction", "transaction_id")
+
+    book_sampler = ZipfSampler(books, 1.0, rng)
+    author_sampler = ZipfSampler(authors, 1.1, rng)
+    patron_sampler = ZipfSampler(patrons, 0.8, rng)
+
+    checked_out = set()
+    target = int(books * checked_out_ratio)
+    while len(checked_out) < target:
+        checked_out.add(book_sampler())
+
+    written = {}
+    written["Author"] = _insert_batches(
+        conn,
+        cursor,
+        "INSERT INTO Author (author_id, author_name) VALUES (%s, %s)",
+        ((first_author + i, _person_name(rng)) for i in range(authors)),
+        batch_size,
+        progress,
+        "Author",
+    )
+    written["Patron"] = _insert_batches(
+        conn,
+        cursor,
+        "INSERT INTO Patron (patron_id, patron_name) VALUES (%s, %s)",
+        ((first_patron + i, _person_name(rng)) for i in range(patrons)),
+        batch_size,
+        progress,
+        "Patron",
+    )
+    written["Book"] = _insert_batches(
+        conn,
+        cursor,
+        "INSERT INTO Book (book_id, book_title, publish_year, times_checked_out, is_checked, author_id) VALUES (%s, %s, %s, %s, %s, %s)",  # noqa: E501
+        (
+            (
+                first_book + i,
+                _book_title(rng, i + 1),
+                # Skewed towards recent publications
+                2024 - zipf_rank(rng, 400, 0.7),
+                zipf_rank(rng, 500, 1.2) - 1,
+                int(i + 1 in checked_out),
+                first_author + author_sampler() - 1,
+            )
+            for i in range(books)
+        ),
+        batch_size,
+        progress,
+        "Book",
+    )
+
+    # (book_id, patron_id, transaction_id) of every loan still out
+    open_loans = []
+
+    def loan_rows():
+        transaction_id = first_transaction
+        for _ in range(loans):
+            yield (
+                transaction_id,
+                librarian_id,
+                first_book + book_sampler() - 1,
+                first_patron + patron_sampler() - 1,
+            )
+            transaction_id += 1
+        # Open loans come last so they are each book's latest transaction
+        for book in sorted(checked_out):
+            patron_id = first_patron + patron_sampler() - 1
+            open_loans.append((first_book + book - 1, patron_id, transaction_id))
+            yield (transaction_id, librarian_id, first_book + book - 1, patron_id)
+            transaction_id += 1
+
+    written["Transaction"] = _insert_batches(
+        conn,
+        cursor,
+        "INSERT INTO Transaction (transaction_id, librarian_id, book_id, patron_id) VALUES (%s, %s, %s, %s)",  # noqa: E501
+        loan_rows(),
+        batch_size,
+        progress,
+        "Transaction",
+    )
+
+    def record_rows():
+        # Dates come from their own generator so that adding them leaves
+        # every other generated row unchanged
+        date_rng = random.Random(seed)
+        for offset in range(loans):
+            issued = HISTORY_END - timedelta(minutes=date_rng.randrange(525600))
+            returned = issued + timedelta(minutes=date_rng.randrange(60, 43200))
+            yield (_timestamp(issued), _timestamp(returned), first_transaction + offset)
+        for _, _, transaction_id in open_loans:
+            issued = HISTORY_END - timedelta(minutes=date_rng.randrange(43200))
+            yield (_timestamp(issued), None, transaction_id)
+
+    written["TransactionRecord"] = _insert_batches(
+        conn,
+        cursor,
+        "INSERT INTO TransactionRecord (date_issue, date_return, transaction_id) VALUES (%s, %s, %s)",  # noqa: E501
+        record_rows(),
+        batch_size,
+        progress,
+        "TransactionRecord",
+    )
+    written["OpenLoan"] = _insert_batches(
+        conn,
+        cursor,
+        "INSERT INTO OpenLoan (book_id, patron_id, transaction_id) VALUES (%s, %s, %s)",
+        open_loans,
+        batch_size,
+        progress,
+        "OpenLoan",
+    )
+    return written
@@ -0,0 +1,297 @@
+"""
+Streaming catalog import from CSV or JSONL files.
+
+Records are read one at a time and written in fixed-size batches, each in
+its own transaction, so memory stays flat however large the file is. Each
+batch goes through the backend's fastest bulk path (LOAD DATA LOCAL INFILE
+on MySQL, a single executemany on SQLite).
+
+Expected fields (CSV header or JSON keys):
+
+- authors:   author_name
+- patrons:   patron_name
+- addresses: patron_id, street, city, state
+- books:     book_title, publish_year, and author_name or author_id;
+             optionally times_checked_out
+
+Imported books are available. A book record with is_checked set is
+rejected: a checked out book needs the loan and OpenLoan row behind it, so
+check it out through the repository after importing.
+
+Books name their author either by id or by name. Names are resolved through
+an in-memory map loaded once from the Author table. Authors that do not
+exist yet are inserted once per batch of books, with ids assigned by the
+database, and their ids read back by primary key.
+
+Every batch of authors, patrons or books appends an authors_added,
+patrons_added or books_added event to the outbox in its transaction (see
+outbox.py), so subscribers know to re-read those lists.
+"""
+
+import csv
+import itertools
+import json
+import os
+import tempfile
+import time
+
+from . import repository
+from .backends import get_backend
+
+BATCH_SIZE = 10000
+
+# Outbox event appended with each batch loaded into these tables
+_ADDED_EVENTS = {
+    "Author": "authors_added",
+    "Patron": "patrons_added",
+    "Book": "books_added",
+}
+
+
+def read_records(path):
+    """Yields (line_number, dict) for each record in a .csv or .jsonl file."""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline="", encoding="utf-8") as f:
+        if extension == ".csv":
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+        elif extension in (".jsonl", ".ndjson"):
+            for line_number, line in enumerate(f, start=1):
+                if line.strip():
+                    yield line_number, json.loads(line)
+        else:
+            raise ValueError(f"{path}: expected a .csv or .jsonl file")
+
+
+class ProgressReporter:
+    """Prints rows loaded and rows/sec at most once per `interval` seconds."""
+
+    def __init__(self, label, interval=1.0, out=print):
+        self.label = label
+        self.interval = interval
+        self.out = out
+        self.start = time.perf_counter()
+        self._last = self.start
+        self.rows = 0
+
+    def __call__(self, rows):
+        self.rows = rows
+        now = time.perf_counter()
+        if now - self._last >= self.interval:
+            self._last = now
+            self.out(f"  {self.label}: {rows} rows ({self.rate():.0f} rows/s)")
+
+    def rate(self):
+        elapsed = time.perf_counter() - self.start
+        return self.rows / elapsed if elapsed else 0.0
+
+    def finish(self):
+        elapsed = time.perf_counter() - self.start
+        self.out(
+            f"Imported {self.rows} rows into {self.label} in {elapsed:.1f}s "
+            f"({self.rate():.0f} rows/s)"
+        )
+
+
+class CatalogImporter:
+    """Loads catalog files into the database behind one connection."""
+
+    def __init__(
+        self, conn, backend=None, batch_size=BATCH_SIZE, progress=True, staging_dir=None
+    ):
+        self.conn = conn
+        self.backend = backend or get_backend()
+        self.batch_size = batch_size
+        self.staging_dir = staging_dir
+        self.progress = progress
+        self._author_ids = None
+        # The highest author_id in the map
+        self._max_author_id = 0
+        # True once a book batch has created authors not yet announced
+        self._authors_created = False
+
+    def _load(self, table, columns, rows):
+        reporter = ProgressReporter(table, out=print if self.progress else _quiet)
+        loaded = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == self.batch_size:
+                loaded += self._flush(table, columns, batch)
+                batch = []
+                reporter(loaded)
+        if batch:
+            loaded += self._flush(table, columns, batch)
+            reporter(loaded)
+        reporter.finish()
+        return loaded
+
+    def _flush(self, table, columns, batch):
+        cursor = self.conn.cursor()
+        self.backend.load_rows(cursor, table, columns, batch, self.staging_dir)
+        events = [_ADDED_EVENTS[table]] if table in _ADDED_EVENTS else []
+        if self._authors_created:
+            events.append("authors_added")
+            self._authors_created = False
+        if events:
+            cursor.executemany(
+                "INSERT INTO Outbox (event) VALUES (%s)", [(event,) for event in events]
+            )
+        self.conn.commit()
+        return len(batch)
+
+    def import_authors(self, path):
+        rows = (
+            (_required(path, line, record, "author_name"),)
+            for line, record in read_records(path)
+        )
+        loaded = self._load("Author", ("author_name",), rows)
+        # Names loaded above are not in the map yet
+        self._author_ids = None
+        repository.invalidate_authors()
+        return loaded
+
+    def import_patrons(self, path):
+        rows = (
+            (_required(path, line, record, "patron_name"),)
+            for line, record in read_records(path)
+        )
+        loaded = self._load("Patron", ("patron_name",), rows)
+        repository.invalidate_patrons()
+        return loaded
+
+    def import_addresses(self, path):
+        columns = ("patron_id", "street", "city", "state")
+        rows = (
+            (
+                int(_required(path, line, record, "patron_id")),
+                _required(path, line, record, "street"),
+                _required(path, line, record, "city"),
+                _required(path, line, record, "state"),
+            )
+            for line, record in read_records(path)
+        )
+        return self._load("PatronAddress", columns, rows)
+
+    def import_books(self, path):
+        columns = (
+            "book_title",
+            "publish_year",
+            "times_checked_out",
+            "is_checked",
+            "author_id",
+        )
+        loaded = self._load("Book", columns, self._book_rows(path))
+        repository.invalidate_catalog()
+        return loaded
+
+    def _book_rows(self, path):
+        records = read_records(path)
+        while True:
+            batch = list(itertools.islice(records, self.batch_size))
+            if not batch:
+                return
+            # (row without its author_id, author id or name) per record
+            rows = [
+                (
+                    (
+                        _required(path, line, record, "book_title"),
+                        int(_required(path, line, record, "publish_year")),
+                        int(record.get("times_checked_out") or 0),
+                        _available(path, line, record),
+                    ),
+                    self._author_ref(path, line, record),
+                )
+                for line, record in batch
+            ]
+            self._add_authors([ref for _, ref in rows if not isinstance(ref, int)])
+            for row, ref in rows:
+                yield row + (ref if isinstance(ref, int) else self._author_ids[ref],)
+
+    def _author_ref(self, path, line, record):
+        # The author's id if the record gives one, else its name
+        if record.get("author_id") not in (None, ""):
+            return int(record["author_id"])
+        return _required(path, line, record, "author_name")
+
+    def _add_authors(self, names):
+        """Inserts the `names` not in the author map and maps their new ids."""
+        if self._author_ids is None:
+            self._load_author_map()
+        new = [name for name in dict.fromkeys(names) if name not in self._author_ids]
+        if not new:
+            return
+        cursor = self.conn.cursor()
+        cursor.executemany(
+            "INSERT INTO Author (author_name) VALUES (%s)", [(name,) for name in new]
+        )
+        # The database assigns the ids; they are all above the map's highest,
+        # so only those rows are read back
+        cursor.execute(
+            "SELECT author_id, author_name FROM Author WHERE author_id > %s",
+            (self._max_author_id,),
+        )
+        self._map_authors(cursor)
+        self._authors_created = True
+
+    def _load_author_map(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT author_id, author_name FROM Author")
+        self._author_ids = {}
+        self._map_authors(cursor)
+
+    def _map_authors(self, rows):
+        for author_id, author_name in rows:
+            self._author_ids.setdefault(author_name, author_id)
+            self._max_author_id = max(self._max_author_id, author_id)
+
+
+IMPORT_ORDER = ("authors", "patrons", "addresses", "books")
+
+
+def import_catalog(files, batch_size=BATCH_SIZE, progress=True, backend=None):
+    """
+    Imports each {kind: path} in `files` in foreign key order (authors and
+    patrons before the addresses and books that refer to them). Returns the
+    number of rows loaded per kind.
+    """
+    unknown = set(files) - set(IMPORT_ORDER)
+    if unknown:
+        raise ValueError(f"Unknown import kind(s): {', '.join(sorted(unknown))}")
+    backend = backend or get_backend()
+    with tempfile.TemporaryDirectory(prefix="library-import-") as staging_dir:
+        if not backend.supports_local_infile:
+            staging_dir = None
+        conn = backend.connect(local_infile_dir=staging_dir)
+        try:
+            importer = CatalogImporter(
+                conn, backend, batch_size, progress, staging_dir=staging_dir
+            )
+            loaded = {}
+            for kind in IMPORT_ORDER:
+                if kind in files:
+                    loaded[kind] = getattr(importer, f"import_{kind}")(files[kind])
+            return loaded
+        finally:
+            conn.close()
+
+
+def _required(path, line, record, field):
+    value = record.get(field)
+    if value in (None, ""):
+        raise ValueError(f"{path}:{line}: missing {field}")
+    return value
+
+
+def _available(path, line, record):
+    if int(record.get("is_checked") or 0):
+        raise ValueError(
+            f"{path}:{line}: is_checked books need a loan; "
+            "import them available and check them out"
+        )
+    return 0
+
+
+def _quiet(message):
+    pass
@@ -1,17 +1,20 @@
-from library_app.cli import (
-    search_books_with_input,
-    check_out_book_with_input,
-    return_book_with_input,
-)
+import sys
 
 
 def run():
+    # Imported here so that scripted commands and --help skip the menus
+    from library_app.cli import (
+        search_books_with_input,
+        check_out_book_with_input,
+        return_book_with_input,
+    )
+
     search_books_with_input()
     check_out_book_with_input()
     return_book_with_input()
 
 
-if __name__ == "__main__":
+def interactive():
     run()
 
     repeat = True
@@ -24,3 +27,16 @@ if __name__ == "__main__":
             run()
         else:
             print("Please enter y to leave, or n to stay. Please try again!")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["serve"]:
+        from library_app.server import main as serve
+
+        serve(sys.argv[2:])
+    elif sys.argv[1:]:
+        from library_app.commands import main as run_command
+
+        sys.exit(run_command(sys.argv[1:]))
+    else:
+        interactive()
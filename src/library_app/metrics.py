@@ -0,0 +1,352 @@
+"""
+Instrumentation for repository calls.
+
+With DB_METRICS_ENABLED, every public repository function records its call
+count, a latency histogram, the rows it returned and the database errors it
+hit, and every statement taking DB_SLOW_QUERY_MS or longer goes to the
+slow-query log with its SQL and parameters. snapshot() returns it all as a
+JSON-ready dict; prometheus_text() renders the Prometheus text format.
+
+Span hooks (add_span_hook) receive an OpenTelemetry-style Span for every
+repository call and statement, in-process, without any collector. With
+metrics disabled and no hooks registered, instrumentation costs one check
+per call.
+"""
+
+import bisect
+import contextvars
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from . import config
+
+# Histogram upper bounds in seconds, as in the Prometheus client defaults
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+_current_span = contextvars.ContextVar("library_app_span", default=None)
+_span_hooks = []
+
+
+class Span:
+    """One timed operation: a repository call, or a statement within one."""
+
+    __slots__ = (
+        "name",
+        "kind",
+        "parent",
+        "attributes",
+        "status",
+        "errors",
+        "start_time",
+        "duration",
+        "_start",
+    )
+
+    def __init__(self, name, kind, attributes=None):
+        self.name = name
+        self.kind = kind
+        self.parent = _current_span.get()
+        self.attributes = attributes or {}
+        self.status = "OK"
+        self.errors = 0
+        self.start_time = time.time()
+        self.duration = None
+        self._start = time.perf_counter()
+
+    def set_error(self, err):
+        self.status = "ERROR"
+        self.attributes["error.message"] = str(err)
+
+    def end(self):
+        self.duration = time.perf_counter() - self._start
+
+    def __repr__(self):
+        duration = (
+            f"{self.duration * 1000:.2f}ms" if self.duration is not None else "open"
+        )
+        return f"<Span {self.kind} {self.name} {self.status} {duration}>"
+
+
+class _CallMetrics:
+    __slots__ = ("calls", "errors", "rows", "buckets", "seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        # One count per bucket plus +Inf, not cumulative
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.seconds = 0.0
+
+
+class MetricsRegistry:
+    """Thread-safe per-function counters and the slow-query log."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._calls = {}
+            # Sized from config by the first slow statement, not at import
+            self._slow = None
+            self._slow_total = 0
+
+    def record_call(self, name, seconds, rows, errors):
+        bucket = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            metrics = self._calls.get(name)
+            if metrics is None:
+                metrics = self._calls[name] = _CallMetrics()
+            metrics.calls += 1
+            metrics.errors += errors
+            metrics.rows += rows
+            metrics.buckets[bucket] += 1
+            metrics.seconds += seconds
+
+    def record_slow(self, entry):
+        with self._lock:
+            if self._slow is None:
+                self._slow = deque(maxlen=config.DB_SLOW_QUERY_LOG_SIZE)
+            self._slow.append(entry)
+            self._slow_total += 1
+
+    def snapshot(self):
+        with self._lock:
+            calls = {
+                name: _call_snapshot(metrics) for name, metrics in self._calls.items()
+            }
+            return {
+                "functions": calls,
+                "slow_queries": list(self._slow or ()),
+                "slow_queries_total": self._slow_total,
+            }
+
+
+def _call_snapshot(metrics):
+    cumulative = 0
+    buckets = {}
+    for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), metrics.buckets):
+        cumulative += count
+        buckets[str(bound)] = cumulative
+    return {
+        "calls": metrics.calls,
+        "errors": metrics.errors,
+        "rows": metrics.rows,
+        "mean_ms": metrics.seconds / metrics.calls * 1000 if metrics.calls else 0.0,
+        "latency_seconds": {
+            "count": metrics.calls,
+            "sum": metrics.seconds,
+            "buckets": buckets,
+        },
+    }
+
+
+registry = MetricsRegistry()
+_slow_log_lock = threading.Lock()
+
+
+def active():
+    """True when calls should be timed: metrics are on or a hook is registered."""
+    return config.DB_METRICS_ENABLED or bool(_span_hooks)
+
+
+def add_span_hook(hook):
+    """Calls hook(span) as each repository call or statement span ends."""
+    _span_hooks.append(hook)
+
+
+def remove_span_hook(hook):
+    _span_hooks.remove(hook)
+
+
+def _emit(span):
+    for hook in list(_span_hooks):
+        try:
+            hook(span)
+        except Exception as err:
+            print(f"Error in span hook {hook!r}: {err}")
+
+
+def _row_count(result):
+    return len(result) if isinstance(result, list) else 0
+
+
+def _finish_call(span, rows):
+    span.end()
+    span.attributes["rows"] = rows
+    if config.DB_METRICS_ENABLED:
+        registry.record_call(span.name, span.duration, rows, span.errors)
+    _emit(span)
+
+
+def _instrument_stream(span, rows):
+    # The generator's statements run on each next(), so the call's span is
+    # made current around every step
+    count = 0
+    try:
+        while True:
+            token = _current_span.set(span)
+            try:
+                row = next(rows)
+            except StopIteration:
+                break
+            finally:
+                _current_span.reset(token)
+            count += 1
+            yield row
+    finally:
+        rows.close()
+        _finish_call(span, count)
+
+
+def instrumented(func):
+    """
+    Decorator for public repository functions: records the call's latency,
+    rows returned (list length, or rows yielded by a generator) and errors.
+    """
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not active():
+            return func(*args, **kwargs)
+        span = Span(name, "call")
+        token = _current_span.set(span)
+        try:
+            result = func(*args, **kwargs)
+        except Exception as err:
+            span.set_error(err)
+            _finish_call(span, 0)
+            raise
+        finally:
+            _current_span.reset(token)
+        if inspect.isgenerator(result):
+            return _instrument_stream(span, result)
+        _finish_call(span, _row_count(result))
+        return result
+
+    return wrapper
+
+
+def record_error(err):
+    """Counts a database error against the repository call in progress."""
+    span = _current_span.get()
+    if span is not None:
+        span.errors += 1
+        span.set_error(err)
+
+
+@contextmanager
+def statement(name, sql, params, backend_name):
+    """Times one statement of the current call; use only when active()."""
+    span = Span(
+        name,
+        "statement",
+        {"db.system": backend_name, "db.operation": name, "db.statement": sql},
+    )
+    try:
+        yield span
+    except Exception as err:
+        span.set_error(err)
+        raise
+    finally:
+        span.end()
+        if (
+            config.DB_METRICS_ENABLED
+            and span.duration * 1000 >= config.DB_SLOW_QUERY_MS
+        ):
+            _log_slow(span, params)
+        _emit(span)
+
+
+def _log_slow(span, params):
+    entry = {
+        "time": datetime.fromtimestamp(span.start_time, timezone.utc).isoformat(),
+        "function": span.parent.name if span.parent else None,
+        "statement": span.name,
+        "duration_ms": round(span.duration * 1000, 3),
+        "sql": " ".join(span.attributes["db.statement"].split()),
+        "params": [
+            value if isinstance(value, (int, float, str, type(None))) else str(value)
+            for value in params or ()
+        ],
+        "status": span.status,
+    }
+    registry.record_slow(entry)
+    if config.DB_SLOW_QUERY_LOG:
+        with _slow_log_lock, open(config.DB_SLOW_QUERY_LOG, "a") as log:
+            log.write(json.dumps(entry) + "\n")
+
+
+def snapshot():
+    """Returns per-function metrics and the slow-query log as a dict."""
+    return registry.snapshot()
+
+
+def slow_queries():
+    """Returns the most recent slow statements, oldest first."""
+    return registry.snapshot()["slow_queries"]
+
+
+def reset():
+    """Clears every counter and the in-memory slow-query log."""
+    registry.reset()
+
+
+def prometheus_text():
+    """Renders the metrics in the Prometheus text exposition format."""
+    snap = registry.snapshot()
+    functions = sorted(snap["functions"].items())
+    lines = []
+    for metric, key, help_text in (
+        ("library_repository_calls_total", "calls", "Repository function calls."),
+        (
+            "library_repository_errors_total",
+            "errors",
+            "Database errors hit by repository calls.",
+        ),
+        ("library_repository_rows_total", "rows", "Rows returned by repository calls."),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for name, values in functions:
+            lines.append(f'{metric}{{function="{name}"}} {values[key]}')
+
+    metric = "library_repository_call_duration_seconds"
+    lines.append(f"# HELP {metric} Repository call latency.")
+    lines.append(f"# TYPE {metric} histogram")
+    for name, values in functions:
+        latency = values["latency_seconds"]
+        for bound, count in latency["buckets"].items():
+            lines.append(f'{metric}_bucket{{function="{name}",le="{bound}"}} {count}')
+        lines.append(f'{metric}_sum{{function="{name}"}} {latency["sum"]}')
+        lines.append(f'{metric}_count{{function="{name}"}} {latency["count"]}')
+
+    metric = "library_repository_slow_queries_total"
+    lines.append(f"# HELP {metric} Statements slower than DB_SLOW_QUERY_MS.")
+    lines.append(f"# TYPE {metric} counter")
+    lines.append(f"{metric} {snap['slow_queries_total']}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,8 @@
+"""Creates the original library tables."""
+
+from ..schema import TABLES
+
+
+def up(cursor, backend):
+    for ddl in TABLES:
+        cursor.execute(ddl)
@@ -0,0 +1,16 @@
+"""Adds secondary indexes for the repository's filtered queries."""
+
+INDEXES = [
+    # get_available_books / get_borrowed_books filter on is_checked; including
+    # the title lets the available list be read from the index alone.
+    ("idx_book_is_checked", "Book", ("is_checked", "book_title")),
+    # search_books_by_author
+    ("idx_book_author", "Book", ("author_id",)),
+    # get_patrons_with_book, return_book_transaction and return_books_bulk
+    ("idx_transaction_book_patron", "Transaction", ("book_id", "patron_id")),
+]
+
+
+def up(cursor, backend):
+    for name, table, columns in INDEXES:
+        backend.create_index(cursor, name, table, columns)
@@ -0,0 +1,12 @@
+"""Adds an index that serves keyset pages of books ordered by id."""
+
+INDEXES = [
+    # get_available_books_page / get_borrowed_books_page:
+    # WHERE is_checked = ? AND book_id > ? ORDER BY book_id
+    ("idx_book_is_checked_id", "Book", ("is_checked", "book_id")),
+]
+
+
+def up(cursor, backend):
+    for name, table, columns in INDEXES:
+        backend.create_index(cursor, name, table, columns)
@@ -0,0 +1,5 @@
+"""Adds the full-text BookSearch index over book titles and author names."""
+
+
+def up(cursor, backend):
+    backend.create_book_search(cursor)
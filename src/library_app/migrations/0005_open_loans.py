@@ -0,0 +1,54 @@
+"""
+Adds OpenLoan, one row per checked-out book naming its current holder.
+
+Transaction keeps the full checkout history, which only grows; OpenLoan
+holds just the loans that are still out, so current-holder checks and
+returns are primary key lookups however long the history is. Loans that
+are already out are backfilled from each checked-out book's latest
+Transaction row, with a TransactionRecord so that the return can be dated.
+"""
+
+INDEXES = [
+    # get_borrowed_books_for_patron
+    ("idx_open_loan_patron", "OpenLoan", ("patron_id", "book_id")),
+    # Dating a return updates the record of the loan's transaction
+    ("idx_transaction_record_transaction", "TransactionRecord", ("transaction_id",)),
+]
+
+
+def up(cursor, backend):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS OpenLoan (
+            book_id INT PRIMARY KEY,
+            patron_id INT NOT NULL,
+            transaction_id INT NOT NULL,
+            FOREIGN KEY (book_id) REFERENCES Book(book_id),
+            FOREIGN KEY (patron_id) REFERENCES Patron(patron_id),
+            FOREIGN KEY (transaction_id) REFERENCES Transaction(transaction_id)
+        )
+    """)
+    for name, table, columns in INDEXES:
+        backend.create_index(cursor, name, table, columns)
+
+    cursor.execute("DELETE FROM OpenLoan")
+    cursor.execute("""
+        INSERT INTO OpenLoan (book_id, patron_id, transaction_id)
+        SELECT Transaction.book_id, Transaction.patron_id, Transaction.transaction_id
+        FROM Transaction
+        JOIN (
+            SELECT book_id, MAX(transaction_id) AS transaction_id
+            FROM Transaction
+            GROUP BY book_id
+        ) latest ON Transaction.transaction_id = latest.transaction_id
+        JOIN Book ON Book.book_id = Transaction.book_id
+        WHERE Book.is_checked = 1 AND Transaction.patron_id IS NOT NULL
+    """)
+    # The issue date of a loan taken out before this migration is unknown
+    cursor.execute("""
+        INSERT INTO TransactionRecord (transaction_id)
+        SELECT transaction_id FROM OpenLoan
+        WHERE transaction_id NOT IN (
+            SELECT transaction_id FROM TransactionRecord
+            WHERE transaction_id IS NOT NULL
+        )
+    """)
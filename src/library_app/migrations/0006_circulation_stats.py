@@ -0,0 +1,80 @@
+"""
+Adds circulation summary tables for reporting, maintained by checkout and
+return: checkouts and returns per day, per book and per author.
+
+Existing history is summarized once here. A loan counts as returned when it
+is no longer open; it counts towards a day only if its record is dated.
+library_app.reporting.rebuild_circulation_stats() recomputes the same totals
+in batches.
+"""
+
+INDEXES = [
+    # top_books / top_authors: ORDER BY checked_out DESC
+    ("idx_book_circulation_checked_out", "BookCirculation", ("checked_out", "book_id")),
+    (
+        "idx_author_circulation_checked_out",
+        "AuthorCirculation",
+        ("checked_out", "author_id"),
+    ),
+]
+
+
+def up(cursor, backend):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS DailyCirculation (
+            circulation_date DATE PRIMARY KEY,
+            checked_out INT NOT NULL DEFAULT 0,
+            returned INT NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS BookCirculation (
+            book_id INT PRIMARY KEY,
+            checked_out INT NOT NULL DEFAULT 0,
+            returned INT NOT NULL DEFAULT 0,
+            FOREIGN KEY (book_id) REFERENCES Book(book_id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS AuthorCirculation (
+            author_id INT PRIMARY KEY,
+            checked_out INT NOT NULL DEFAULT 0,
+            returned INT NOT NULL DEFAULT 0,
+            FOREIGN KEY (author_id) REFERENCES Author(author_id)
+        )
+    """)
+    for name, table, columns in INDEXES:
+        backend.create_index(cursor, name, table, columns)
+
+    for table in ("DailyCirculation", "BookCirculation", "AuthorCirculation"):
+        cursor.execute(f"DELETE FROM {table}")
+    cursor.execute("""
+        INSERT INTO DailyCirculation (circulation_date, checked_out, returned)
+        SELECT circulation_date, SUM(checked_out), SUM(returned)
+        FROM (
+            SELECT DATE(date_issue) AS circulation_date, 1 AS checked_out, 0 AS returned
+            FROM TransactionRecord WHERE date_issue IS NOT NULL
+            UNION ALL
+            SELECT DATE(date_return), 0, 1
+            FROM TransactionRecord WHERE date_return IS NOT NULL
+        ) days
+        GROUP BY circulation_date
+    """)
+    cursor.execute("""
+        INSERT INTO BookCirculation (book_id, checked_out, returned)
+        SELECT Transaction.book_id, COUNT(*), COUNT(*) - COUNT(OpenLoan.book_id)
+        FROM Transaction
+        LEFT JOIN OpenLoan
+            ON OpenLoan.book_id = Transaction.book_id
+            AND OpenLoan.transaction_id = Transaction.transaction_id
+        WHERE Transaction.book_id IS NOT NULL
+        GROUP BY Transaction.book_id
+    """)
+    cursor.execute("""
+        INSERT INTO AuthorCirculation (author_id, checked_out, returned)
+        SELECT Book.author_id, SUM(checked_out), SUM(returned)
+        FROM BookCirculation
+        JOIN Book ON Book.book_id = BookCirculation.book_id
+        WHERE Book.author_id IS NOT NULL
+        GROUP BY Book.author_id
+    """)
@@ -0,0 +1,15 @@
+"""
+Adds CatalogChange, a numbered log of writes to Book, Author and Patron kept
+by triggers. Catalog snapshots (catalog.py) refresh from it incrementally.
+"""
+
+
+def up(cursor, backend):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS CatalogChange (
+            change_id INT PRIMARY KEY AUTO_INCREMENT,
+            entity VARCHAR(10) NOT NULL,
+            entity_id INT NOT NULL
+        )
+    """)
+    backend.create_catalog_changes(cursor)
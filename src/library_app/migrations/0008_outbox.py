@@ -0,0 +1,25 @@
+"""
+Adds Outbox, the change events that checkouts, returns and catalog imports
+append in their own transactions, and OutboxCompaction, which records the
+highest event_id compaction has deleted through. Subscribers (outbox.py)
+tail Outbox by event_id.
+"""
+
+
+def up(cursor, backend):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Outbox (
+            event_id INT PRIMARY KEY AUTO_INCREMENT,
+            event VARCHAR(20) NOT NULL,
+            book_id INT,
+            patron_id INT
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS OutboxCompaction (
+            compacted_through INT NOT NULL
+        )
+    """)
+    cursor.execute("SELECT COUNT(*) FROM OutboxCompaction")
+    if not cursor.fetchall()[0][0]:
+        cursor.execute("INSERT INTO OutboxCompaction VALUES (0)")
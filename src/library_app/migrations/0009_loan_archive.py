@@ -0,0 +1,20 @@
+"""
+Adds LoanArchivePartition, the list of monthly LoanArchive_YYYYMM tables that
+archive.py moves old loans into, and an index for reading a patron's history
+from Transaction.
+"""
+
+INDEXES = [
+    # get_patron_history
+    ("idx_transaction_patron", "Transaction", ("patron_id",)),
+]
+
+
+def up(cursor, backend):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS LoanArchivePartition (
+            archive_month INT PRIMARY KEY
+        )
+    """)
+    for name, table, columns in INDEXES:
+        backend.create_index(cursor, name, table, columns)
@@ -0,0 +1,17 @@
+"""
+Adds CatalogChangeCompaction, which records the highest change_id that
+compaction has deleted CatalogChange through. Checkouts and returns log a
+change for every book they touch, so the log is compacted like the outbox
+(catalog.compact_changes()).
+"""
+
+
+def up(cursor, backend):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS CatalogChangeCompaction (
+            compacted_through INT NOT NULL
+        )
+    """)
+    cursor.execute("SELECT COUNT(*) FROM CatalogChangeCompaction")
+    if not cursor.fetchall()[0][0]:
+        cursor.execute("INSERT INTO CatalogChangeCompaction VALUES (0)")
@@ -0,0 +1,15 @@
+"""
+Indexes OpenLoan by transaction_id. Deleting an archived loan's Transaction
+row checks that no OpenLoan row refers to it, which read all of OpenLoan
+without this index.
+"""
+
+INDEXES = [
+    # The OpenLoan.transaction_id foreign key check on archive_loans()
+    ("idx_open_loan_transaction", "OpenLoan", ("transaction_id",)),
+]
+
+
+def up(cursor, backend):
+    for name, table, columns in INDEXES:
+        backend.create_index(cursor, name, table, columns)
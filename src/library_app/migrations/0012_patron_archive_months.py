@@ -0,0 +1,30 @@
+"""
+Adds PatronArchiveMonth, the archive months that hold each patron's loans,
+so that get_patron_history() reads only those archives instead of every
+month ever archived. Loans archived before this migration are listed from
+the archive tables.
+"""
+
+from ..archive import archive_table
+
+
+def up(cursor, backend):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS PatronArchiveMonth (
+            patron_id INT NOT NULL,
+            archive_month INT NOT NULL,
+            PRIMARY KEY (patron_id, archive_month)
+        )
+    """)
+    cursor.execute("DELETE FROM PatronArchiveMonth")
+    cursor.execute("SELECT archive_month FROM LoanArchivePartition")
+    for (month,) in cursor.fetchall():
+        cursor.execute(
+            f"""
+            INSERT INTO PatronArchiveMonth (patron_id, archive_month)
+            SELECT DISTINCT patron_id, %s
+            FROM {archive_table(month)}
+            WHERE patron_id IS NOT NULL
+            """,
+            (month,),
+        )
@@ -0,0 +1,70 @@
+"""
+Versioned schema migrations.
+
+Each module in this package named NNNN_description.py is one migration and
+defines up(cursor, backend). Migrations run in version order and every
+applied version is recorded in the schema_version table, so migrate() only
+runs what is new. Up-migrations must be idempotent: MySQL commits DDL
+implicitly, so a migration interrupted before its version row is written
+will run again.
+"""
+
+import importlib
+import pkgutil
+import re
+
+from ..backends import get_backend
+
+_MODULE_NAME = re.compile(r"^(\d{4})_(\w+)$")
+
+SCHEMA_VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        applied_at DATETIME NOT NULL
+    )
+"""
+
+
+def discover():
+    """Returns (version, name, module) for every migration, ordered by version."""
+    migrations = []
+    for info in pkgutil.iter_modules(__path__):
+        match = _MODULE_NAME.match(info.name)
+        if match:
+            module = importlib.import_module(f"{__name__}.{info.name}")
+            migrations.append((int(match.group(1)), info.name, module))
+    migrations.sort(key=lambda migration: migration[0])
+    return migrations
+
+
+def applied_versions(conn):
+    """Returns the set of migration versions already applied."""
+    cursor = conn.cursor()
+    cursor.execute(SCHEMA_VERSION_TABLE)
+    cursor.execute("SELECT version FROM schema_version")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(conn, backend=None, target=None):
+    """
+    Applies every pending migration up to `target` (default: the latest).
+    Returns the names of the migrations that were applied.
+    """
+    backend = backend or get_backend()
+    done = applied_versions(conn)
+    conn.commit()
+
+    applied = []
+    for version, name, module in discover():
+        if version in done or (target is not None and version > target):
+            continue
+        cursor = conn.cursor()
+        module.up(cursor, backend)
+        cursor.execute(
+            "INSERT INTO schema_version (version, name, applied_at) VALUES (%s, %s, CURRENT_TIMESTAMP)",  # noqa: E501
+            (version, name),
+        )
+        conn.commit()
+        applied.append(name)
+    return applied
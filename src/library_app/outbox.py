@@ -0,0 +1,166 @@
+"""
+Change events, read from the transactional outbox.
+
+Checkouts and returns (single and bulk) append a checked_out or returned
+event naming the book and patron to the Outbox table, and catalog imports
+append authors_added, patrons_added or books_added per batch; each in the
+same transaction as the write it describes, so an event exists exactly when
+its write committed. Events are numbered by event_id.
+
+A Subscriber tails the outbox from an event_id and hands each new event to a
+handler, so a cache or front end can apply the change instead of re-reading
+whole lists. Events are delivered at least once (a handler that raises sees
+the batch again), in event_id order except for events whose transaction
+committed late, which are delivered when they appear (see sequences.py).
+Events for any one book are always delivered in order.
+
+compact() deletes all but the newest OUTBOX_RETAIN_EVENTS events and records
+how far it got in OutboxCompaction. A subscriber that falls further behind
+than that cannot replay what it missed: its on_reset() is called to re-read
+its state, and it carries on from the newest event.
+"""
+
+import threading
+from collections import namedtuple
+
+from . import config, sequences, statements
+from .repository import connection
+from .sequences import BATCH_SIZE, GAP_TIMEOUT
+
+OUTBOX_LOG = sequences.Log(
+    "latest_event",
+    "outbox_compacted_through",
+    "compact_outbox",
+    "mark_outbox_compacted",
+)
+
+Event = namedtuple("Event", "event_id event book_id patron_id")
+
+
+class EventsCompacted(Exception):
+    """Events a subscriber had not read yet were deleted by compact()."""
+
+
+def _value(conn, statement):
+    return statements.execute(conn, statement).fetchall()[0][0]
+
+
+def latest_event_id():
+    """Returns the newest event_id, or 0 if the outbox is empty."""
+    with connection() as conn:
+        return _value(conn, "latest_event")
+
+
+class Subscriber:
+    """
+    Delivers outbox events after `after_id` to handler(event). With no
+    after_id, only events appended from now on are delivered. on_reset() is
+    called when events the subscriber missed have been compacted away;
+    without it, poll() raises EventsCompacted instead.
+    """
+
+    def __init__(self, handler, after_id=None, on_reset=None, batch_size=None):
+        self.handler = handler
+        self.on_reset = on_reset
+        self.batch_size = batch_size or config.OUTBOX_BATCH_SIZE
+        self.position = latest_event_id() if after_id is None else after_id
+        # Skipped event_id -> time.monotonic() when first missed
+        self._gaps = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        """
+        Delivers the next batch of events, and any skipped events that have
+        appeared since. Returns the number delivered.
+        """
+        with connection() as conn:
+            events = [
+                Event(*row)
+                for row in statements.execute(
+                    conn, "outbox_events", (self.position, self.batch_size)
+                ).fetchall()
+            ]
+            # A skipped id is usually a transaction still in flight, but
+            # may have been compacted away
+            if sequences.compacted_past(
+                conn, OUTBOX_LOG, self.position, [events[0].event_id] if events else []
+            ):
+                return self._reset(_value(conn, "latest_event"))
+            late = [
+                Event(*row)
+                for chunk in statements.chunks(sorted(self._gaps))
+                for row in statements.execute(
+                    conn, "outbox_events_by_ids", chunk, count=len(chunk)
+                ).fetchall()
+            ]
+
+        for event in sorted(late + events):
+            self.handler(event)
+        self.position, self._gaps = sequences.advance(
+            self.position,
+            self._gaps,
+            (event.event_id for event in late + events),
+            GAP_TIMEOUT,
+        )
+        return len(late) + len(events)
+
+    def catch_up(self):
+        """
+        Polls until a batch comes back short of batch_size, so a subscriber
+        that fell behind reaches the newest event. Returns the number
+        delivered.
+        """
+        delivered = 0
+        while True:
+            count = self.poll()
+            delivered += count
+            if count < self.batch_size:
+                return delivered
+
+    def _reset(self, newest):
+        if self.on_reset is None:
+            raise EventsCompacted(
+                f"Events after {self.position} were compacted; "
+                "re-read state and subscribe from latest_event_id()"
+            )
+        # Events from here on are delivered again on top of the fresh state
+        self.on_reset()
+        self.position, self._gaps = newest, {}
+        return 0
+
+    def start(self, interval=None):
+        """Tails the outbox on a daemon thread, catching up every interval."""
+        interval = config.OUTBOX_POLL_INTERVAL if interval is None else interval
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(interval,), name="outbox-subscriber", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, interval):
+        while not self._stop.is_set():
+            try:
+                self.catch_up()
+            except Exception as err:
+                # The same events are delivered again on the next try
+                print(f"Outbox subscriber: {err}")
+            self._stop.wait(interval)
+
+    def stop(self):
+        """Stops the thread started by start() and waits for it."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def compact(conn, keep=None, batch_size=BATCH_SIZE, progress=None):
+    """
+    Deletes all but the newest `keep` events (OUTBOX_RETAIN_EVENTS by
+    default) on `conn`, `batch_size` at a time with a commit after each.
+    progress(deleted) is called after every batch. Returns the number of
+    events deleted.
+    """
+    keep = config.OUTBOX_RETAIN_EVENTS if keep is None else keep
+    return sequences.compact(conn, OUTBOX_LOG, keep, batch_size, progress)
@@ -0,0 +1,186 @@
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the checkout timeout."""
+
+
+class PooledConnection:
+    """
+    Wraps a driver connection borrowed from a ConnectionPool.
+    Calling close() hands the connection back to the pool instead of closing it.
+    `state` is a dict that lives as long as the driver connection, for
+    per-connection caches; values with a close() method are closed with it.
+    """
+
+    def __init__(self, pool, conn, created_at, state):
+        self._pool = pool
+        self._conn = conn
+        self._created_at = created_at
+        self.state = state
+
+    @property
+    def driver_connection(self):
+        """The underlying driver connection."""
+        return self._conn
+
+    def cursor(self, *args, **kwargs):
+        return self._conn.cursor(*args, **kwargs)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        self._pool._release(conn, self._created_at, self.state)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    A bounded, thread-safe pool of database connections.
+
+    Up to `size` idle connections are kept open. Under load a further
+    `max_overflow` connections may be opened; these are closed as soon as they
+    are returned. Borrowers wait up to `timeout` seconds for a free slot.
+    """
+
+    def __init__(
+        self,
+        creator,
+        size=5,
+        max_overflow=10,
+        timeout=30.0,
+        pre_ping=True,
+        recycle=3600.0,
+        ping=None,
+    ):
+        self._creator = creator
+        self._size = size
+        self._max_overflow = max_overflow
+        self._timeout = timeout
+        self._pre_ping = pre_ping
+        self._recycle = recycle
+        self._ping = ping or _default_ping
+        self._idle = deque()
+        self._open = 0
+        self._disposed = False
+        self._cond = threading.Condition()
+
+    def connect(self):
+        """Borrows a connection, opening a new one if the pool has room."""
+        deadline = time.monotonic() + self._timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, created_at, state = self._idle.pop()
+                    break
+                if self._open < self._size + self._max_overflow:
+                    self._open += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    raise PoolTimeout(
+                        f"No connection available within {self._timeout}s "
+                        f"(size={self._size}, max_overflow={self._max_overflow})"
+                    )
+
+        try:
+            if conn is not None and not self._is_usable(conn, created_at):
+                _close_quietly(conn, state)
+                conn = None
+            if conn is None:
+                conn, created_at, state = self._creator(), time.monotonic(), {}
+        except BaseException:
+            self._discard()
+            raise
+        return PooledConnection(self, conn, created_at, state)
+
+    def _is_usable(self, conn, created_at):
+        if self._recycle and time.monotonic() - created_at > self._recycle:
+            return False
+        if self._pre_ping:
+            try:
+                return bool(self._ping(conn))
+            except Exception:
+                return False
+        return True
+
+    def _release(self, conn, created_at, state):
+        # Roll back so the next borrower never inherits an open transaction
+        # or a stale repeatable-read snapshot.
+        try:
+            conn.rollback()
+        except Exception:
+            _close_quietly(conn, state)
+            self._discard()
+            return
+
+        with self._cond:
+            if not self._disposed and len(self._idle) < self._size:
+                self._idle.append((conn, created_at, state))
+                self._cond.notify()
+                return
+        _close_quietly(conn, state)
+        self._discard()
+
+    def _discard(self):
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    def dispose(self):
+        """Closes idle connections; borrowed ones are closed when returned."""
+        with self._cond:
+            self._disposed = True
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for conn, _, state in idle:
+            _close_quietly(conn, state)
+
+    def status(self):
+        """Returns a snapshot of pool occupancy."""
+        with self._cond:
+            return {
+                "size": self._size,
+                "max_overflow": self._max_overflow,
+                "open": self._open,
+                "idle": len(self._idle),
+                "checked_out": self._open - len(self._idle),
+            }
+
+
+def _default_ping(conn):
+    return conn.is_connected()
+
+
+def _close_quietly(conn, state=None):
+    # Per-connection state goes first: cached cursors hold the connection
+    for value in (state or {}).values():
+        try:
+            value.close()
+        except Exception:
+            pass
+    if state:
+        state.clear()
+    try:
+        conn.close()
+    except Exception:
+        pass
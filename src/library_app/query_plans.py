@@ -0,0 +1,188 @@
+"""
+Checks that the queries in the statements registry are served by indexes.
+
+Every call in REPOSITORY_CALLS is run once against the configured database
+while its SQL is recorded. Each recorded statement is then EXPLAINed and any
+full table scan is reported. Functions that return a whole table by design
+are exempt. A registry statement that none of the calls ran is reported
+too, so a new query cannot skip the check.
+"""
+
+import inspect
+from contextlib import contextmanager
+from datetime import datetime
+
+from . import archive, catalog, outbox, reporting, repository, statements, typeahead
+from .backends import get_backend
+
+# Stands for the connection find_full_scans() was given in call arguments
+CONNECTION = object()
+
+# Archives every returned loan but the newest
+_ARCHIVE_ALL = (CONNECTION, datetime(9999, 12, 31), None, 0)
+
+
+def _subscribe():
+    # From the start of the outbox, with event 1 missed so it is re-read
+    subscriber = outbox.Subscriber(lambda event: None, after_id=0)
+    subscriber.poll()
+    subscriber._gaps = {1: 0.0}
+    subscriber.poll()
+
+
+def _refresh_snapshot():
+    # Applies every logged change, re-reading each changed row
+    snapshot = catalog.CatalogSnapshot()
+    snapshot.load()
+    snapshot.version = 0
+    snapshot.refresh()
+
+
+# (function, arguments) covering every registry statement, in an order that
+# leaves each call something to read. Functions named by a string are in
+# repository.
+REPOSITORY_CALLS = [
+    ("get_authors", ()),
+    ("get_available_books", ()),
+    ("get_patrons_with_book", (1,)),
+    ("get_borrowed_books_for_patron", (1,)),
+    ("get_loans_for_patron", (1,)),
+    ("get_return_context", (1,)),
+    ("get_patrons", ()),
+    ("get_borrowed_books", ()),
+    ("search_books_by_author", (1,)),
+    ("search_books", ("pride",)),
+    ("check_out_book_transaction", (1, 1)),
+    # Book 1 is out now
+    ("check_out_book_transaction", (2, 1)),
+    ("return_book_transaction", (1, 1)),
+    ("check_out_books_bulk", ([(1, 2), (2, 3)],)),
+    ("return_books_bulk", ([(1, 2), (2, 3)],)),
+    ("iter_authors", ()),
+    ("iter_patrons", ()),
+    ("iter_available_books", ()),
+    ("iter_borrowed_books", ()),
+    ("get_authors_page", (1, 20)),
+    ("get_patrons_page", (1, 20)),
+    ("get_available_books_page", (1, 20)),
+    ("get_borrowed_books_page", (1, 20)),
+    (reporting.top_books, ()),
+    (reporting.top_authors, ()),
+    (reporting.daily_circulation, ()),
+    (typeahead.find_patrons, ("a",)),
+    (typeahead.find_authors, ("a",)),
+    (_refresh_snapshot, ()),
+    # Change 1 as a skipped id, looked up again
+    (catalog.changes_since, (CONNECTION, 0, {1: 0.0})),
+    (_subscribe, ()),
+    (archive.archive_loans, _ARCHIVE_ALL),
+    (archive.get_patron_history, (1,)),
+    (reporting.rebuild_circulation_stats, (CONNECTION,)),
+    (outbox.compact, (CONNECTION, 1)),
+    (catalog.compact_changes, (CONNECTION, 1)),
+]
+
+# These list an entire table, so reading every row is the point. The
+# typeahead and snapshot load every author and patron name.
+FULL_SCAN_ALLOWED = {
+    "get_authors",
+    "get_patrons",
+    "iter_authors",
+    "iter_patrons",
+    "typeahead.find_patrons",
+    "typeahead.find_authors",
+    "query_plans._refresh_snapshot",
+    "reporting.rebuild_circulation_stats",
+}
+
+# Statements that read a one-row table, the row per archive month, or the
+# first `limit` entries of an index in order, which SQLite shows as a scan
+FULL_SCAN_ALLOWED_STATEMENTS = {
+    "archive_months",
+    "outbox_compacted_through",
+    "mark_outbox_compacted",
+    "catalog_changes_compacted_through",
+    "mark_catalog_changes_compacted",
+    "top_books",
+    "top_authors",
+}
+
+
+def call_name(function):
+    """The name a call's problems are reported under."""
+    if isinstance(function, str):
+        return function
+    module = function.__module__.rsplit(".", 1)[-1]
+    return f"{module}.{function.__name__}"
+
+
+@contextmanager
+def recording_statements():
+    """
+    Records (sql, params) for every statement the repository executes.
+    The query cache is bypassed so that every read reaches the database.
+    """
+    recorded = []
+    cache_enabled = repository.query_cache.enabled
+
+    def record(name, sql, params):
+        recorded.append((name, sql, tuple(params or ())))
+
+    statements.observers.append(record)
+    repository.query_cache.enabled = False
+    try:
+        yield recorded
+    finally:
+        statements.observers.remove(record)
+        repository.query_cache.enabled = cache_enabled
+
+
+def find_full_scans(conn, calls=REPOSITORY_CALLS):
+    """
+    Runs each call and EXPLAINs the statements it executed. Returns one dict
+    per offending statement: function, statement, sql and tables. Registry
+    statements that no call ran are returned with function None.
+    """
+    backend = get_backend()
+    cursor = conn.cursor()
+    problems = []
+    ran = set()
+    for function, args in calls:
+        name = call_name(function)
+        if isinstance(function, str):
+            function = getattr(repository, function)
+        args = [conn if arg is CONNECTION else arg for arg in args]
+        with recording_statements() as recorded:
+            result = function(*args)
+            if inspect.isgenerator(result):
+                for _ in result:
+                    pass
+        ran.update(statement for statement, _, _ in recorded)
+        if name in FULL_SCAN_ALLOWED:
+            continue
+        for statement, sql, params in recorded:
+            if statement in FULL_SCAN_ALLOWED_STATEMENTS:
+                continue
+            if sql.lstrip().upper().startswith("INSERT"):
+                continue
+            tables = backend.full_scans(cursor, sql, params)
+            if tables:
+                problems.append(
+                    {
+                        "function": name,
+                        "statement": statement,
+                        "sql": sql.strip(),
+                        "tables": tables,
+                    }
+                )
+    conn.rollback()
+    for statement in sorted(statements.STATEMENTS.keys() - ran):
+        problems.append(
+            {
+                "function": None,
+                "statement": statement,
+                "sql": statements.STATEMENTS[statement].strip(),
+                "tables": [],
+            }
+        )
+    return problems
@@ -0,0 +1,119 @@
+"""
+Read replicas for repository reads.
+
+A ReplicaSet keeps one connection pool per replica and picks a replica for
+each read, round robin or by the lowest recent read latency. A replica that
+fails to connect or to run a read is ejected; once DB_REPLICA_EJECT_SECONDS
+have passed, the next read that would pick it first checks that it connects
+again. Reads fall back to the primary while no replica is healthy.
+"""
+
+import itertools
+import threading
+import time
+
+SELECTIONS = ("round_robin", "least_latency")
+
+# Weight of the newest read in a replica's moving average latency
+_LATENCY_WEIGHT = 0.2
+# least_latency still sends every Nth read round robin, so that a replica
+# that was slow once has its latency measured again
+_EXPLORE_EVERY = 16
+
+
+class Replica:
+    """One replica: its pool, whether it is in service and its read latency."""
+
+    def __init__(self, address, pool):
+        self.address = address
+        self.pool = pool
+        self.ejected_until = None
+        self.last_error = None
+        self.latency = 0.0
+        self.reads = 0
+        self.failures = 0
+
+    def status(self):
+        return {
+            "address": self.address,
+            "healthy": self.ejected_until is None,
+            "reads": self.reads,
+            "failures": self.failures,
+            "latency_ms": round(self.latency * 1000, 3),
+            "last_error": self.last_error,
+        }
+
+
+class ReplicaSet:
+    """Chooses a healthy replica per read and ejects the ones that fail."""
+
+    def __init__(self, replicas, selection="round_robin", eject_seconds=30.0):
+        if selection not in SELECTIONS:
+            raise ValueError(
+                f"Unknown DB_REPLICA_SELECTION {selection!r}; "
+                f"expected one of {', '.join(SELECTIONS)}"
+            )
+        self.replicas = list(replicas)
+        self.selection = selection
+        self.eject_seconds = eject_seconds
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+
+    def choose(self):
+        """Returns a replica to read from, or None to read from the primary."""
+        now = time.monotonic()
+        with self._lock:
+            healthy = [r for r in self.replicas if r.ejected_until is None]
+            due = [
+                r
+                for r in self.replicas
+                if r.ejected_until is not None and r.ejected_until <= now
+            ]
+            # One caller checks each due replica; the rest keep away from it
+            for replica in due:
+                replica.ejected_until = now + self.eject_seconds
+        for replica in due:
+            if self._check(replica):
+                healthy.append(replica)
+        if not healthy:
+            return None
+        turn = next(self._turn)
+        if self.selection == "least_latency" and turn % _EXPLORE_EVERY:
+            return min(healthy, key=lambda replica: replica.latency)
+        return healthy[turn % len(healthy)]
+
+    def _check(self, replica):
+        try:
+            replica.pool.connect().close()
+        except Exception as err:
+            self.eject(replica, err)
+            return False
+        with self._lock:
+            replica.ejected_until = None
+        return True
+
+    def record_read(self, replica, seconds):
+        """Counts a successful read and folds its latency into the average."""
+        with self._lock:
+            replica.reads += 1
+            if replica.reads == 1:
+                replica.latency = seconds
+            else:
+                replica.latency += _LATENCY_WEIGHT * (seconds - replica.latency)
+
+    def eject(self, replica, err):
+        """Takes a replica out of service for eject_seconds after an error."""
+        print(f"Ejecting read replica {replica.address}: {err}")
+        with self._lock:
+            replica.failures += 1
+            replica.last_error = str(err)
+            replica.ejected_until = time.monotonic() + self.eject_seconds
+
+    def status(self):
+        """Returns each replica's health, read count and average latency."""
+        with self._lock:
+            return [replica.status() for replica in self.replicas]
+
+    def dispose(self):
+        for replica in self.replicas:
+            replica.pool.dispose()
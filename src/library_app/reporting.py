@@ -0,0 +1,121 @@
+"""
+Circulation reports: the most borrowed books and authors, and checkouts and
+returns per day.
+
+Reports read summary tables (DailyCirculation, BookCirculation and
+AuthorCirculation) that checkout and return update in the same transaction
+as the loan itself, so every report is a short indexed read however long
+the loan history grows. rebuild_circulation_stats() recomputes the tables
+from the history.
+"""
+
+from collections import defaultdict
+
+from . import repository, statements
+from .archive import archive_months, archive_table
+from .metrics import instrumented
+from .repository import fetch_all, read_query
+
+BATCH_SIZE = 10000
+SUMMARY_TABLES = ("DailyCirculation", "BookCirculation", "AuthorCirculation")
+
+
+@instrumented
+@read_query(ttl="DB_CACHE_TTL_CIRCULATION")
+def top_books(limit=10):
+    """Returns (book_id, book_title, author_name, checkouts), most borrowed first."""
+    return fetch_all("top_books", (limit,))
+
+
+@instrumented
+@read_query(ttl="DB_CACHE_TTL_CIRCULATION")
+def top_authors(limit=10):
+    """Returns (author_id, author_name, checkouts), most borrowed first."""
+    return fetch_all("top_authors", (limit,))
+
+
+@instrumented
+@read_query(ttl="DB_CACHE_TTL_CIRCULATION")
+def daily_circulation(start=None, end=None):
+    """
+    Returns ("YYYY-MM-DD", checkouts, returns) for each day with any
+    circulation between `start` and `end` inclusive (dates or ISO strings).
+    """
+    rows = fetch_all(
+        "daily_circulation", (str(start or "0001-01-01"), str(end or "9999-12-31"))
+    )
+    return [(str(day), checked_out, returned) for day, checked_out, returned in rows]
+
+
+def _add_counts(conn, statement, totals):
+    statements.executemany(
+        conn, statement, [(key, *counts) for key, counts in totals.items()]
+    )
+
+
+def rebuild_circulation_stats(conn, batch_size=BATCH_SIZE, progress=None):
+    """
+    Recomputes the summary tables from the loan history on `conn`, archived
+    loans included, reading it in keyset batches of `batch_size` loans.
+    progress(loans) is called after every batch. Returns the number of loans
+    summarized.
+
+    The tables are cleared and refilled in one transaction: reports keep
+    reading the old totals until it commits, a failure leaves them as they
+    were, and checkouts and returns wait for it on the summary rows.
+    """
+    try:
+        cursor = conn.cursor()
+        for table in SUMMARY_TABLES:
+            cursor.execute(f"DELETE FROM {table}")
+
+        loans = _summarize(conn, "circulation_history", None, batch_size, progress, 0)
+        for month in archive_months(conn):
+            loans = _summarize(
+                conn,
+                "archived_circulation_history",
+                archive_table(month),
+                batch_size,
+                progress,
+                loans,
+            )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    repository.invalidate_reports()
+    return loans
+
+
+def _summarize(conn, statement, table, batch_size, progress, loans):
+    """Adds the loans read by `statement` to the summaries; returns the total."""
+    after_id = 0
+    while True:
+        rows = statements.execute(
+            conn, statement, (after_id, batch_size), table=table
+        ).fetchall()
+        if not rows:
+            return loans
+        # [checkouts, returns] per day, book and author in this batch
+        days = defaultdict(lambda: [0, 0])
+        books = defaultdict(lambda: [0, 0])
+        authors = defaultdict(lambda: [0, 0])
+        for _, book_id, author_id, issued, returned_on, closed in rows:
+            if issued is not None:
+                days[issued][0] += 1
+            # Loans returned before returns were dated count on no day
+            if returned_on is not None:
+                days[returned_on][1] += 1
+            # A loan counts as returned once it is no longer open
+            for totals, key in ((books, book_id), (authors, author_id)):
+                if key is not None:
+                    totals[key][0] += 1
+                    totals[key][1] += int(closed)
+        _add_counts(conn, "add_daily_circulation", days)
+        _add_counts(conn, "add_book_circulation", books)
+        _add_counts(conn, "add_author_circulation", authors)
+
+        after_id = rows[-1][0]
+        loans += len(rows)
+        if progress:
+            progress(loans)
@@ -1,233 +1,910 @@
-import mysql.connector
-from .config import DB_HOST, DB_USER, DB_PASSWORD, DB_NAME
+import contextvars
+import functools
+import inspect
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from . import config, metrics, statements
+from .backends import get_backend
+from .cache import QueryCache
+from .metrics import instrumented
+from .pool import ConnectionPool, PoolTimeout
+from .replicas import Replica, ReplicaSet
+
+_pool = None
+_replicas = None
+_pool_lock = threading.Lock()
+
+# Read-your-writes: when the current thread last committed a write, and
+# whether its reads are pinned to the primary (see read_from_primary)
+_last_write = contextvars.ContextVar("library_app_last_write", default=None)
+_primary_reads = contextvars.ContextVar("library_app_primary_reads", default=False)
+# Whether failed reads raise QueryError (see raise_query_errors)
+_raise_errors = contextvars.ContextVar("library_app_raise_errors", default=False)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+# Field names of the rows the book and patron reads return
+BOOK_COLUMNS = ("book_id", "book_title")
+BORROWED_COLUMNS = ("book_id", "book_title", "author_name")
+BOOK_DETAIL_COLUMNS = (
+    "book_id",
+    "book_title",
+    "author_name",
+    "publish_year",
+    "times_checked_out",
+)
+PATRON_COLUMNS = ("patron_id", "patron_name")
+HISTORY_COLUMNS = (
+    "transaction_id",
+    "book_id",
+    "book_title",
+    "date_issue",
+    "date_return",
+)
+
+
+class _WriteConflict(Exception):
+    """Rows changed between planning and applying a set-based update."""
+
+
+def _query_cache():
+    # Created on first use so that importing the repository reads no settings
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = QueryCache(
+                    max_entries=config.DB_CACHE_MAX_ENTRIES,
+                    enabled=config.DB_CACHE_ENABLED,
+                )
+    return _cache
+
+
+def __getattr__(name):
+    # repository.query_cache is the shared QueryCache
+    if name == "query_cache":
+        return _query_cache()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _new_pool(backend, address=None):
+    return ConnectionPool(
+        functools.partial(backend.connect, address=address),
+        size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_POOL_MAX_OVERFLOW,
+        timeout=config.DB_POOL_TIMEOUT,
+        pre_ping=config.DB_POOL_PRE_PING,
+        recycle=config.DB_POOL_RECYCLE,
+        ping=backend.ping,
+    )
+
+
+def get_pool():
+    """Returns the shared connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _new_pool(get_backend())
+    return _pool
+
+
+def get_replicas():
+    """
+    Returns the ReplicaSet of the configured read replicas, each with its own
+    pool, creating it on first use; None when no replicas are configured.
+    """
+    global _replicas
+    if _replicas is None:
+        with _pool_lock:
+            if _replicas is None:
+                backend = get_backend()
+                _replicas = ReplicaSet(
+                    [
+                        Replica(address, _new_pool(backend, address))
+                        for address in backend.replica_addresses()
+                    ],
+                    selection=config.DB_REPLICA_SELECTION,
+                    eject_seconds=config.DB_REPLICA_EJECT_SECONDS,
+                )
+    return _replicas if _replicas.replicas else None
+
+
+def close_pool():
+    """
+    Closes all pooled primary and replica connections. The next query
+    creates fresh pools.
+    """
+    global _pool, _replicas
+    with _pool_lock:
+        pool, _pool = _pool, None
+        replicas, _replicas = _replicas, None
+    if pool is not None:
+        pool.dispose()
+    if replicas is not None:
+        replicas.dispose()
+
+
+def replica_status():
+    """Returns each read replica's health, read count and latency."""
+    replicas = get_replicas()
+    return replicas.status() if replicas else []
+
+
+@contextmanager
+def read_from_primary():
+    """
+    Sends the reads inside the block to the primary: the current thread's,
+    or the current task's through aio_repository.
+    """
+    token = _primary_reads.set(True)
+    try:
+        yield
+    finally:
+        _primary_reads.reset(token)
+
+
+@contextmanager
+def raise_query_errors():
+    """
+    Makes the cached reads inside the block raise QueryError instead of
+    printing it and returning an empty list, so that a caller such as the
+    HTTP server can tell a failed read from an empty result.
+    """
+    token = _raise_errors.set(True)
+    try:
+        yield
+    finally:
+        _raise_errors.reset(token)
+
+
+def last_write_time():
+    """
+    Returns the wall-clock time (seconds since the epoch) of the current
+    context's last committed write, or None. A server hands it to its client
+    so that the client's next request can read after that write wherever it
+    is served (see read_after_write).
+    """
+    last_write = _last_write.get()
+    if last_write is None:
+        return None
+    return time.time() - (time.monotonic() - last_write)
+
+
+@contextmanager
+def read_after_write(written_at):
+    """
+    Sends the reads inside the block to the primary if `written_at`, a
+    last_write_time() from an earlier request, is within
+    DB_REPLICA_STICKY_SECONDS; None or an older time changes nothing.
+    """
+    # abs(): a time from another host's clock may be slightly ahead of ours
+    if (
+        written_at is not None
+        and abs(time.time() - written_at) < config.DB_REPLICA_STICKY_SECONDS
+    ):
+        with read_from_primary():
+            yield
+    else:
+        yield
+
+
+def adopt_last_write(context):
+    """
+    Carries the last write made in `context`, a contextvars.Context a call
+    ran in on another thread, over to the current context, so that reads
+    after it stick to the primary as if the write had been made here.
+    """
+    last_write = context.get(_last_write)
+    if last_write is not None and last_write != _last_write.get():
+        _last_write.set(last_write)
+
+
+def _read_replica():
+    # None means read from the primary: no replica is configured or healthy,
+    # reads are pinned, or this thread wrote within DB_REPLICA_STICKY_SECONDS
+    replicas = get_replicas()
+    if replicas is None or _primary_reads.get():
+        return None
+    last_write = _last_write.get()
+    if (
+        last_write is not None
+        and time.monotonic() - last_write < config.DB_REPLICA_STICKY_SECONDS
+    ):
+        return None
+    return replicas.choose()
+
+
+def _replica_connection(replica):
+    try:
+        return replica.pool.connect()
+    except (get_backend().Error, PoolTimeout) as err:
+        metrics.record_error(err)
+        get_replicas().eject(replica, err)
+        return None
 
 
 def get_connection():
-    """Establishes and returns a database connection."""
+    """
+    Borrows a database connection from the shared pool.
+    Closing the returned connection hands it back to the pool.
+    """
     try:
-        connection = mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            passwd=DB_PASSWORD,
-            database=DB_NAME,
-        )
-        return connection
-    except mysql.connector.Error as err:
-        print(f"Error connecting to MySQL: {err}")
+        return get_pool().connect()
+    except (get_backend().Error, PoolTimeout) as err:
+        metrics.record_error(err)
+        print(f"Error connecting to database: {err}")
         return None
 
 
-def get_authors():
-    """Returns a list of all authors."""
+class QueryError(Exception):
+    """A read query failed; the message is what the caller should report."""
+
+
+@contextmanager
+def connection():
+    """A pooled connection whose database errors are raised as QueryError."""
     conn = get_connection()
     if not conn:
-        return []
-
+        raise QueryError("Database connection failed")
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT author_id, author_name FROM Author")
-        return cursor.fetchall()
-    except mysql.connector.Error as err:
-        print(f"Error executing SQL query: {err}")
-        return []
+        yield conn
+    except get_backend().Error as err:
+        raise QueryError(f"Error executing SQL query: {err}") from err
     finally:
         conn.close()
 
 
-def get_available_books():
-    """Returns a list of books that are available (not checked out)."""
-    conn = get_connection()
+def _fetch_from_replica(replica, statement, params):
+    conn = _replica_connection(replica)
     if not conn:
-        return []
-
+        return None
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT book_id, book_title FROM Book WHERE is_checked < 1")
-        return cursor.fetchall()
-    except mysql.connector.Error as err:
-        print(f"Error executing SQL query: {err}")
-        return []
+        start = time.perf_counter()
+        rows = statements.execute(conn, statement, params).fetchall()
+        get_replicas().record_read(replica, time.perf_counter() - start)
+        return rows
+    except get_backend().Error as err:
+        metrics.record_error(err)
+        get_replicas().eject(replica, err)
+        return None
     finally:
         conn.close()
 
 
-def get_patrons_with_book(book_id):
-    """Returns a list of patrons who have borrowed a specific book."""
+def fetch_all(statement, params=()):
+    """
+    Runs a registered read statement and returns every row. It runs on a
+    read replica when one is available, else on a pooled primary connection.
+    """
+    replica = _read_replica()
+    if replica is not None:
+        rows = _fetch_from_replica(replica, statement, params)
+        if rows is not None:
+            return rows
+
     conn = get_connection()
     if not conn:
-        return []
+        raise QueryError("Database connection failed")
 
     try:
-        cursor = conn.cursor()
-        query = """
-            SELECT Patron.patron_id, patron_name
-            FROM Patron
-            JOIN Transaction ON Patron.patron_id = Transaction.patron_id
-            WHERE Transaction.book_id = %s
-        """
-        cursor.execute(query, (book_id,))
-        return cursor.fetchall()
-    except mysql.connector.Error as err:
-        print(f"Error executing SQL query: {err}")
-        return []
+        return statements.execute(conn, statement, params).fetchall()
+    except get_backend().Error as err:
+        metrics.record_error(err)
+        raise QueryError(f"Error executing SQL query: {err}") from err
     finally:
         conn.close()
 
 
+def read_query(ttl):
+    """
+    Decorator for repository reads. Results are served from the query cache
+    for as many seconds as the config setting named by `ttl`, read per call.
+    A failed query prints the error and returns an empty list, which is never
+    cached; inside raise_query_errors() it raises QueryError instead.
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # Key the cache on every argument, defaults included, so that
+            # get_authors_page() and get_authors_page(0) share an entry.
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = tuple(bound.arguments.values())
+            try:
+                rows = _query_cache().get_or_load(
+                    func.__name__, key, lambda: func(*key), getattr(config, ttl)
+                )
+            except QueryError as err:
+                if _raise_errors.get():
+                    raise
+                print(err)
+                return []
+            # Callers get their own list so they cannot mutate the cached one
+            return list(rows)
+
+        return wrapper
+
+    return decorator
+
+
+@instrumented
+@read_query(ttl="DB_CACHE_TTL_REFERENCE")
+def get_authors():
+    """Returns a list of all authors."""
+    return fetch_all("authors")
+
+
+@instrumented
+@read_query(ttl="DB_CACHE_TTL_CIRCULATION")
+def get_available_books():
+    """Returns a list of books that are available (not checked out)."""
+    return fetch_all("available_books")
+
+
+@instrumented
+@read_query(ttl="DB_CACHE_TTL_CIRCULATION")
+def get_patrons_with_book(book_id):
+    """Returns the patron currently holding a specific book, if any, as a list."""
+    return fetch_all("patrons_with_book", (book_id,))
+
+
+@instrumented
+@read_query(ttl="DB_CACHE_TTL_CIRCULATION")
+def get_borrowed_books_for_patron(patron_id):
+    """Returns the books a patron currently has out."""
+    return fetch_all("patron_borrowed_books", (patron_id,))
+
+
+@instrumented
+@read_query(ttl="DB_CACHE_TTL_CIRCULATION")
+def get_loans_for_patron(patron_id):
+    """
+    Returns a patron's open loans as (book_id, book_title, author_name,
+    date_issue), ordered by book_id.
+    """
+    return fetch_all("patron_loans", (patron_id,))
+
+
+@instrumented
+@read_query(ttl="DB_CACHE_TTL_CIRCULATION")
+def get_return_context(patron_id):
+    """
+    Returns everything the return flow shows a patron, in one query:
+    (patron_name, book_id, book_title, author_name, date_issue) per open
+    loan. A patron with no open loans gets one row with None in the loan
+    columns, and an unknown patron an empty list.
+    """
+    return fetch_all("return_context", (patron_id,))
+
+
+@instrumented
+@read_query(ttl="DB_CACHE_TTL_REFERENCE")
 def get_patrons():
     """Returns a list of all patrons."""
-    conn = get_connection()
-    if not conn:
-        return []
-
-    try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT patron_id, patron_name FROM Patron")
-        return cursor.fetchall()
-    except mysql.connector.Error as err:
-        print(f"Error executing SQL query: {err}")
-        return []
-    finally:
-        conn.close()
+    return fetch_all("patrons")
 
 
+@instrumented
+@read_query(ttl="DB_CACHE_TTL_CIRCULATION")
 def get_borrowed_books():
     """Returns a list of borrowed books."""
-    conn = get_connection()
-    if not conn:
-        return []
-
-    try:
-        cursor = conn.cursor()
-        query = """
-            SELECT Book.book_id, book_title, author_name
-            FROM Book
-            JOIN Author ON Book.author_id = Author.author_id
-            WHERE is_checked > 0
-        """
-        cursor.execute(query)
-        return cursor.fetchall()
-    except mysql.connector.Error as err:
-        print(f"Error executing SQL query: {err}")
-        return []
-    finally:
-        conn.close()
+    return fetch_all("borrowed_books")
 
 
+@instrumented
+@read_query(ttl="DB_CACHE_TTL_CIRCULATION")
 def search_books_by_author(author_id):
     """Searches for books by a specific author."""
-    conn = get_connection()
-    if not conn:
+    return fetch_all("books_by_author", (author_id,))
+
+
+@read_query(ttl="DB_CACHE_TTL_CIRCULATION")
+def _search_books(terms, limit):
+    return fetch_all("search_books", get_backend().book_search_params(terms, limit))
+
+
+@instrumented
+def search_books(query, limit=None):
+    """
+    Full-text search over book titles and author names, best matches first.
+    Every word in `query` must match, and each word also matches as a prefix
+    ("prid aus" finds Pride and Prejudice by Jane Austen).
+    Returns (book_id, book_title, author_name, publish_year, times_checked_out).
+    """
+    terms = tuple(re.findall(r"\w+", query.lower()))
+    if not terms:
         return []
+    return _search_books(terms, page_size(limit))
+
+
+def _stream(statement, params=(), fetch_size=None):
+    """
+    Yields the rows of a read query without materializing the result, from
+    a read replica when one is available. Rows are pulled from the server
+    `fetch_size` at a time; the connection goes back to its pool once the
+    generator is exhausted or closed.
+    """
+    fetch_size = fetch_size or config.DB_FETCH_SIZE
+    replica = _read_replica()
+    conn = replica and _replica_connection(replica)
+    if not conn:
+        replica = None
+        conn = get_connection()
+    if not conn:
+        return
 
     try:
-        cursor = conn.cursor()
-        query = """
-            SELECT Book.book_id, book_title, author_name, publish_year, times_checked_out
-            FROM Book
-            JOIN Author ON Book.author_id = Author.author_id
-            WHERE Book.author_id = %s
-        """
-        cursor.execute(query, (author_id,))
-        return cursor.fetchall()
-    except mysql.connector.Error as err:
+        cursor = statements.execute_streaming(conn, statement, params)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield from rows
+    except get_backend().Error as err:
+        metrics.record_error(err)
         print(f"Error executing SQL query: {err}")
-        return []
+        if replica is not None:
+            get_replicas().eject(replica, err)
     finally:
         conn.close()
 
 
-def check_out_book_transaction(patron_id, book_id):
+@instrumented
+def iter_authors(fetch_size=None):
+    """Yields every author as (author_id, author_name)."""
+    return _stream("authors", (), fetch_size)
+
+
+@instrumented
+def iter_patrons(fetch_size=None):
+    """Yields every patron as (patron_id, patron_name)."""
+    return _stream("patrons", (), fetch_size)
+
+
+@instrumented
+def iter_available_books(fetch_size=None):
+    """Yields every available book as (book_id, book_title)."""
+    return _stream("available_books", (), fetch_size)
+
+
+@instrumented
+def iter_borrowed_books(fetch_size=None):
+    """Yields every borrowed book as (book_id, book_title, author_name)."""
+    return _stream("borrowed_books", (), fetch_size)
+
+
+# Keyset pagination: each page holds the rows with ids greater than `after_id`,
+# so a page costs an index range scan however deep into the table it is.
+# Pass the last id of one page as `after_id` to fetch the next. A limit of
+# None means DB_PAGE_SIZE.
+
+
+def page_size(limit):
+    """Returns `limit`, or DB_PAGE_SIZE when it is None."""
+    return config.DB_PAGE_SIZE if limit is None else limit
+
+
+@instrumented
+@read_query(ttl="DB_CACHE_TTL_REFERENCE")
+def get_authors_page(after_id=0, limit=None):
+    """Returns up to `limit` authors with author_id greater than `after_id`."""
+    return fetch_all("authors_page", (after_id, page_size(limit)))
+
+
+@instrumented
+@read_query(ttl="DB_CACHE_TTL_REFERENCE")
+def get_patrons_page(after_id=0, limit=None):
+    """Returns up to `limit` patrons with patron_id greater than `after_id`."""
+    return fetch_all("patrons_page", (after_id, page_size(limit)))
+
+
+@instrumented
+@read_query(ttl="DB_CACHE_TTL_CIRCULATION")
+def get_available_books_page(after_id=0, limit=None):
+    """Returns up to `limit` available books with book_id greater than `after_id`."""
+    return fetch_all("available_books_page", (after_id, page_size(limit)))
+
+
+@instrumented
+@read_query(ttl="DB_CACHE_TTL_CIRCULATION")
+def get_borrowed_books_page(after_id=0, limit=None):
+    """Returns up to `limit` borrowed books with book_id greater than `after_id`."""
+    return fetch_all("borrowed_books_page", (after_id, page_size(limit)))
+
+
+def invalidate_books(book_ids, checked_out=False, patron_ids=()):
     """
-    Checks out a book for a patron.
-    Returns a dictionary with status ('success' or 'error') and message.
+    Drops cached reads that a change to the given books' availability makes
+    stale. Pass checked_out=True when the change was a checkout, which also
+    bumps times_checked_out, and the borrowing or returning patrons' ids.
     """
-    conn = get_connection()
-    if not conn:
-        return {"status": "error", "message": "Database connection failed"}
+    book_ids = set(book_ids)
+    if not book_ids:
+        return
+    for name in (
+        "get_available_books",
+        "get_available_books_page",
+        "get_borrowed_books",
+        "get_borrowed_books_page",
+    ):
+        _query_cache().invalidate(name)
+    for book_id in book_ids:
+        _query_cache().invalidate("get_patrons_with_book", (book_id,))
+    for patron_id in set(patron_ids):
+        for name in (
+            "get_borrowed_books_for_patron",
+            "get_loans_for_patron",
+            "get_return_context",
+        ):
+            _query_cache().invalidate(name, (patron_id,))
+    if patron_ids:
+        # Cached per (patron_id, limit), so every limit goes (see archive.py)
+        _query_cache().invalidate("get_patron_history")
+    invalidate_reports()
+    if checked_out:
+        for name in ("search_books_by_author", "_search_books"):
+            _query_cache().invalidate(
+                name, where=lambda rows: any(row[0] in book_ids for row in rows)
+            )
+
+
+def invalidate_patrons():
+    """Drops cached patron lists. Call after inserting or renaming patrons."""
+    _query_cache().invalidate("get_patrons")
+    _query_cache().invalidate("get_patrons_page")
+
+
+def invalidate_authors():
+    """Drops cached author lists. Call after inserting or renaming authors."""
+    _query_cache().invalidate("get_authors")
+    _query_cache().invalidate("get_authors_page")
+
+
+def invalidate_catalog():
+    """Drops every cached book list and search. Call after inserting books."""
+    for name in (
+        "get_available_books",
+        "get_available_books_page",
+        "get_borrowed_books",
+        "get_borrowed_books_page",
+        "search_books_by_author",
+        "_search_books",
+    ):
+        _query_cache().invalidate(name)
+
+
+def invalidate_reports():
+    """Drops cached circulation reports (see reporting.py)."""
+    for name in ("top_books", "top_authors", "daily_circulation"):
+        _query_cache().invalidate(name)
+
+
+def cache_stats():
+    """Returns the query cache's hit, miss and eviction counters."""
+    return _query_cache().stats()
+
+
+def statement_stats():
+    """Returns prepare and execute counts per registered statement."""
+    return statements.stats()
+
+
+def _run_transaction(work, *args):
+    """
+    Runs work(conn, *args) on a pooled connection and returns its result.
+    Deadlocks and lock wait timeouts are retried with exponential backoff;
+    any other database error is reported as an error dictionary.
+    """
+    backend = get_backend()
+    delay = config.DB_RETRY_BACKOFF
+    for attempt in range(1, config.DB_RETRY_ATTEMPTS + 1):
+        conn = get_connection()
+        if not conn:
+            return {"status": "error", "message": "Database connection failed"}
+
+        try:
+            return work(conn, *args)
+        except (backend.Error, _WriteConflict) as err:
+            metrics.record_error(err)
+            retryable = isinstance(err, _WriteConflict) or backend.is_retryable(err)
+            if attempt < config.DB_RETRY_ATTEMPTS and retryable:
+                conn.rollback()
+                time.sleep(delay * random.uniform(0.5, 1.5))
+                delay *= 2
+                continue
+            return {"status": "error", "message": f"Error executing SQL query: {err}"}
+        finally:
+            conn.close()
+
+
+def _commit(conn):
+    """
+    Commits a write made through _run_transaction. Only a committed write
+    sends this context's later reads to the primary.
+    """
+    conn.commit()
+    _last_write.set(time.monotonic())
+
+
+def _count_circulation(conn, book_ids, checked_out):
+    """Adds checkouts or returns of `book_ids` to today's and the summary rows."""
+    counts = (1, 0) if checked_out else (0, 1)
+    statements.execute(
+        conn,
+        "count_daily_circulation",
+        tuple(count * len(book_ids) for count in counts),
+    )
+    statements.executemany(
+        conn, "add_book_circulation", [(book_id, *counts) for book_id in book_ids]
+    )
+    statements.executemany(
+        conn, "count_author_circulation", [(*counts, book_id) for book_id in book_ids]
+    )
+
+
+def _append_events(conn, event, pairs):
+    """
+    Appends one outbox event per (book_id, patron_id) pair (see outbox.py).
+    Called after the books' rows are locked, so that events for one book are
+    numbered in the order their transactions commit.
+    """
+    statements.executemany(
+        conn,
+        "append_event",
+        [(event, book_id, patron_id) for book_id, patron_id in pairs],
+    )
 
-    try:
-        cursor = conn.cursor()
-        # Check if the book is available
-        cursor.execute(
-            "SELECT book_title, is_checked FROM Book WHERE book_id = %s", (book_id,)
-        )
-        book_data = cursor.fetchone()
 
-        if not book_data:
+def _check_out_book(conn, patron_id, book_id):
+    # Reserve the book only if it is still available. The row lock taken by
+    # the update makes this safe against concurrent checkouts.
+    cursor = statements.execute(conn, "reserve_book", (book_id,))
+
+    if cursor.rowcount != 1:
+        rows = statements.execute(conn, "book_title", (book_id,)).fetchall()
+        if not rows:
             return {"status": "error", "message": "Book not found."}
+        return {
+            "status": "error",
+            "message": f"{rows[0][0]} is not available for checkout.",
+        }
 
-        book_title, is_checked = book_data
+    # Create a transaction record (assuming librarian_id 1 for now)
+    transaction_id = statements.execute(
+        conn, "insert_loan", (book_id, patron_id)
+    ).lastrowid
+    statements.execute(conn, "insert_loan_record", (transaction_id,))
+    statements.execute(conn, "open_loan", (book_id, patron_id, transaction_id))
+    _count_circulation(conn, [book_id], checked_out=True)
+    _append_events(conn, "checked_out", [(book_id, patron_id)])
 
-        if is_checked != 0:
-            return {
-                "status": "error",
-                "message": f"{book_title} is not available for checkout.",
-            }
+    _commit(conn)
+    invalidate_books([book_id], checked_out=True, patron_ids=[patron_id])
+    return {"status": "success", "message": "Book checked out successfully."}
 
-        # Reserve the book
-        cursor.execute(
-            "UPDATE Book SET times_checked_out = times_checked_out + 1, is_checked = 1 WHERE book_id = %s",  # noqa: E501
-            (book_id,),
-        )
 
-        # Create a transaction record (assuming librarian_id 1 for now)
-        cursor.execute(
-            "INSERT INTO Transaction (librarian_id, book_id, patron_id) VALUES (1, %s, %s)",  # noqa: E501
-            (book_id, patron_id),
-        )
+@instrumented
+def check_out_book_transaction(patron_id, book_id):
+    """
+    Checks out a book for a patron.
+    Returns a dictionary with status ('success' or 'error') and message.
+    """
+    return _run_transaction(_check_out_book, patron_id, book_id)
 
-        conn.commit()
-        return {"status": "success", "message": "Book checked out successfully."}
 
-    except mysql.connector.Error as err:
-        return {"status": "error", "message": f"Error executing SQL query: {err}"}
-    finally:
-        conn.close()
+def _return_book(conn, patron_id, book_id):
+    # Check if the book is currently borrowed by the specified patron
+    rows = statements.execute(conn, "loan_title", (book_id, patron_id)).fetchall()
+
+    if not rows:
+        return {
+            "status": "error",
+            "message": "Book is not borrowed by the specified patron or transaction record not found.",  # noqa: E501
+        }
 
+    # Only one concurrent return can delete the open loan
+    statements.execute(conn, "close_loan_record", (book_id, patron_id))
+    cursor = statements.execute(conn, "close_loan", (book_id, patron_id))
+    if cursor.rowcount != 1:
+        return {"status": "error", "message": "Book is already available."}
+    statements.execute(conn, "release_book", (book_id,))
+    _count_circulation(conn, [book_id], checked_out=False)
+    _append_events(conn, "returned", [(book_id, patron_id)])
 
+    _commit(conn)
+    invalidate_books([book_id], patron_ids=[patron_id])
+    return {
+        "status": "success",
+        "message": f"{rows[0][0]} has been successfully returned.",
+    }
+
+
+@instrumented
 def return_book_transaction(patron_id, book_id):
     """
     Returns a book from a patron.
     Returns a dictionary with status ('success' or 'error') and message.
     """
-    conn = get_connection()
-    if not conn:
-        return {"status": "error", "message": "Database connection failed"}
+    return _run_transaction(_return_book, patron_id, book_id)
+
+
+def _fetch_books(conn, book_ids):
+    """Returns {book_id: (book_title, is_checked)} for the given ids."""
+    books = {}
+    for chunk in statements.chunks(set(book_ids)):
+        cursor = statements.execute(conn, "books_by_ids", chunk, count=len(chunk))
+        for book_id, book_title, is_checked in cursor.fetchall():
+            books[book_id] = (book_title, is_checked)
+    return books
+
+
+def _known_patrons(conn, patron_ids):
+    """Returns the ids among `patron_ids` that have a Patron row."""
+    known = set()
+    for chunk in statements.chunks(set(patron_ids)):
+        cursor = statements.execute(conn, "known_patrons", chunk, count=len(chunk))
+        known.update(patron_id for patron_id, in cursor.fetchall())
+    return known
+
+
+def _update_books(conn, statement, book_ids):
+    """Applies one set-based update and fails if any targeted row had changed."""
+    updated = 0
+    for chunk in statements.chunks(book_ids):
+        cursor = statements.execute(conn, statement, chunk, count=len(chunk))
+        updated += cursor.rowcount
+    if updated != len(book_ids):
+        raise _WriteConflict(f"expected {len(book_ids)} rows, updated {updated}")
+
+
+def _check_out_books(conn, items):
+    books = _fetch_books(conn, [book_id for _, book_id in items])
+    # Checked up front: an unknown patron would fail the whole batch's
+    # inserts on the foreign key
+    patrons = _known_patrons(conn, [patron_id for patron_id, _ in items])
+
+    results = []
+    reserved = []
+    for patron_id, book_id in items:
+        if patron_id not in patrons:
+            results.append({"status": "error", "message": "Patron not found."})
+            continue
+        if book_id not in books:
+            results.append({"status": "error", "message": "Book not found."})
+            continue
+        book_title, is_checked = books[book_id]
+        if is_checked != 0:
+            results.append(
+                {
+                    "status": "error",
+                    "message": f"{book_title} is not available for checkout.",
+                }
+            )
+            continue
+        # Later items for the same book see it as checked out
+        books[book_id] = (book_title, 1)
+        reserved.append((book_id, patron_id))
+        results.append(
+            {"status": "success", "message": "Book checked out successfully."}
+        )
 
-    try:
-        cursor = conn.cursor()
-        # Check if the book is borrowed by the specified patron
-        query = """
-            SELECT Book.book_title, Transaction.patron_id, Book.is_checked
-            FROM Transaction
-            JOIN Book ON Transaction.book_id = Book.book_id
-            WHERE Transaction.book_id = %s AND Transaction.patron_id = %s
-        """
-        cursor.execute(query, (book_id, patron_id))
-        transaction_data = cursor.fetchone()
-
-        if not transaction_data:
-            return {
-                "status": "error",
-                "message": "Book is not borrowed by the specified patron or transaction record not found.",  # noqa: E501
+    if reserved:
+        book_ids = [book_id for book_id, _ in reserved]
+        _update_books(conn, "reserve_books", book_ids)
+        statements.executemany(conn, "insert_loan", reserved)
+        # executemany() reports no ids, but each book is reserved only once
+        # here, so its newest transaction is the loan just inserted
+        loans = {}
+        for chunk in statements.chunks(book_ids):
+            cursor = statements.execute(conn, "latest_loans", chunk, count=len(chunk))
+            loans.update(cursor.fetchall())
+        statements.executemany(
+            conn, "insert_loan_record", [(loans[book_id],) for book_id in book_ids]
+        )
+        statements.executemany(
+            conn,
+            "open_loan",
+            [(book_id, patron_id, loans[book_id]) for book_id, patron_id in reserved],
+        )
+        _count_circulation(conn, book_ids, checked_out=True)
+        _append_events(conn, "checked_out", reserved)
+        _commit(conn)
+        invalidate_books(
+            book_ids,
+            checked_out=True,
+            patron_ids=[patron_id for _, patron_id in reserved],
+        )
+    return results
+
+
+def _return_books(conn, items):
+    book_ids = [book_id for _, book_id in items]
+    books = _fetch_books(conn, book_ids)
+
+    borrowers = {}
+    for chunk in statements.chunks(set(book_ids)):
+        cursor = statements.execute(
+            conn, "open_loans_by_books", chunk, count=len(chunk)
+        )
+        borrowers.update(cursor.fetchall())
+
+    results = []
+    returned = []
+    returned_ids = set()
+    for patron_id, book_id in items:
+        if book_id in returned_ids:
+            results.append({"status": "error", "message": "Book is already available."})
+            continue
+        if book_id not in books or borrowers.get(book_id) != patron_id:
+            results.append(
+                {
+                    "status": "error",
+                    "message": "Book is not borrowed by the specified patron or transaction record not found.",  # noqa: E501
+                }
+            )
+            continue
+        book_title, is_checked = books[book_id]
+        if is_checked != 1:
+            results.append({"status": "error", "message": "Book is already available."})
+            continue
+        # Later items for the same book see it as returned
+        returned_ids.add(book_id)
+        returned.append((book_id, patron_id))
+        results.append(
+            {
+                "status": "success",
+                "message": f"{book_title} has been successfully returned.",
             }
+        )
 
-        book_title, retrieved_patron_id, is_checked = transaction_data
+    if returned:
+        book_ids = [book_id for book_id, _ in returned]
+        for chunk in statements.chunks(book_ids):
+            statements.execute(conn, "close_loan_records", chunk, count=len(chunk))
+        _update_books(conn, "close_loans", book_ids)
+        _update_books(conn, "release_books", book_ids)
+        _count_circulation(conn, book_ids, checked_out=False)
+        _append_events(conn, "returned", returned)
+        _commit(conn)
+        invalidate_books(book_ids, patron_ids=[patron_id for _, patron_id in returned])
+    return results
+
+
+def _run_bulk(work, items):
+    items = list(items)
+    if not items:
+        return []
+    results = _run_transaction(work, items)
+    if isinstance(results, dict):
+        # The whole transaction failed, so every item shares the error
+        return [dict(results) for _ in items]
+    return results
 
-        if is_checked <= 0:
-            return {"status": "error", "message": "Book is already available."}
 
-        # Update book status to "available"
-        cursor.execute("UPDATE Book SET is_checked = 0 WHERE book_id = %s", (book_id,))
-        conn.commit()
+@instrumented
+def check_out_books_bulk(items):
+    """
+    Checks out many books in a single transaction.
+    Takes (patron_id, book_id) pairs and returns one status dictionary per pair,
+    in the same order and shape as check_out_book_transaction().
+    """
+    return _run_bulk(_check_out_books, items)
 
-        return {
-            "status": "success",
-            "message": f"{book_title} has been successfully returned.",
-        }
 
-    except mysql.connector.Error as err:
-        return {"status": "error", "message": f"Error executing SQL query: {err}"}
-    finally:
-        conn.close()
+@instrumented
+def return_books_bulk(items):
+    """
+    Returns many books in a single transaction.
+    Takes (patron_id, book_id) pairs and returns one status dictionary per pair,
+    in the same order and shape as return_book_transaction().
+    """
+    return _run_bulk(_return_books, items)
@@ -0,0 +1,144 @@
+"""
+Table definitions and seed data shared by every storage backend.
+
+DDL is written in the MySQL dialect; backends that speak another dialect
+translate it the same way they translate repository queries. The tables are
+created by migrations/0001_initial_schema.py; later schema changes belong in
+new migrations rather than here.
+"""
+
+TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS Author (
+        author_id int PRIMARY KEY AUTO_INCREMENT,
+        author_name VARCHAR(50) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Book (
+        book_id INT PRIMARY KEY AUTO_INCREMENT,
+        book_title VARCHAR(50) NOT NULL,
+        publish_year INT NOT NULL,
+        times_checked_out INT NOT NULL,
+        is_checked INT NOT NULL,
+        author_id INT,
+        FOREIGN KEY (author_id) REFERENCES Author(author_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Librarian (
+        librarian_id INT PRIMARY KEY AUTO_INCREMENT,
+        librarian_name VARCHAR(50) NOT NULL,
+        book_id INT,
+        FOREIGN KEY (book_id) REFERENCES Book(book_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Vendor (
+        vendor_name VARCHAR(50) NOT NULL,
+        book_id INT,
+        FOREIGN KEY (book_id) REFERENCES Book(book_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Patron (
+        patron_id INT PRIMARY KEY AUTO_INCREMENT,
+        patron_name VARCHAR(50) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS PatronAddress (
+        patron_address_id INT PRIMARY KEY AUTO_INCREMENT,
+        patron_id INT,
+        street VARCHAR(50) NOT NULL,
+        city VARCHAR(50) NOT NULL,
+        state VARCHAR(50) NOT NULL,
+        FOREIGN KEY (patron_id) REFERENCES Patron(patron_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Transaction (
+        transaction_id INT PRIMARY KEY AUTO_INCREMENT,
+        librarian_id INT,
+        book_id INT,
+        patron_id INT,
+        FOREIGN KEY (librarian_id) REFERENCES Librarian(librarian_id),
+        FOREIGN KEY (book_id) REFERENCES Book(book_id),
+        FOREIGN KEY (patron_id) REFERENCES Patron(patron_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS TransactionRecord (
+        record_id INT PRIMARY KEY AUTO_INCREMENT,
+        date_issue DATETIME,
+        date_return DATETIME,
+        transaction_id INT,
+        FOREIGN KEY (transaction_id) REFERENCES Transaction(transaction_id)
+    )
+    """,
+]
+
+# (table, insert statement, rows), in foreign-key order.
+SEED_DATA = [
+    (
+        "Author",
+        "INSERT INTO Author (author_name) VALUES (%s)",
+        [
+            ("Jane Austen",),
+            ("Charles Dickens",),
+            ("J.K. Rowling",),
+            ("Mark Twain",),
+            ("William Shakespeare",),
+        ],
+    ),
+    (
+        "Book",
+        "INSERT INTO Book (book_title, publish_year, times_checked_out, is_checked, author_id) VALUES (%s, %s, %s, %s, %s)",  # noqa: E501
+        [
+            ("Pride and Prejudice", 1813, 10, 0, 1),
+            ("Great Expectations", 1861, 8, 0, 2),
+            ("Harry Potter and the Philosopher's Stone", 1997, 15, 0, 3),
+            ("The Adventures of Tom Sawyer", 1876, 5, 0, 4),
+            ("Romeo and Juliet", 1597, 12, 0, 5),
+        ],
+    ),
+    (
+        "Librarian",
+        "INSERT INTO Librarian (librarian_name, book_id) VALUES (%s, %s)",
+        [("John Smith", 1), ("Emma Johnson", 2), ("Michael Williams", 3)],
+    ),
+    (
+        "Vendor",
+        "INSERT INTO Vendor (vendor_name, book_id) VALUES (%s, %s)",
+        [("Book Supplier A", 2), ("Book Supplier B", 4), ("Book Supplier C", 5)],
+    ),
+    (
+        "Patron",
+        "INSERT INTO Patron (patron_name) VALUES (%s)",
+        [
+            ("Alice Smith",),
+            ("Bob Johnson",),
+            ("Charlie Williams",),
+        ],
+    ),
+    (
+        "PatronAddress",
+        "INSERT INTO PatronAddress (patron_id, street, city, state) VALUES (%s, %s, %s, %s)",  # noqa: E501
+        [
+            (1, "123 Main St", "Cityville", "State A"),
+            (2, "456 Elm St", "Townsville", "State B"),
+            (3, "789 Oak St", "Villagetown", "State C"),
+        ],
+    ),
+]
+
+
+def populate(conn):
+    """Inserts the seed rows into each table that is still empty."""
+    cursor = conn.cursor()
+    for table, insert, rows in SEED_DATA:
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        if cursor.fetchone()[0] == 0:
+            print(f"Populating {table} table...")
+            cursor.executemany(insert, rows)
+            conn.commit()
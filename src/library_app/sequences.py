@@ -0,0 +1,89 @@
+"""
+Following a log table numbered by an AUTO_INCREMENT id.
+
+Ids are handed out at insert but become visible at commit, so a reader can
+see an id before an older one from a transaction still in flight. A reader
+that only asked for ids above the highest it had seen would miss the older
+one for good. advance() moves the reader's position past the ids it has
+read and remembers every id it skipped as a gap; the caller looks the gaps
+up again on later reads until they appear or GAP_TIMEOUT seconds pass (a
+rolled-back insert never appears).
+
+compact() deletes all but the newest entries of such a log in batches and
+records how far it got, so a reader can tell that entries it had not read
+yet were deleted (compacted_past()) and re-read its state instead.
+"""
+
+import time
+from collections import namedtuple
+
+from . import statements
+
+GAP_TIMEOUT = 60.0
+BATCH_SIZE = 10000
+
+# The statements that read and compact one log: its highest id, the id it
+# has been compacted through, the range delete, and the update recording it
+Log = namedtuple("Log", "latest compacted_through compact mark_compacted")
+
+
+def advance(position, gaps, ids, timeout=GAP_TIMEOUT):
+    """
+    Returns (position, gaps) after reading `ids`, where gaps maps each
+    skipped id to the time.monotonic() it was first missed. Ids at or below
+    `position` fill gaps.
+    """
+    now = time.monotonic()
+    seen = set(ids)
+    gaps = {
+        missing: since
+        for missing, since in gaps.items()
+        if missing not in seen and now - since < timeout
+    }
+    expected = position + 1
+    for read_id in sorted(seen):
+        if read_id < expected:
+            continue
+        for missing in range(expected, read_id):
+            gaps[missing] = now
+        expected = read_id + 1
+    return expected - 1, gaps
+
+
+def _value(conn, statement):
+    return statements.execute(conn, statement).fetchall()[0][0]
+
+
+def compacted_past(conn, log, position, ids):
+    """
+    True if entries after `position` were compacted away, given the `ids`
+    just read after it. Only a skipped id can have been deleted, so the
+    compaction mark is read only then.
+    """
+    ids = sorted(ids)
+    if not ids or ids[0] <= position + 1:
+        return False
+    return _value(conn, log.compacted_through) > position
+
+
+def compact(conn, log, keep, batch_size=BATCH_SIZE, progress=None):
+    """
+    Deletes all but the newest `keep` entries of `log` on `conn`,
+    `batch_size` ids at a time with a commit after each. progress(deleted)
+    is called after every batch. Returns the number of entries deleted.
+    """
+    if keep < 1:
+        # MySQL before 8.0 restarts AUTO_INCREMENT after the highest id left
+        # in the table, so the newest entry must stay
+        raise ValueError("keep must be at least 1")
+    compacted = _value(conn, log.compacted_through)
+    through = _value(conn, log.latest) - keep
+    deleted = 0
+    for start in range(compacted, through, batch_size):
+        end = min(start + batch_size, through)
+        deleted += statements.execute(conn, log.compact, (start, end)).rowcount
+        statements.execute(conn, log.mark_compacted, (end,))
+        conn.commit()
+        if progress:
+            progress(deleted)
+    return deleted
@@ -0,0 +1,528 @@
+"""
+JSON HTTP API over the repository, built on the standard library.
+
+Routes:
+    GET  /health                             read replica health, if any
+    GET  /metrics                            Prometheus text (DB_METRICS_ENABLED)
+    GET  /metrics.json                       metrics and slow-query log as JSON
+    GET  /books?after_id=&limit=             available books, one page
+    GET  /books/borrowed?after_id=&limit=    borrowed books, one page
+    GET  /books/search?q=&limit=             full-text search
+    GET  /books/<book_id>/patrons            the patron holding a book
+    GET  /authors/<author_id>/books          books by an author
+    GET  /patrons?after_id=&limit=           patrons, one page
+    GET  /patrons/<patron_id>/books          books a patron has out
+    GET  /patrons/<patron_id>/history?limit= a patron's loans, archived too
+    POST /checkout  {"patron_id": 1, "book_id": 2}
+    POST /return    {"patron_id": 1, "book_id": 2}
+
+Checkout and return answer with the repository's status dictionary: 200 on
+success, 409 when the book is not available or not borrowed by the patron,
+500 when a query fails and 503 when the database is unreachable. Reads that
+fail answer 500 or 503 the same way rather than an empty list. Request bodies
+over SERVE_MAX_BODY_BYTES answer 413. All workers share the repository's
+connection pool.
+
+Read-your-writes follows the client, not the worker thread: a request that
+commits a write answers with a `library_last_write` cookie, and requests
+carrying it read from the primary for DB_REPLICA_STICKY_SECONDS after the
+write, whichever worker serves them.
+"""
+
+import argparse
+import contextvars
+import json
+import math
+import queue
+import re
+import selectors
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.cookies import CookieError, SimpleCookie
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from . import archive, config, metrics, repository
+from .repository import (
+    BOOK_COLUMNS,
+    BOOK_DETAIL_COLUMNS,
+    BORROWED_COLUMNS,
+    HISTORY_COLUMNS,
+    PATRON_COLUMNS,
+    QueryError,
+)
+
+# The most rows any one request may ask for
+MAX_LIMIT = 1000
+
+# Carries repository.last_write_time() from a write to the client's next reads
+LAST_WRITE_COOKIE = "library_last_write"
+
+
+class BadRequest(Exception):
+    """The request is malformed; the message is sent back to the client."""
+
+    status = HTTPStatus.BAD_REQUEST
+
+
+class PayloadTooLarge(BadRequest):
+    """The request body is over SERVE_MAX_BODY_BYTES."""
+
+    status = HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+
+
+def _rows(columns, rows):
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def _int_param(params, name, default=None):
+    values = params.get(name)
+    if not values:
+        if default is None:
+            raise BadRequest(f"{name} is required")
+        return default
+    try:
+        return int(values[0])
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer") from None
+
+
+def _limit_param(params):
+    limit = _int_param(params, "limit", config.DB_PAGE_SIZE)
+    if not 1 <= limit <= MAX_LIMIT:
+        raise BadRequest(f"limit must be between 1 and {MAX_LIMIT}")
+    return limit
+
+
+def _page_args(params):
+    return _int_param(params, "after_id", 0), _limit_param(params)
+
+
+def _circulation_args(body):
+    try:
+        return int(body["patron_id"]), int(body["book_id"])
+    except (KeyError, TypeError, ValueError):
+        raise BadRequest("patron_id and book_id must be integers") from None
+
+
+def _error_status(message):
+    # The repository reports database failures with these messages
+    if message == "Database connection failed":
+        return HTTPStatus.SERVICE_UNAVAILABLE
+    if message.startswith("Error executing SQL query"):
+        return HTTPStatus.INTERNAL_SERVER_ERROR
+    return None
+
+
+def _status_result(result):
+    if result["status"] == "success":
+        return HTTPStatus.OK, result
+    # Anything else is a business rule, e.g. the book is not available
+    return _error_status(result["message"]) or HTTPStatus.CONFLICT, result
+
+
+def health(params):
+    payload = {"status": "ok"}
+    replicas = repository.replica_status()
+    if replicas:
+        payload["replicas"] = replicas
+    return HTTPStatus.OK, payload
+
+
+def prometheus_metrics(params):
+    return HTTPStatus.OK, metrics.prometheus_text()
+
+
+def metrics_snapshot(params):
+    return HTTPStatus.OK, metrics.snapshot()
+
+
+def list_available_books(params):
+    rows = repository.get_available_books_page(*_page_args(params))
+    return HTTPStatus.OK, _rows(BOOK_COLUMNS, rows)
+
+
+def list_borrowed_books(params):
+    rows = repository.get_borrowed_books_page(*_page_args(params))
+    return HTTPStatus.OK, _rows(BORROWED_COLUMNS, rows)
+
+
+def search_books(params):
+    query = (params.get("q") or [""])[0]
+    rows = repository.search_books(query, _limit_param(params))
+    return HTTPStatus.OK, _rows(BOOK_DETAIL_COLUMNS, rows)
+
+
+def book_patrons(params, book_id):
+    rows = repository.get_patrons_with_book(int(book_id))
+    return HTTPStatus.OK, _rows(PATRON_COLUMNS, rows)
+
+
+def author_books(params, author_id):
+    rows = repository.search_books_by_author(int(author_id))
+    return HTTPStatus.OK, _rows(BOOK_DETAIL_COLUMNS, rows)
+
+
+def list_patrons(params):
+    rows = repository.get_patrons_page(*_page_args(params))
+    return HTTPStatus.OK, _rows(PATRON_COLUMNS, rows)
+
+
+def patron_books(params, patron_id):
+    rows = repository.get_borrowed_books_for_patron(int(patron_id))
+    return HTTPStatus.OK, _rows(BORROWED_COLUMNS, rows)
+
+
+def patron_history(params, patron_id):
+    rows = archive.get_patron_history(int(patron_id), _limit_param(params))
+    return HTTPStatus.OK, _rows(HISTORY_COLUMNS, rows)
+
+
+def check_out(body):
+    return _status_result(
+        repository.check_out_book_transaction(*_circulation_args(body))
+    )
+
+
+def return_book(body):
+    return _status_result(repository.return_book_transaction(*_circulation_args(body)))
+
+
+GET_ROUTES = [
+    (re.compile(r"/health"), health),
+    (re.compile(r"/metrics"), prometheus_metrics),
+    (re.compile(r"/metrics\.json"), metrics_snapshot),
+    (re.compile(r"/books"), list_available_books),
+    (re.compile(r"/books/borrowed"), list_borrowed_books),
+    (re.compile(r"/books/search"), search_books),
+    (re.compile(r"/books/(\d+)/patrons"), book_patrons),
+    (re.compile(r"/authors/(\d+)/books"), author_books),
+    (re.compile(r"/patrons"), list_patrons),
+    (re.compile(r"/patrons/(\d+)/books"), patron_books),
+    (re.compile(r"/patrons/(\d+)/history"), patron_history),
+]
+POST_ROUTES = {
+    "/checkout": check_out,
+    "/return": return_book,
+}
+
+
+class LibraryRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves one request from a kept-alive _Connection per call; between
+    requests the server parks the connection instead of holding a worker.
+    """
+
+    # HTTP/1.1 keeps connections open between requests
+    protocol_version = "HTTP/1.1"
+    server_version = "LibraryAPI/1.0"
+
+    def setup(self):
+        connection = self.request
+        self.connection = connection.sock
+        # Times out clients that stall partway through a request
+        self.connection.settimeout(self.server.request_timeout)
+        self.rfile = connection.rfile
+        self.wfile = connection.wfile
+        self._last_write = None
+
+    def handle(self):
+        self.close_connection = True
+        self.handle_one_request()
+
+    def finish(self):
+        # The connection's files outlive the request; the server closes them
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        for pattern, route in GET_ROUTES:
+            match = pattern.fullmatch(url.path)
+            if match:
+                self._respond(route, parse_qs(url.query), *match.groups())
+                return
+        self._send(HTTPStatus.NOT_FOUND, {"status": "error", "message": "Not found"})
+
+    def do_POST(self):
+        route = POST_ROUTES.get(urlsplit(self.path).path)
+        try:
+            body = self._read_body()
+        except BadRequest as err:
+            # The body was not read, so the connection cannot be reused
+            self.close_connection = True
+            self._send(err.status, {"status": "error", "message": str(err)})
+            return
+        if route is None:
+            self._send(
+                HTTPStatus.NOT_FOUND, {"status": "error", "message": "Not found"}
+            )
+            return
+        self._respond(route, body)
+
+    def _read_body(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise BadRequest("Content-Length must be a non-negative integer")
+        if length > config.SERVE_MAX_BODY_BYTES:
+            raise PayloadTooLarge(
+                f"Request body must be at most {config.SERVE_MAX_BODY_BYTES} bytes"
+            )
+        raw = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(raw or b"{}")
+        except ValueError:
+            return None
+
+    def _respond(self, route, *args):
+        try:
+            if args and args[0] is None:
+                raise BadRequest("Request body must be JSON")
+            written_at = self._last_write_cookie()
+            with repository.read_after_write(written_at):
+                with repository.raise_query_errors():
+                    status, payload = route(*args)
+            # Each request runs in a fresh context, so this is its own write
+            self._last_write = repository.last_write_time()
+        except BadRequest as err:
+            status, payload = err.status, {"status": "error", "message": str(err)}
+        except QueryError as err:
+            self.log_error("Query failed serving %s: %s", self.path, err)
+            status = _error_status(str(err)) or HTTPStatus.INTERNAL_SERVER_ERROR
+            payload = {"status": "error", "message": str(err)}
+        except Exception:
+            self.log_error("Unhandled error serving %s", self.path)
+            status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {
+                "status": "error",
+                "message": "Internal server error",
+            }
+        self._send(status, payload)
+
+    def _last_write_cookie(self):
+        cookies = SimpleCookie()
+        try:
+            cookies.load(self.headers.get("Cookie") or "")
+            morsel = cookies.get(LAST_WRITE_COOKIE)
+            return float(morsel.value) if morsel else None
+        except (CookieError, ValueError):
+            return None
+
+    def _send(self, status, payload):
+        # Text payloads are Prometheus metrics; everything else is JSON
+        if isinstance(payload, str):
+            body = payload.encode()
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            # MySQL returns DATETIME columns as datetimes
+            body = json.dumps(payload, default=str).encode()
+            content_type = "application/json"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        sticky = config.DB_REPLICA_STICKY_SECONDS
+        if self._last_write is not None and sticky > 0:
+            self.send_header(
+                "Set-Cookie",
+                f"{LAST_WRITE_COOKIE}={self._last_write:.6f}; "
+                f"Max-Age={math.ceil(sticky)}; Path=/; HttpOnly; SameSite=Lax",
+            )
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_error(self, format, *args):
+        # Idle keep-alive connections end with a timeout; that is not an error
+        if format.startswith("Request timed out") and not self.server.verbose:
+            return
+        super().log_error(format, *args)
+
+    def log_request(self, code="-", size="-"):
+        # Access logging costs more than a cached read; errors are always logged
+        if self.server.verbose:
+            super().log_request(code, size)
+
+
+class _SocketWriter:
+    """Unbuffered writes of whole responses, as StreamRequestHandler does."""
+
+    def __init__(self, sock):
+        self._sock = sock
+
+    def write(self, data):
+        self._sock.sendall(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+class _Connection:
+    """A client socket and its buffered streams, kept across requests."""
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        # Headers and body go out in separate writes; without TCP_NODELAY the
+        # second one waits ~40ms for the client's delayed ACK
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, True)
+        self.rfile = sock.makefile("rb")
+        self.wfile = _SocketWriter(sock)
+        self.idle_until = None
+
+    def has_buffered_request(self):
+        """True if the next request is already read into rfile (pipelining)."""
+        self.sock.setblocking(False)
+        try:
+            # Returns the buffered bytes, or tries one read that cannot block
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.sock.setblocking(True)
+
+
+class LibraryServer(HTTPServer):
+    """
+    HTTPServer that handles requests on a fixed pool of worker threads.
+
+    A worker serves one request at a time. A kept-alive connection waiting
+    for its next request is parked on a selector and costs no worker; it is
+    handed back to the pool when the request arrives, and closed after
+    `request_timeout` seconds idle.
+    """
+
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        address,
+        workers=None,
+        request_timeout=None,
+        verbose=False,
+        handler=LibraryRequestHandler,
+    ):
+        self.workers = workers or config.SERVE_WORKERS
+        self.request_timeout = request_timeout or config.SERVE_REQUEST_TIMEOUT
+        self.verbose = verbose
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="library-api"
+        )
+        # Connections to park, handed from the workers to the idle watcher
+        self._parked = queue.SimpleQueue()
+        self._wakeup_recv, self._wakeup_send = socket.socketpair()
+        self._closing = False
+        self._watcher = threading.Thread(
+            target=self._watch_idle, name="library-api-idle", daemon=True
+        )
+        super().__init__(address, handler)
+        self._watcher.start()
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self._serve, _Connection(request, client_address))
+
+    def _serve(self, connection):
+        try:
+            # A fresh context per request: a write made for one client must
+            # not send other clients' reads on this worker to the primary
+            handler = contextvars.Context().run(
+                self.RequestHandlerClass, connection, connection.address, self
+            )
+            keep_alive = not handler.close_connection
+        except Exception:
+            self.handle_error(connection.sock, connection.address)
+            keep_alive = False
+        if not keep_alive or self._closing:
+            self._close(connection)
+        elif connection.has_buffered_request():
+            self._executor.submit(self._serve, connection)
+        else:
+            self._parked.put(connection)
+            self._wakeup_send.send(b"\0")
+
+    def _close(self, connection):
+        try:
+            connection.rfile.close()
+        finally:
+            self.shutdown_request(connection.sock)
+
+    def _watch_idle(self):
+        with selectors.DefaultSelector() as selector:
+            selector.register(self._wakeup_recv, selectors.EVENT_READ)
+            while not self._closing:
+                idle = [key.data for key in selector.get_map().values() if key.data]
+                now = time.monotonic()
+                timeout = min(
+                    (connection.idle_until - now for connection in idle), default=None
+                )
+                for key, _ in selector.select(
+                    None if timeout is None else max(timeout, 0)
+                ):
+                    connection = key.data
+                    if connection is None:
+                        self._wakeup_recv.recv(4096)
+                        continue
+                    # The next request (or the client's close) has arrived
+                    selector.unregister(connection.sock)
+                    self._executor.submit(self._serve, connection)
+                while not self._parked.empty():
+                    connection = self._parked.get()
+                    connection.idle_until = time.monotonic() + self.request_timeout
+                    selector.register(connection.sock, selectors.EVENT_READ, connection)
+                now = time.monotonic()
+                for key in list(selector.get_map().values()):
+                    if key.data and key.data.idle_until <= now:
+                        selector.unregister(key.fileobj)
+                        self._close(key.data)
+            for key in list(selector.get_map().values()):
+                if key.data:
+                    self._close(key.data)
+
+    def server_close(self):
+        super().server_close()
+        self._closing = True
+        self._wakeup_send.send(b"\0")
+        self._watcher.join()
+        self._executor.shutdown(wait=True)
+        # Connections parked while the workers finished
+        while not self._parked.empty():
+            self._close(self._parked.get())
+        self._wakeup_recv.close()
+        self._wakeup_send.close()
+        repository.close_pool()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="main.py serve", description="Serve the library over HTTP."
+    )
+    parser.add_argument("--host", default=config.SERVE_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVE_PORT)
+    parser.add_argument("--workers", type=int, default=config.SERVE_WORKERS)
+    parser.add_argument("--timeout", type=float, default=config.SERVE_REQUEST_TIMEOUT)
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    server = LibraryServer(
+        (args.host, args.port), args.workers, args.timeout, args.verbose
+    )
+    print(
+        f"Serving on http://{args.host}:{server.server_port} "
+        f"with {args.workers} workers (Ctrl+C to stop)"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
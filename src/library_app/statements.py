@@ -0,0 +1,502 @@
+"""
+Registry of every SQL statement the repository runs, and their execution.
+
+Statements are referred to by name. Each pooled connection keeps the
+statements it has run prepared (a server-side prepared statement on MySQL, a
+compiled statement in sqlite3's per-connection cache on SQLite), so a hot
+query is parsed and planned once per connection instead of on every call.
+The prepared cursors live in the pool's state for the connection and are
+closed with it. Backends or servers that cannot prepare a statement run it
+as plain SQL instead.
+
+SQL is written in the MySQL dialect with %s placeholders. Statements over a
+variable-length id list use {ids}, expanded by execute(..., count=n), and
+statements run against one of several tables of the same shape (the monthly
+loan archives) use {table}, filled in by execute(..., table=name).
+"""
+
+import functools
+import threading
+from collections import OrderedDict
+
+from . import config, metrics
+from .backends import get_backend
+
+_CIRCULATION_COUNTS = ("checked_out", "returned")
+
+# Bound on the number of ids bound into a single IN (...) list
+IN_CHUNK_SIZE = 500
+
+STATEMENTS = {
+    # Reference lists
+    "authors": "SELECT author_id, author_name FROM Author",
+    "patrons": "SELECT patron_id, patron_name FROM Patron",
+    "authors_page": """
+        SELECT author_id, author_name
+        FROM Author
+        WHERE author_id > %s
+        ORDER BY author_id
+        LIMIT %s
+    """,
+    "patrons_page": """
+        SELECT patron_id, patron_name
+        FROM Patron
+        WHERE patron_id > %s
+        ORDER BY patron_id
+        LIMIT %s
+    """,
+    # Circulation lists
+    "available_books": "SELECT book_id, book_title FROM Book WHERE is_checked < 1",
+    "borrowed_books": """
+        SELECT Book.book_id, book_title, author_name
+        FROM Book
+        JOIN Author ON Book.author_id = Author.author_id
+        WHERE is_checked > 0
+    """,
+    "available_books_page": """
+        SELECT book_id, book_title
+        FROM Book
+        WHERE is_checked = 0 AND book_id > %s
+        ORDER BY book_id
+        LIMIT %s
+    """,
+    "borrowed_books_page": """
+        SELECT Book.book_id, book_title, author_name
+        FROM Book
+        JOIN Author ON Book.author_id = Author.author_id
+        WHERE is_checked = 1 AND Book.book_id > %s
+        ORDER BY Book.book_id
+        LIMIT %s
+    """,
+    "patrons_with_book": """
+        SELECT Patron.patron_id, patron_name
+        FROM OpenLoan
+        JOIN Patron ON Patron.patron_id = OpenLoan.patron_id
+        WHERE OpenLoan.book_id = %s
+    """,
+    "patron_borrowed_books": """
+        SELECT Book.book_id, book_title, author_name
+        FROM OpenLoan
+        JOIN Book ON Book.book_id = OpenLoan.book_id
+        LEFT JOIN Author ON Author.author_id = Book.author_id
+        WHERE OpenLoan.patron_id = %s
+        ORDER BY OpenLoan.book_id
+    """,
+    "patron_loans": """
+        SELECT Book.book_id, book_title, author_name, date_issue
+        FROM OpenLoan
+        JOIN Book ON Book.book_id = OpenLoan.book_id
+        LEFT JOIN Author ON Author.author_id = Book.author_id
+        LEFT JOIN TransactionRecord
+            ON TransactionRecord.transaction_id = OpenLoan.transaction_id
+        WHERE OpenLoan.patron_id = %s
+        ORDER BY OpenLoan.book_id
+    """,
+    # The patron row, then one row per open loan (NULLs when there are none)
+    "return_context": """
+        SELECT patron_name, Book.book_id, book_title, author_name, date_issue
+        FROM Patron
+        LEFT JOIN OpenLoan ON OpenLoan.patron_id = Patron.patron_id
+        LEFT JOIN Book ON Book.book_id = OpenLoan.book_id
+        LEFT JOIN Author ON Author.author_id = Book.author_id
+        LEFT JOIN TransactionRecord
+            ON TransactionRecord.transaction_id = OpenLoan.transaction_id
+        WHERE Patron.patron_id = %s
+        ORDER BY OpenLoan.book_id
+    """,
+    # Search
+    "books_by_author": """
+        SELECT Book.book_id, book_title, author_name, publish_year, times_checked_out
+        FROM Book
+        JOIN Author ON Book.author_id = Author.author_id
+        WHERE Book.author_id = %s
+    """,
+    # The full-text syntax differs per backend
+    "search_books": lambda backend: backend.book_search_query(),
+    # Checkout and return
+    "reserve_book": "UPDATE Book SET times_checked_out = times_checked_out + 1, is_checked = 1 WHERE book_id = %s AND is_checked = 0",  # noqa: E501
+    "book_title": "SELECT book_title FROM Book WHERE book_id = %s",
+    "insert_loan": "INSERT INTO Transaction (librarian_id, book_id, patron_id) VALUES (1, %s, %s)",  # noqa: E501
+    "insert_loan_record": "INSERT INTO TransactionRecord (date_issue, transaction_id) VALUES (CURRENT_TIMESTAMP, %s)",  # noqa: E501
+    "open_loan": "INSERT INTO OpenLoan (book_id, patron_id, transaction_id) VALUES (%s, %s, %s)",  # noqa: E501
+    "loan_title": """
+        SELECT Book.book_title
+        FROM OpenLoan
+        JOIN Book ON OpenLoan.book_id = Book.book_id
+        WHERE OpenLoan.book_id = %s AND OpenLoan.patron_id = %s
+    """,
+    "close_loan_record": """
+        UPDATE TransactionRecord SET date_return = CURRENT_TIMESTAMP
+        WHERE transaction_id = (
+            SELECT transaction_id FROM OpenLoan WHERE book_id = %s AND patron_id = %s
+        )
+    """,
+    "close_loan": "DELETE FROM OpenLoan WHERE book_id = %s AND patron_id = %s",
+    "release_book": "UPDATE Book SET is_checked = 0 WHERE book_id = %s AND is_checked = 1",
+    # Bulk checkout and return
+    "books_by_ids": "SELECT book_id, book_title, is_checked FROM Book WHERE book_id IN ({ids})",  # noqa: E501
+    "known_patrons": "SELECT patron_id FROM Patron WHERE patron_id IN ({ids})",
+    "reserve_books": "UPDATE Book SET times_checked_out = times_checked_out + 1, is_checked = 1 WHERE is_checked = 0 AND book_id IN ({ids})",  # noqa: E501
+    "release_books": "UPDATE Book SET is_checked = 0 WHERE is_checked = 1 AND book_id IN ({ids})",  # noqa: E501
+    # The loan just inserted is each reserved book's latest transaction
+    "latest_loans": "SELECT book_id, MAX(transaction_id) FROM Transaction WHERE book_id IN ({ids}) GROUP BY book_id",  # noqa: E501
+    "open_loans_by_books": "SELECT book_id, patron_id FROM OpenLoan WHERE book_id IN ({ids})",  # noqa: E501
+    "close_loan_records": "UPDATE TransactionRecord SET date_return = CURRENT_TIMESTAMP WHERE transaction_id IN (SELECT transaction_id FROM OpenLoan WHERE book_id IN ({ids}))",  # noqa: E501
+    "close_loans": "DELETE FROM OpenLoan WHERE book_id IN ({ids})",
+    # Circulation summaries (see reporting.py). Each adds its counts to the
+    # row for its key, creating the row on first use.
+    "count_daily_circulation": lambda backend: f"""
+        INSERT INTO DailyCirculation (circulation_date, checked_out, returned)
+        VALUES (CURRENT_DATE, %s, %s)
+        {backend.add_on_duplicate("circulation_date", _CIRCULATION_COUNTS)}
+    """,
+    "count_author_circulation": lambda backend: f"""
+        INSERT INTO AuthorCirculation (author_id, checked_out, returned)
+        SELECT author_id, %s, %s FROM Book
+        WHERE book_id = %s AND author_id IS NOT NULL
+        {backend.add_on_duplicate("author_id", _CIRCULATION_COUNTS)}
+    """,
+    "add_daily_circulation": lambda backend: f"""
+        INSERT INTO DailyCirculation (circulation_date, checked_out, returned)
+        VALUES (%s, %s, %s)
+        {backend.add_on_duplicate("circulation_date", _CIRCULATION_COUNTS)}
+    """,
+    "add_book_circulation": lambda backend: f"""
+        INSERT INTO BookCirculation (book_id, checked_out, returned)
+        VALUES (%s, %s, %s)
+        {backend.add_on_duplicate("book_id", _CIRCULATION_COUNTS)}
+    """,
+    "add_author_circulation": lambda backend: f"""
+        INSERT INTO AuthorCirculation (author_id, checked_out, returned)
+        VALUES (%s, %s, %s)
+        {backend.add_on_duplicate("author_id", _CIRCULATION_COUNTS)}
+    """,
+    # Reports
+    "top_books": """
+        SELECT BookCirculation.book_id, book_title, author_name, checked_out
+        FROM BookCirculation
+        JOIN Book ON Book.book_id = BookCirculation.book_id
+        LEFT JOIN Author ON Author.author_id = Book.author_id
+        ORDER BY checked_out DESC, BookCirculation.book_id DESC
+        LIMIT %s
+    """,
+    "top_authors": """
+        SELECT AuthorCirculation.author_id, author_name, checked_out
+        FROM AuthorCirculation
+        JOIN Author ON Author.author_id = AuthorCirculation.author_id
+        ORDER BY checked_out DESC, AuthorCirculation.author_id DESC
+        LIMIT %s
+    """,
+    "daily_circulation": """
+        SELECT circulation_date, checked_out, returned
+        FROM DailyCirculation
+        WHERE circulation_date BETWEEN %s AND %s
+        ORDER BY circulation_date
+    """,
+    # Every loan with its dates, in keyset batches, for rebuilding the summaries
+    "circulation_history": """
+        SELECT Transaction.transaction_id, Transaction.book_id, Book.author_id,
+               DATE(TransactionRecord.date_issue), DATE(TransactionRecord.date_return),
+               OpenLoan.book_id IS NULL
+        FROM Transaction
+        LEFT JOIN TransactionRecord
+            ON TransactionRecord.transaction_id = Transaction.transaction_id
+        LEFT JOIN OpenLoan
+            ON OpenLoan.book_id = Transaction.book_id
+            AND OpenLoan.transaction_id = Transaction.transaction_id
+        LEFT JOIN Book ON Book.book_id = Transaction.book_id
+        WHERE Transaction.transaction_id > %s
+        ORDER BY Transaction.transaction_id
+        LIMIT %s
+    """,
+    # Catalog snapshot (see catalog.py)
+    "catalog_sizes": """
+        SELECT (SELECT COALESCE(MAX(change_id), 0) FROM CatalogChange),
+               (SELECT COALESCE(MAX(book_id), 0) FROM Book),
+               (SELECT COALESCE(MAX(author_id), 0) FROM Author),
+               (SELECT COALESCE(MAX(patron_id), 0) FROM Patron)
+    """,
+    "catalog_books": "SELECT book_id, book_title, author_id, is_checked FROM Book",
+    "catalog_books_by_ids": "SELECT book_id, book_title, author_id, is_checked FROM Book WHERE book_id IN ({ids})",  # noqa: E501
+    "authors_by_ids": "SELECT author_id, author_name FROM Author WHERE author_id IN ({ids})",  # noqa: E501
+    "patrons_by_ids": "SELECT patron_id, patron_name FROM Patron WHERE patron_id IN ({ids})",  # noqa: E501
+    "catalog_changes": "SELECT change_id, entity, entity_id FROM CatalogChange WHERE change_id > %s ORDER BY change_id",  # noqa: E501
+    "catalog_changes_by_ids": "SELECT change_id, entity, entity_id FROM CatalogChange WHERE change_id IN ({ids})",  # noqa: E501
+    "latest_catalog_change": "SELECT COALESCE(MAX(change_id), 0) FROM CatalogChange",  # noqa: E501
+    "compact_catalog_changes": "DELETE FROM CatalogChange WHERE change_id > %s AND change_id <= %s",  # noqa: E501
+    "catalog_changes_compacted_through": "SELECT compacted_through FROM CatalogChangeCompaction",  # noqa: E501
+    "mark_catalog_changes_compacted": "UPDATE CatalogChangeCompaction SET compacted_through = %s",  # noqa: E501
+    # Change events (see outbox.py)
+    "append_event": "INSERT INTO Outbox (event, book_id, patron_id) VALUES (%s, %s, %s)",  # noqa: E501
+    "latest_event": "SELECT COALESCE(MAX(event_id), 0) FROM Outbox",
+    "outbox_events": "SELECT event_id, event, book_id, patron_id FROM Outbox WHERE event_id > %s ORDER BY event_id LIMIT %s",  # noqa: E501
+    "outbox_events_by_ids": "SELECT event_id, event, book_id, patron_id FROM Outbox WHERE event_id IN ({ids})",  # noqa: E501
+    "compact_outbox": "DELETE FROM Outbox WHERE event_id > %s AND event_id <= %s",
+    "outbox_compacted_through": "SELECT compacted_through FROM OutboxCompaction",
+    "mark_outbox_compacted": "UPDATE OutboxCompaction SET compacted_through = %s",
+    # Loan archival (see archive.py). {table} names a monthly LoanArchive table.
+    "latest_loan": "SELECT COALESCE(MAX(transaction_id), 0) FROM Transaction",
+    # A returned loan without a return date predates dated returns
+    "archivable_loans": """
+        SELECT Transaction.transaction_id, TransactionRecord.date_return
+        FROM Transaction
+        LEFT JOIN TransactionRecord
+            ON TransactionRecord.transaction_id = Transaction.transaction_id
+        LEFT JOIN OpenLoan
+            ON OpenLoan.book_id = Transaction.book_id
+            AND OpenLoan.transaction_id = Transaction.transaction_id
+        WHERE Transaction.transaction_id > %s AND Transaction.transaction_id < %s
+            AND (
+                TransactionRecord.date_return < %s
+                OR TransactionRecord.date_return IS NULL
+            )
+            AND OpenLoan.book_id IS NULL
+        ORDER BY Transaction.transaction_id
+        LIMIT %s
+    """,
+    "archive_loans": """
+        INSERT INTO {table}
+            (transaction_id, librarian_id, book_id, patron_id, date_issue, date_return)
+        SELECT Transaction.transaction_id, librarian_id, book_id, patron_id,
+               date_issue, date_return
+        FROM Transaction
+        LEFT JOIN TransactionRecord
+            ON TransactionRecord.transaction_id = Transaction.transaction_id
+        WHERE Transaction.transaction_id IN ({ids})
+    """,
+    "add_patron_archive_months": """
+        INSERT INTO PatronArchiveMonth (patron_id, archive_month)
+        SELECT DISTINCT patron_id, %s
+        FROM {table}
+        WHERE transaction_id IN ({ids}) AND patron_id IS NOT NULL
+            AND NOT EXISTS (
+                SELECT 1 FROM PatronArchiveMonth
+                WHERE PatronArchiveMonth.patron_id = {table}.patron_id
+                    AND PatronArchiveMonth.archive_month = %s
+            )
+    """,
+    "delete_loan_records": "DELETE FROM TransactionRecord WHERE transaction_id IN ({ids})",  # noqa: E501
+    "delete_loans": "DELETE FROM Transaction WHERE transaction_id IN ({ids})",
+    # The partition list is a row per month, read whole
+    "archive_months": "SELECT archive_month FROM LoanArchivePartition ORDER BY archive_month DESC",  # noqa: E501
+    "add_archive_month": "INSERT INTO LoanArchivePartition (archive_month) VALUES (%s)",
+    "patron_archive_months": "SELECT archive_month FROM PatronArchiveMonth WHERE patron_id = %s ORDER BY archive_month DESC",  # noqa: E501
+    # The last column is 1 for a loan that is still out
+    "patron_history": """
+        SELECT Transaction.transaction_id, Transaction.book_id, Book.book_title,
+               TransactionRecord.date_issue, TransactionRecord.date_return,
+               OpenLoan.book_id IS NOT NULL
+        FROM Transaction
+        LEFT JOIN TransactionRecord
+            ON TransactionRecord.transaction_id = Transaction.transaction_id
+        LEFT JOIN OpenLoan
+            ON OpenLoan.book_id = Transaction.book_id
+            AND OpenLoan.transaction_id = Transaction.transaction_id
+        LEFT JOIN Book ON Book.book_id = Transaction.book_id
+        WHERE Transaction.patron_id = %s
+    """,
+    "archived_patron_history": """
+        SELECT {table}.transaction_id, {table}.book_id, Book.book_title,
+               {table}.date_issue, {table}.date_return, 0
+        FROM {table}
+        LEFT JOIN Book ON Book.book_id = {table}.book_id
+        WHERE {table}.patron_id = %s
+        ORDER BY {table}.date_return DESC
+        LIMIT %s
+    """,
+    "archived_circulation_history": """
+        SELECT {table}.transaction_id, {table}.book_id, Book.author_id,
+               DATE({table}.date_issue), DATE({table}.date_return), 1
+        FROM {table}
+        LEFT JOIN Book ON Book.book_id = {table}.book_id
+        WHERE {table}.transaction_id > %s
+        ORDER BY {table}.transaction_id
+        LIMIT %s
+    """,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def statement_sql(name, backend_name=None, count=None, table=None):
+    """
+    Returns the SQL for a registered statement. The same string object is
+    returned every time, which is what lets drivers reuse its preparation.
+    """
+    sql = STATEMENTS[name]
+    if callable(sql):
+        sql = sql(get_backend(backend_name))
+    if count is not None or table is not None:
+        sql = sql.format(ids=", ".join(["%s"] * (count or 0)), table=table)
+    return sql
+
+
+class StatementStats:
+    """Thread-safe prepare and execute counters per statement name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def record(self, name, prepared=False, fallback=False):
+        with self._lock:
+            counts = self._counts.get(name)
+            if counts is None:
+                counts = self._counts[name] = {
+                    "prepares": 0,
+                    "executes": 0,
+                    "fallbacks": 0,
+                }
+            counts["executes"] += 1
+            if prepared:
+                counts["prepares"] += 1
+            if fallback:
+                counts["fallbacks"] += 1
+
+    def snapshot(self):
+        """Returns {name: counts} plus a "total" entry summing every statement."""
+        with self._lock:
+            snapshot = {name: dict(counts) for name, counts in self._counts.items()}
+        total = {"prepares": 0, "executes": 0, "fallbacks": 0}
+        for counts in snapshot.values():
+            for key in total:
+                total[key] += counts[key]
+        snapshot["total"] = total
+        return snapshot
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+statement_stats = StatementStats()
+
+# Called with (name, sql, params) before every statement; see query_plans.py
+observers = []
+
+# SQL the server refused to prepare; it is sent as plain text from then on
+_unpreparable = set()
+
+
+class _CursorCache(OrderedDict):
+    """Prepared cursors by SQL, in a pooled connection's state."""
+
+    def close(self):
+        # Called by the pool as it closes the connection
+        for cursor in self.values():
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        self.clear()
+
+
+def _cursor(conn, backend, sql):
+    """Returns (cursor, prepared now?, fell back?) for `sql` on `conn`."""
+    if sql in _unpreparable:
+        return conn.cursor(), False, True
+    # Prepared cursors are kept in the pool's per-connection state, so they
+    # go when the connection does; other connections get a plain cursor
+    state = getattr(conn, "state", None)
+    if not config.DB_PREPARED_STATEMENTS or state is None:
+        return conn.cursor(), False, False
+
+    # Only the thread holding the connection touches its state
+    cache = state.get("statements")
+    if cache is None:
+        cache = state["statements"] = _CursorCache()
+    cursor = cache.get(sql)
+    if cursor is not None:
+        cache.move_to_end(sql)
+        return cursor, False, False
+
+    cursor = backend.prepared_cursor(conn)
+    cache[sql] = cursor
+    if len(cache) > config.DB_STATEMENT_CACHE_SIZE:
+        _, evicted = cache.popitem(last=False)
+        evicted.close()
+    return cursor, True, False
+
+
+def _run(conn, name, params, count, many, table=None):
+    backend = get_backend()
+    sql = statement_sql(name, backend.name, count, table)
+    first_params = params[0] if many and params else params
+    for observer in observers:
+        observer(name, sql, first_params)
+
+    if not metrics.active():
+        return _execute(conn, backend, name, sql, params, many)
+    with metrics.statement(name, sql, first_params, backend.name):
+        return _execute(conn, backend, name, sql, params, many)
+
+
+def _execute(conn, backend, name, sql, params, many):
+    cursor, prepared, fallback = _cursor(conn, backend, sql)
+    try:
+        if many:
+            cursor.executemany(sql, params)
+        else:
+            cursor.execute(sql, params)
+    except backend.Error as err:
+        if not prepared or not backend.is_unpreparable(err):
+            raise
+        # Statements the server cannot prepare run as plain SQL from now on
+        conn.state["statements"].pop(sql, None)
+        _unpreparable.add(sql)
+        cursor, prepared, fallback = conn.cursor(), False, True
+        if many:
+            cursor.executemany(sql, params)
+        else:
+            cursor.execute(sql, params)
+    statement_stats.record(name, prepared=prepared, fallback=fallback)
+    return cursor
+
+
+def execute(conn, name, params=(), count=None, table=None):
+    """
+    Runs the named statement on `conn` and returns its cursor. Fetch every
+    row before running the same statement on the connection again.
+    """
+    return _run(conn, name, tuple(params), count, many=False, table=table)
+
+
+def executemany(conn, name, seq_of_params, count=None):
+    """Runs the named statement once per parameter tuple."""
+    return _run(conn, name, list(seq_of_params), count, many=True)
+
+
+def chunks(values, size=IN_CHUNK_SIZE):
+    """Splits `values` into lists short enough to bind into one {ids} list."""
+    values = list(values)
+    for start in range(0, len(values), size):
+        end = start + size
+        yield values[start:end]
+
+
+def execute_streaming(conn, name, params=()):
+    """
+    Runs the named statement on a fresh streaming cursor, which is never
+    cached: it holds its result set until the caller has read it all.
+    """
+    backend = get_backend()
+    sql = statement_sql(name, backend.name)
+    params = tuple(params)
+    for observer in observers:
+        observer(name, sql, params)
+    cursor = backend.streaming_cursor(conn)
+    if metrics.active():
+        with metrics.statement(name, sql, params, backend.name):
+            cursor.execute(sql, params)
+    else:
+        cursor.execute(sql, params)
+    statement_stats.record(name)
+    return cursor
+
+
+def stats():
+    """Returns prepare, execute and fallback counts per statement."""
+    return statement_stats.snapshot()
+
+
+def reset_stats():
+    statement_stats.reset()
@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from library_app import config, repository
+from library_app.backends import get_backend
+from library_app.migrations import migrate
+from library_app.schema import populate
+
+
+class SQLiteTestCase(unittest.TestCase):
+    """Runs each test against a freshly seeded SQLite database file."""
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.db_path = os.path.join(tmpdir.name, "library.db")
+
+        for name, value in [("DB_BACKEND", "sqlite"), ("SQLITE_PATH", self.db_path)]:
+            patcher = patch.object(config, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        repository.close_pool()
+        repository.query_cache.clear()
+        self.addCleanup(repository.close_pool)
+        self.addCleanup(repository.query_cache.clear)
+
+        conn = get_backend().connect()
+        with patch("builtins.print"):
+            migrate(conn)
+            populate(conn)
+        conn.close()
+
+    def query(self, sql, params=()):
+        conn = get_backend().connect()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+            conn.commit()
+            return rows
+        finally:
+            conn.close()
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+from library_app import aio_repository, config, repository
+from tests.helpers import SQLiteTestCase
+
+
+class TestAioRepository(SQLiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(aio_repository.shutdown)
+
+    def test_reads_match_the_sync_api(self):
+        async def reads():
+            return await asyncio.gather(
+                aio_repository.get_authors(),
+                aio_repository.search_books_by_author(1),
+                aio_repository.get_available_books_page(after_id=1, limit=2),
+                aio_repository.search_books("emma"),
+            )
+
+        results = asyncio.run(reads())
+        repository.query_cache.clear()
+
+        self.assertEqual(
+            results,
+            [
+                repository.get_authors(),
+                repository.search_books_by_author(1),
+                repository.get_available_books_page(after_id=1, limit=2),
+                repository.search_books("emma"),
+            ],
+        )
+
+    def test_writes_return_the_same_status_dicts(self):
+        async def circulate():
+            first = await aio_repository.check_out_book_transaction(1, 1)
+            second = await aio_repository.check_out_book_transaction(2, 1)
+            returned = await aio_repository.return_book_transaction(1, 1)
+            return first, second, returned
+
+        first, second, returned = asyncio.run(circulate())
+
+        self.assertEqual(first["status"], "success")
+        self.assertEqual(
+            second,
+            {
+                "status": "error",
+                "message": "Pride and Prejudice is not available for checkout.",
+            },
+        )
+        self.assertEqual(returned["status"], "success")
+
+    def test_streams_in_batches(self):
+        async def collect():
+            return [row async for row in aio_repository.iter_authors(fetch_size=2)]
+
+        self.assertEqual(asyncio.run(collect()), repository.get_authors())
+
+    def test_concurrency_is_bounded_by_pool_capacity(self):
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def slow_authors():
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.01)
+            with lock:
+                active -= 1
+            return []
+
+        async def flood():
+            await asyncio.gather(*(aio_repository.get_authors() for _ in range(50)))
+
+        with patch.object(config, "DB_POOL_SIZE", 2), patch.object(
+            config, "DB_POOL_MAX_OVERFLOW", 1
+        ), patch.object(repository, "get_authors", slow_authors):
+            aio_repository.shutdown()
+            asyncio.run(flood())
+
+        self.assertEqual(peak, 3)
@@ -0,0 +1,171 @@
+from datetime import datetime
+from unittest.mock import patch
+
+from library_app import archive, reporting, repository, statements
+from library_app.backends import get_backend
+from library_app.datagen import generate_catalog
+from tests.helpers import SQLiteTestCase
+
+
+class TestLoanArchive(SQLiteTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = patch.object(repository.query_cache, "enabled", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.conn = get_backend().connect()
+        self.addCleanup(self.conn.close)
+        # Loans issued through 2024, with about 3% still out
+        generate_catalog(self.conn, 300, batch_size=100)
+        self.loans = self.count("Transaction")
+        self.patron_id = self.query(
+            "SELECT patron_id FROM Transaction GROUP BY patron_id"
+            " ORDER BY COUNT(*) DESC LIMIT 1"
+        )[0][0]
+
+    def count(self, table):
+        return self.query(f"SELECT COUNT(*) FROM {table}")[0][0]
+
+    def archive(self, **kwargs):
+        return archive.archive_loans(self.conn, batch_size=40, pause=0, **kwargs)
+
+    def summaries(self):
+        return [
+            self.query(f"SELECT * FROM {table} ORDER BY 1")
+            for table in reporting.SUMMARY_TABLES
+        ]
+
+    def test_old_loans_move_to_monthly_tables(self):
+        history = archive.get_patron_history(self.patron_id, limit=1000)
+        reporting.rebuild_circulation_stats(self.conn)
+        summaries = self.summaries()
+
+        archived = self.archive()
+        # Open loans and the newest loan stay
+        self.assertLessEqual(self.count("Transaction"), self.count("OpenLoan") + 1)
+        self.assertEqual(archived + self.count("Transaction"), self.loans)
+        self.assertEqual(self.count("TransactionRecord"), self.count("Transaction"))
+        months = archive.archive_months(self.conn)
+        self.assertEqual(months[-1], 202401)
+        self.assertEqual(
+            sum(self.count(archive.archive_table(month)) for month in months),
+            archived,
+        )
+        self.assertEqual(self.archive(), 0)
+
+        self.assertEqual(
+            archive.get_patron_history(self.patron_id, limit=1000), history
+        )
+        self.assertEqual(archive.get_patron_history(self.patron_id, 3), history[:3])
+        reporting.rebuild_circulation_stats(self.conn)
+        self.assertEqual(self.summaries(), summaries)
+
+    def test_only_loans_returned_before_the_cutoff_move(self):
+        archived = self.archive(before=datetime(2024, 7, 1))
+        self.assertGreater(archived, 0)
+        self.assertEqual(
+            self.query(
+                "SELECT COUNT(*) FROM TransactionRecord"
+                " WHERE date_return < '2024-07-01'"
+            ),
+            [(0,)],
+        )
+        self.assertLessEqual(max(archive.archive_months(self.conn)), 202406)
+
+    def test_interrupted_run_resumes(self):
+        def interrupt(loans):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            self.archive(progress=interrupt)
+        # The first batch was committed whole
+        self.assertEqual(self.count("Transaction"), self.loans - 40)
+
+        archived = self.archive()
+        self.assertEqual(archived + 40 + self.count("Transaction"), self.loans)
+
+    def test_history_lists_open_loans_first(self):
+        self.archive()
+        repository.check_out_book_transaction(self.patron_id, 1)
+        history = archive.get_patron_history(self.patron_id, limit=1000)
+        open_loans = self.query(
+            "SELECT COUNT(*) FROM OpenLoan WHERE patron_id = ?", (self.patron_id,)
+        )[0][0]
+        self.assertTrue(all(row[4] is None for row in history[:open_loans]))
+        self.assertIn(1, [row[1] for row in history[:open_loans]])
+        returns = [row[4] for row in history[open_loans:]]
+        self.assertEqual(returns, sorted(returns, reverse=True))
+
+    def test_undated_returns_archive_to_the_legacy_table(self):
+        # Returned before returns were dated: one with no record, one with
+        # an undated record
+        legacy = [
+            row[0]
+            for row in self.query(
+                "SELECT transaction_id FROM Transaction"
+                " WHERE transaction_id NOT IN (SELECT transaction_id FROM OpenLoan)"
+                " ORDER BY transaction_id LIMIT 2"
+            )
+        ]
+        self.query(
+            "DELETE FROM TransactionRecord WHERE transaction_id = ?", (legacy[0],)
+        )
+        self.query(
+            "UPDATE TransactionRecord SET date_issue = NULL, date_return = NULL"
+            " WHERE transaction_id = ?",
+            (legacy[1],),
+        )
+        patron_id = self.query(
+            "SELECT patron_id FROM Transaction WHERE transaction_id = ?", (legacy[0],)
+        )[0][0]
+        reporting.rebuild_circulation_stats(self.conn)
+        summaries = self.summaries()
+        history = archive.get_patron_history(patron_id, limit=1000)
+        # Undated returns list after every dated one
+        self.assertIn(legacy[0], [row[0] for row in history[-2:]])
+        self.assertEqual(history[-1][3:], (None, None))
+
+        self.archive(before=datetime(2000, 1, 1))
+        self.assertEqual(
+            self.query(
+                "SELECT transaction_id, date_issue, date_return"
+                " FROM LoanArchive_legacy ORDER BY 1"
+            ),
+            [(legacy[0], None, None), (legacy[1], None, None)],
+        )
+        self.assertIn(archive.LEGACY_MONTH, archive.archive_months(self.conn))
+        self.assertEqual(archive.get_patron_history(patron_id, limit=1000), history)
+        # No day gains a return for them
+        reporting.rebuild_circulation_stats(self.conn)
+        self.assertEqual(self.summaries(), summaries)
+
+    def test_history_reads_only_the_patrons_archive_months(self):
+        self.archive()
+        months = set(archive.archive_months(self.conn))
+        patron_months = {
+            row[0]
+            for row in self.query(
+                "SELECT archive_month FROM PatronArchiveMonth WHERE patron_id = ?",
+                (self.patron_id,),
+            )
+        }
+        self.assertLess(len(patron_months), len(months))
+        read = []
+
+        def record(name, sql, params):
+            if name == "archived_patron_history":
+                read.append(sql)
+
+        statements.observers.append(record)
+        try:
+            archive.get_patron_history(self.patron_id, limit=1000)
+            self.assertEqual(len(read), len(patron_months))
+            read.clear()
+            repository.query_cache.clear()
+            # A patron with no archived loans reads no archive
+            self.query("INSERT INTO Patron (patron_name) VALUES ('New Patron')")
+            new_patron = self.query("SELECT MAX(patron_id) FROM Patron")[0][0]
+            self.assertEqual(archive.get_patron_history(new_patron), [])
+            self.assertEqual(read, [])
+        finally:
+            statements.observers.remove(record)
@@ -0,0 +1,64 @@
+import unittest
+from unittest.mock import patch
+
+from library_app import config, repository
+from library_app.backends import SQLiteBackend, get_backend, translate_sqlite
+from tests.helpers import SQLiteTestCase
+
+
+class TestBackendSelection(unittest.TestCase):
+    def test_backend_follows_config(self):
+        with patch.object(config, "DB_BACKEND", "sqlite"):
+            self.assertIsInstance(get_backend(), SQLiteBackend)
+
+    def test_unknown_backend_is_rejected(self):
+        with self.assertRaises(ValueError):
+            get_backend("oracle")
+
+    def test_translate_sqlite(self):
+        self.assertEqual(
+            translate_sqlite(
+                "SELECT patron_id FROM Transaction WHERE Transaction.book_id = %s"
+            ),
+            'SELECT patron_id FROM "Transaction" WHERE "Transaction".book_id = ?',
+        )
+        self.assertEqual(
+            translate_sqlite("SELECT date_issue FROM TransactionRecord"),
+            "SELECT date_issue FROM TransactionRecord",
+        )
+
+
+class TestSQLiteRepository(SQLiteTestCase):
+    def test_uses_wal_mode(self):
+        self.assertEqual(self.query("PRAGMA journal_mode"), [("wal",)])
+
+    def test_read_queries(self):
+        self.assertEqual(len(repository.get_authors()), 5)
+        self.assertEqual(len(repository.get_patrons()), 3)
+        self.assertEqual(len(repository.get_available_books()), 5)
+        self.assertEqual(
+            repository.search_books_by_author(1),
+            [(1, "Pride and Prejudice", "Jane Austen", 1813, 10)],
+        )
+
+    def test_check_out_and_return(self):
+        result = repository.check_out_book_transaction(1, 2)
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(
+            repository.get_borrowed_books(),
+            [(2, "Great Expectations", "Charles Dickens")],
+        )
+        self.assertEqual(repository.get_patrons_with_book(2), [(1, "Alice Smith")])
+
+        result = repository.return_book_transaction(1, 2)
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(repository.get_borrowed_books(), [])
+
+    def test_errors_are_reported_as_dicts(self):
+        self.query("ALTER TABLE Transaction RENAME TO Loan")
+
+        result = repository.check_out_book_transaction(1, 1)
+
+        self.assertEqual(result["status"], "error")
+        self.assertIn("no such table", result["message"])
+        self.assertEqual(len(repository.get_available_books()), 5)
@@ -0,0 +1,79 @@
+from library_app import repository
+from tests.helpers import SQLiteTestCase
+
+
+class TestBulkCirculation(SQLiteTestCase):
+    def test_check_out_books_bulk(self):
+        results = repository.check_out_books_bulk([(1, 1), (2, 1), (2, 2), (3, 99)])
+
+        self.assertEqual(
+            results,
+            [
+                {"status": "success", "message": "Book checked out successfully."},
+                {
+                    "status": "error",
+                    "message": "Pride and Prejudice is not available for checkout.",
+                },
+                {"status": "success", "message": "Book checked out successfully."},
+                {"status": "error", "message": "Book not found."},
+            ],
+        )
+        self.assertEqual(
+            self.query("SELECT book_id, patron_id FROM Transaction ORDER BY book_id"),
+            [(1, 1), (2, 2)],
+        )
+        self.assertEqual(
+            self.query("SELECT times_checked_out FROM Book WHERE book_id = 1"), [(11,)]
+        )
+
+    def test_unknown_patron_fails_only_its_items(self):
+        results = repository.check_out_books_bulk([(1, 1), (999, 2), (2, 3)])
+
+        self.assertEqual(
+            [r["status"] for r in results], ["success", "error", "success"]
+        )
+        self.assertEqual(results[1]["message"], "Patron not found.")
+        self.assertEqual(
+            self.query("SELECT book_id, patron_id FROM Transaction ORDER BY book_id"),
+            [(1, 1), (3, 2)],
+        )
+        self.assertEqual(
+            self.query("SELECT is_checked FROM Book WHERE book_id = 2"), [(0,)]
+        )
+
+    def test_return_books_bulk(self):
+        repository.check_out_books_bulk([(1, 1), (2, 2)])
+
+        results = repository.return_books_bulk([(1, 1), (1, 1), (3, 2), (2, 2)])
+
+        self.assertEqual(
+            [r["status"] for r in results], ["success", "error", "error", "success"]
+        )
+        self.assertEqual(
+            results[0]["message"], "Pride and Prejudice has been successfully returned."
+        )
+        self.assertEqual(results[1]["message"], "Book is already available.")
+        self.assertEqual(repository.get_borrowed_books(), [])
+
+    def test_empty_batch(self):
+        self.assertEqual(repository.return_books_bulk([]), [])
+
+    def test_large_batch_spans_in_list_chunks(self):
+        conn = repository.get_connection()
+        conn.cursor().executemany(
+            "INSERT INTO Book (book_title, publish_year, times_checked_out, is_checked, author_id) VALUES (%s, 2000, 0, 0, 1)",  # noqa: E501
+            [(f"Book {i}",) for i in range(1200)],
+        )
+        conn.commit()
+        conn.close()
+        items = [(1, book_id) for book_id in range(6, 1206)]
+
+        self.assertTrue(
+            all(
+                r["status"] == "success" for r in repository.check_out_books_bulk(items)
+            )
+        )
+        self.assertTrue(
+            all(r["status"] == "success" for r in repository.return_books_bulk(items))
+        )
+        self.assertEqual(repository.get_borrowed_books(), [])
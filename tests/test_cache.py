@@ -0,0 +1,114 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from library_app import repository
+from library_app.cache import QueryCache
+from tests.helpers import SQLiteTestCase
+
+
+class TestQueryCache(unittest.TestCase):
+    def test_hit_and_miss_counters(self):
+        cache = QueryCache()
+        loader = MagicMock(return_value=[1])
+
+        cache.get_or_load("q", (), loader, ttl=60)
+        cache.get_or_load("q", (), loader, ttl=60)
+
+        loader.assert_called_once()
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_entries_expire(self):
+        cache = QueryCache()
+        loader = MagicMock(return_value=[1])
+
+        with patch("library_app.cache.time.monotonic", side_effect=[0, 0, 100, 100]):
+            cache.get_or_load("q", (), loader, ttl=10)
+            cache.get_or_load("q", (), loader, ttl=10)
+
+        self.assertEqual(loader.call_count, 2)
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = QueryCache(max_entries=2)
+        cache.get_or_load("q", (1,), lambda: "one", ttl=60)
+        cache.get_or_load("q", (2,), lambda: "two", ttl=60)
+        cache.get_or_load("q", (1,), lambda: "reloaded", ttl=60)
+        cache.get_or_load("q", (3,), lambda: "three", ttl=60)
+
+        self.assertEqual(
+            cache.get_or_load("q", (1,), lambda: "reloaded", ttl=60), "one"
+        )
+        self.assertEqual(
+            cache.get_or_load("q", (2,), lambda: "reloaded", ttl=60), "reloaded"
+        )
+        self.assertGreaterEqual(cache.stats()["evictions"], 1)
+
+    def test_invalidate_by_args_and_predicate(self):
+        cache = QueryCache()
+        cache.get_or_load("q", (1,), lambda: [1, 2], ttl=60)
+        cache.get_or_load("q", (2,), lambda: [3], ttl=60)
+        cache.get_or_load("q", (3,), lambda: [4], ttl=60)
+
+        cache.invalidate("q", args=(2,))
+        cache.invalidate("q", where=lambda value: 4 in value)
+
+        self.assertEqual(cache.stats()["size"], 1)
+        self.assertEqual(cache.get_or_load("q", (1,), lambda: None, ttl=60), [1, 2])
+
+    def test_load_racing_an_invalidation_is_not_stored(self):
+        cache = QueryCache()
+
+        def loader():
+            cache.invalidate("q")
+            return "stale"
+
+        cache.get_or_load("q", (), loader, ttl=60)
+
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_disabled_cache_always_loads(self):
+        cache = QueryCache(enabled=False)
+        loader = MagicMock(return_value=[1])
+
+        cache.get_or_load("q", (), loader, ttl=60)
+        cache.get_or_load("q", (), loader, ttl=60)
+
+        self.assertEqual(loader.call_count, 2)
+
+
+class TestRepositoryCache(SQLiteTestCase):
+    def test_reference_lists_are_cached(self):
+        repository.get_authors()
+        self.query("INSERT INTO Author (author_name) VALUES ('Unseen')")
+
+        self.assertEqual(len(repository.get_authors()), 5)
+        repository.invalidate_authors()
+        self.assertEqual(len(repository.get_authors()), 6)
+
+    def test_checkout_invalidates_only_affected_entries(self):
+        repository.get_available_books()
+        repository.get_patrons_with_book(1)
+        repository.get_patrons_with_book(2)
+        repository.search_books_by_author(1)
+        repository.search_books_by_author(2)
+        repository.get_patrons()
+
+        repository.check_out_book_transaction(1, 1)
+
+        self.assertNotIn((1, "Pride and Prejudice"), repository.get_available_books())
+        self.assertEqual(repository.get_patrons_with_book(1), [(1, "Alice Smith")])
+        self.assertEqual(repository.search_books_by_author(1)[0][4], 11)
+        repository.query_cache.reset_stats()
+        repository.get_patrons_with_book(2)
+        repository.search_books_by_author(2)
+        repository.get_patrons()
+        self.assertEqual(repository.cache_stats()["hits"], 3)
+
+    def test_failed_reads_are_not_cached(self):
+        with patch.object(repository, "get_connection", return_value=None), patch(
+            "builtins.print"
+        ):
+            self.assertEqual(repository.get_authors(), [])
+
+        self.assertEqual(len(repository.get_authors()), 5)
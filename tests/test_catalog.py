@@ -0,0 +1,97 @@
+from unittest.mock import patch
+
+from library_app import catalog, repository
+from library_app.backends import get_backend
+from library_app.catalog import CatalogSnapshot
+from tests.helpers import SQLiteTestCase
+
+
+class TestCatalogSnapshot(SQLiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.snapshot = CatalogSnapshot()
+        self.books = self.snapshot.refresh()
+
+    def test_load_and_lookups(self):
+        self.assertEqual(self.books, self.query("SELECT COUNT(*) FROM Book")[0][0])
+        self.assertEqual(
+            self.snapshot.get_book(1), (1, "Pride and Prejudice", "Jane Austen", True)
+        )
+        self.assertEqual(self.snapshot.patron_name(2), "Bob Johnson")
+        self.assertIsNone(self.snapshot.get_book(10**6))
+        self.assertFalse(self.snapshot.is_available(0))
+        self.assertEqual(
+            list(self.snapshot.available_book_ids()),
+            sorted(row[0] for row in repository.get_available_books()),
+        )
+
+    def test_refresh_rereads_only_changed_rows(self):
+        repository.check_out_book_transaction(1, 1)
+        self.query("UPDATE Patron SET patron_name = 'Bob Smith' WHERE patron_id = 2")
+        self.query(
+            "INSERT INTO Book (book_id, book_title, publish_year, times_checked_out,"
+            " is_checked, author_id) VALUES (100, 'Persuasion', 1817, 0, 0, 1)"
+        )
+        self.query("DELETE FROM Book WHERE book_id = 100")
+
+        self.assertEqual(self.snapshot.refresh(), 2)
+
+        self.assertFalse(self.snapshot.is_available(1))
+        self.assertEqual(self.snapshot.patron_name(2), "Bob Smith")
+        self.assertIsNone(self.snapshot.get_book(100))
+        self.assertEqual(self.snapshot.refresh(), 0)
+
+    def test_skipped_change_is_applied_when_it_appears(self):
+        version = self.snapshot.version
+        self.query("UPDATE Book SET is_checked = 1 WHERE book_id IN (1, 2)")
+        # Hide the first change, as if its transaction had not committed yet
+        hidden = self.query(
+            "SELECT change_id, entity, entity_id FROM CatalogChange"
+            " WHERE change_id > ? ORDER BY change_id",
+            (version,),
+        )[0]
+        self.query("DELETE FROM CatalogChange WHERE change_id = ?", (hidden[0],))
+
+        self.snapshot.refresh()
+        self.assertEqual(self.snapshot.version, hidden[0] + 1)
+        self.assertTrue(self.snapshot.is_available(hidden[2]))
+
+        self.query("INSERT INTO CatalogChange VALUES (?, ?, ?)", hidden)
+        self.snapshot.refresh()
+        self.assertFalse(self.snapshot.is_available(hidden[2]))
+
+        # Until then it is looked up again, but only for GAP_TIMEOUT seconds
+        self.query("DELETE FROM CatalogChange WHERE change_id = ?", (hidden[0],))
+        self.snapshot._gaps = {hidden[0]: 0.0}
+        with patch.object(catalog, "GAP_TIMEOUT", 0):
+            self.snapshot.refresh()
+        self.assertEqual(self.snapshot._gaps, {})
+
+    def test_compaction_bounds_the_log_and_reloads_stale_snapshots(self):
+        # Every checkout and return logs its book's availability
+        logged = self.query("SELECT COUNT(*) FROM CatalogChange")[0][0] + 6
+        for book_id in (1, 2, 3):
+            repository.check_out_book_transaction(1, book_id)
+            repository.return_book_transaction(1, book_id)
+        self.assertEqual(self.compact(keep=logged), 0)
+        self.assertEqual(self.compact(keep=1), logged - 1)
+        self.assertEqual(self.query("SELECT COUNT(*) FROM CatalogChange"), [(1,)])
+        with self.assertRaises(ValueError):
+            self.compact(keep=0)
+
+        # The snapshot had applied none of the deleted changes
+        repository.check_out_book_transaction(1, 2)
+        self.assertEqual(self.snapshot.refresh(), self.books)
+        self.assertFalse(self.snapshot.is_available(2))
+        self.assertTrue(self.snapshot.is_available(3))
+        # Caught up again, it refreshes incrementally
+        repository.return_book_transaction(1, 2)
+        self.assertEqual(self.snapshot.refresh(), 1)
+        self.assertTrue(self.snapshot.is_available(2))
+
+    def compact(self, keep):
+        conn = get_backend().connect()
+        try:
+            return catalog.compact_changes(conn, keep=keep, batch_size=2)
+        finally:
+            conn.close()
@@ -4,17 +4,17 @@ from library_app import cli
 
 
 class TestCLI(unittest.TestCase):
-    @patch("library_app.cli.get_authors")
+    @patch("library_app.cli.get_authors_page")
     @patch("library_app.cli.search_books_by_author")
-    @patch("builtins.input", side_effect=["1"])
+    @patch(
+        "builtins.input", side_effect=["", "", "1"]
+    )  # Browse by author, list all, pick 1
     @patch("builtins.print")
     def test_search_books_with_input(
         self, mock_print, mock_input, mock_search, mock_get_authors
     ):
         mock_get_authors.return_value = [(1, "Jane Austen")]
-        mock_search.return_value = [
-            (1, "Pride and Prejudice", "Jane Austen", 1813, 10)
-        ]
+        mock_search.return_value = [(1, "Pride and Prejudice", "Jane Austen", 1813, 10)]
 
         cli.search_books_with_input()
 
@@ -23,13 +23,17 @@ class TestCLI(unittest.TestCase):
         # Verify output contains book info
         # This is a bit fragile as it checks print calls
         self.assertTrue(
-            any("Pride and Prejudice" in str(call) for call in mock_print.call_args_list)
+            any(
+                "Pride and Prejudice" in str(call) for call in mock_print.call_args_list
+            )
         )
 
-    @patch("library_app.cli.get_available_books")
-    @patch("library_app.cli.get_patrons")
+    @patch("library_app.cli.get_available_books_page")
+    @patch("library_app.cli.get_patrons_page")
     @patch("library_app.cli.check_out_book_transaction")
-    @patch("builtins.input", side_effect=["1", "1"])  # Select book 1, patron 1
+    @patch(
+        "builtins.input", side_effect=["1", "", "1"]
+    )  # Select book 1, list patrons, patron 1
     @patch("builtins.print")
     def test_check_out_book_with_input(
         self,
@@ -47,28 +51,144 @@ class TestCLI(unittest.TestCase):
 
         mock_checkout.assert_called_with(1, 1)
 
-    @patch("library_app.cli.get_borrowed_books")
-    @patch("library_app.cli.get_patrons")
-    @patch("library_app.cli.get_patrons_with_book")
+    @patch("library_app.cli.get_patrons_page")
+    @patch("library_app.cli.get_return_context")
     @patch("library_app.cli.return_book_transaction")
     @patch(
-        "builtins.input", side_effect=["y", "1", "1"]
-    )  # Yes return, select patron 1, book 1
+        "builtins.input", side_effect=["y", "", "1", "2"]
+    )  # Yes return, list patrons, select patron 1, book 2
     @patch("builtins.print")
     def test_return_book_with_input(
         self,
         mock_print,
         mock_input,
         mock_return,
-        mock_get_patrons_book,
+        mock_context,
         mock_get_patrons,
-        mock_get_borrowed,
     ):
-        mock_get_borrowed.return_value = [(1, "Book 1")]
         mock_get_patrons.return_value = [(1, "Patron 1")]
-        mock_get_patrons_book.return_value = [(1, "Patron 1")]
+        mock_context.return_value = [
+            ("Patron 1", 1, "Book 1", "Author 1", None),
+            ("Patron 1", 2, "Book 2", None, None),
+        ]
         mock_return.return_value = {"status": "success", "message": "Success"}
 
         cli.return_book_with_input()
 
-        mock_return.assert_called_with(1, 1)
+        mock_context.assert_called_once_with(1)
+        mock_print.assert_any_call("1. Book 1 by Author 1")
+        mock_print.assert_any_call("2. Book 2")
+        mock_return.assert_called_with(1, 2)
+
+    @patch("library_app.cli.get_patrons_page")
+    @patch("library_app.cli.get_return_context")
+    @patch("library_app.cli.return_book_transaction")
+    @patch("builtins.input", side_effect=["y", "", "1", "3"])
+    @patch("builtins.print")
+    def test_return_only_offers_the_patrons_loans(
+        self, mock_print, mock_input, mock_return, mock_context, mock_get_patrons
+    ):
+        mock_get_patrons.return_value = [(1, "Patron 1")]
+        mock_context.return_value = [("Patron 1", 1, "Book 1", "Author 1", None)]
+
+        cli.return_book_with_input()
+        mock_print.assert_any_call("Invalid book selection.")
+
+        mock_context.return_value = [("Patron 1", None, None, None, None)]
+        mock_input.side_effect = ["y", "", "1"]
+        cli.return_book_with_input()
+        mock_print.assert_any_call("\nPatron 1 has no borrowed books.")
+        mock_return.assert_not_called()
+
+    @patch("library_app.cli.config.DB_PAGE_SIZE", 2)
+    @patch("library_app.cli.get_authors_page")
+    @patch("library_app.cli.search_books_by_author")
+    @patch(
+        "builtins.input", side_effect=["", "", "", "3"]
+    )  # Browse, list all, next page, author 3
+    @patch("builtins.print")
+    def test_search_pages_through_authors(
+        self, mock_print, mock_input, mock_search, mock_get_authors
+    ):
+        mock_get_authors.side_effect = [
+            [(1, "Jane Austen"), (2, "Charles Dickens")],
+            [(3, "Mark Twain")],
+        ]
+        mock_search.return_value = []
+
+        cli.search_books_with_input()
+
+        mock_get_authors.assert_called_with(after_id=2, limit=2)
+        mock_search.assert_called_with(3)
+
+    @patch("library_app.cli.get_authors_page")
+    @patch("library_app.cli.search_books_by_author")
+    @patch("builtins.input", side_effect=["", "", "7"])
+    @patch("builtins.print")
+    def test_search_rejects_unlisted_author(
+        self, mock_print, mock_input, mock_search, mock_get_authors
+    ):
+        mock_get_authors.return_value = [(1, "Jane Austen")]
+
+        cli.search_books_with_input()
+
+        mock_search.assert_not_called()
+        mock_print.assert_any_call("Invalid author selection.")
+
+    @patch("library_app.cli.search_books")
+    @patch("library_app.cli.get_authors_page")
+    @patch("builtins.input", side_effect=["pride aus"])
+    @patch("builtins.print")
+    def test_search_by_text_is_the_default(
+        self, mock_print, mock_input, mock_get_authors, mock_search
+    ):
+        mock_search.return_value = [(1, "Pride and Prejudice", "Jane Austen", 1813, 10)]
+
+        cli.search_books_with_input()
+
+        mock_search.assert_called_with("pride aus")
+        mock_get_authors.assert_not_called()
+        self.assertTrue(
+            any(
+                "Pride and Prejudice" in str(call) for call in mock_print.call_args_list
+            )
+        )
+
+    @patch("library_app.cli.find_patrons")
+    @patch("library_app.cli.get_available_books_page")
+    @patch("library_app.cli.get_patrons_page")
+    @patch("library_app.cli.check_out_book_transaction")
+    @patch("builtins.input", side_effect=["1", "ros", "4"])
+    @patch("builtins.print")
+    def test_check_out_finds_patron_by_name(
+        self,
+        mock_print,
+        mock_input,
+        mock_checkout,
+        mock_get_patrons,
+        mock_get_books,
+        mock_find,
+    ):
+        mock_get_books.return_value = [(1, "Book 1")]
+        mock_find.return_value = [(4, "Rosa Santos"), (9, "Rosa Weber")]
+        mock_checkout.return_value = {"status": "success", "message": "Success"}
+
+        cli.check_out_book_with_input()
+
+        mock_find.assert_called_with("ros", cli.config.DB_PAGE_SIZE)
+        mock_get_patrons.assert_not_called()
+        mock_checkout.assert_called_with(4, 1)
+
+    @patch("library_app.cli.find_authors")
+    @patch("library_app.cli.search_books_by_author")
+    @patch("builtins.input", side_effect=["", "zz"])
+    @patch("builtins.print")
+    def test_unmatched_author_name(
+        self, mock_print, mock_input, mock_search, mock_find
+    ):
+        mock_find.return_value = []
+
+        cli.search_books_with_input()
+
+        mock_search.assert_not_called()
+        mock_print.assert_any_call("No authors found matching 'zz'.")
@@ -0,0 +1,115 @@
+import io
+import json
+import subprocess
+import sys
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from unittest.mock import patch
+
+from library_app import commands
+from library_app.backends import SQLiteBackend
+from tests.helpers import SQLiteTestCase
+
+
+class TestCommands(SQLiteTestCase):
+    def run_main(self, *argv):
+        out, err = io.StringIO(), io.StringIO()
+        with redirect_stdout(out), redirect_stderr(err):
+            status = commands.main(list(argv))
+        return status, out.getvalue(), err.getvalue()
+
+    def test_search_json(self):
+        status, out, _ = self.run_main("search", "pride", "--json")
+
+        self.assertEqual(status, 0)
+        self.assertEqual(json.loads(out)[0]["book_title"], "Pride and Prejudice")
+
+    def test_checkout_exit_status(self):
+        self.assertEqual(
+            self.run_main("checkout", "1", "1")[:2],
+            (0, "Book checked out successfully.\n"),
+        )
+        self.assertEqual(self.run_main("checkout", "2", "1")[0], 1)
+        self.assertEqual(
+            self.run_main("list-borrowed")[1], "1\tPride and Prejudice\tJane Austen\n"
+        )
+
+    def test_usage_error(self):
+        status, _, err = self.run_main("checkout", "one", "1")
+
+        self.assertEqual(status, 2)
+        self.assertIn("invalid int value", err)
+
+    def test_batch_reports_each_command_on_one_connection(self):
+        lines = [
+            "checkout 1 2",
+            "# comment",
+            "",
+            "return 1 2",
+            "return 1 2",
+            "search",
+            'search "great exp"',
+        ]
+        out = []
+        with patch.object(
+            SQLiteBackend, "connect", autospec=True, side_effect=SQLiteBackend.connect
+        ) as connect, redirect_stderr(io.StringIO()) as err:
+            ran, failed = commands.run_batch(lines, as_json=True, out=out.append)
+
+        self.assertEqual((ran, failed), (5, 2))
+        self.assertEqual(connect.call_count, 1)
+        results = [json.loads(line) for line in out]
+        self.assertEqual(
+            [(result["line"], result["ok"]) for result in results],
+            [(1, True), (4, True), (5, False), (6, False), (7, True)],
+        )
+        self.assertEqual(
+            results[3]["result"]["message"], "search needs a query or --author"
+        )
+        self.assertIn("Ran 5 commands", err.getvalue())
+
+    def test_all_writes_each_row_as_it_is_read(self):
+        out = io.StringIO()
+
+        def rows():
+            yield 1, "Pride and Prejudice"
+            # The first row is out before the second is read
+            self.assertEqual(out.getvalue(), "1\tPride and Prejudice\n")
+            yield 2, "Emma"
+
+        with patch.object(
+            commands.repository, "iter_available_books", return_value=rows()
+        ), redirect_stdout(out):
+            status = commands.main(["list-available", "--all"])
+
+        self.assertEqual(status, 0)
+        self.assertEqual(out.getvalue().count("\n"), 2)
+
+    def test_help_in_a_batch_does_not_end_it(self):
+        out = []
+        with redirect_stderr(io.StringIO()):
+            ran, failed = commands.run_batch(
+                ["search --help", "-h", "search"], out=out.append
+            )
+
+        self.assertEqual((ran, failed), (3, 1))
+        self.assertTrue(out[0].startswith("1\tok\tusage: main.py search"))
+        self.assertTrue(out[1].startswith("2\tok\tusage: main.py"))
+        self.assertTrue(out[2].startswith("3\terror\t"))
+
+
+class TestStartup(unittest.TestCase):
+    def test_import_defers_driver_and_settings(self):
+        # A fresh interpreter, since this one has long since loaded both
+        code = (
+            "import sys\n"
+            "import library_app.commands, library_app.main, library_app.server\n"
+            "from library_app import config\n"
+            "print(config._settings is None, 'dotenv' in sys.modules,"
+            " 'mysql.connector' in sys.modules)"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        ).stdout
+
+        self.assertEqual(output.split(), ["True", "False", "False"])
@@ -0,0 +1,57 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from library_app import repository
+from tests.helpers import SQLiteTestCase
+
+
+class TestConcurrentCheckout(SQLiteTestCase):
+    def test_each_book_is_checked_out_once(self):
+        attempts = [
+            (patron_id, book_id) for patron_id in (1, 2, 3) for book_id in range(1, 6)
+        ]
+        attempts *= 40
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(
+                executor.map(
+                    lambda a: repository.check_out_book_transaction(*a), attempts
+                )
+            )
+
+        successes = [r for r in results if r["status"] == "success"]
+        self.assertEqual(len(successes), 5)
+        self.assertEqual(
+            self.query("SELECT book_id, COUNT(*) FROM Transaction GROUP BY book_id"),
+            [(book_id, 1) for book_id in range(1, 6)],
+        )
+
+    def test_no_book_is_held_twice(self):
+        holders = {}
+        violations = []
+        lock = threading.Lock()
+
+        def borrow_and_return(patron_id, book_id):
+            result = repository.check_out_book_transaction(patron_id, book_id)
+            if result["status"] != "success":
+                return
+            with lock:
+                if holders.get(book_id) is not None:
+                    violations.append((book_id, holders[book_id], patron_id))
+                holders[book_id] = patron_id
+            time.sleep(0.001)
+            # Release before the return commits so the next borrower can't race us
+            with lock:
+                holders[book_id] = None
+            repository.return_book_transaction(patron_id, book_id)
+
+        work = [(patron_id, book_id) for patron_id in (1, 2, 3) for book_id in (1, 2)]
+        work *= 100
+        with ThreadPoolExecutor(max_workers=12) as executor:
+            list(executor.map(lambda w: borrow_and_return(*w), work))
+
+        self.assertEqual(violations, [])
+        self.assertEqual(
+            self.query("SELECT COUNT(*) FROM Book WHERE is_checked <> 0"), [(0,)]
+        )
@@ -0,0 +1,83 @@
+import random
+import unittest
+from collections import Counter
+
+from library_app.backends import get_backend
+from library_app.datagen import ZipfSampler, generate_catalog
+from tests.helpers import SQLiteTestCase
+
+
+class TestZipfSampler(unittest.TestCase):
+    def test_samples_stay_in_range_and_are_skewed(self):
+        sampler = ZipfSampler(1000, 1.0, random.Random(1))
+        counts = Counter(sampler() for _ in range(20000))
+
+        self.assertTrue(all(1 <= value <= 1000 for value in counts))
+        top_ten = sum(count for _, count in counts.most_common(10))
+        self.assertGreater(top_ten, 20000 * 0.3)
+
+
+class TestGenerateCatalog(SQLiteTestCase):
+    def generate(self, **kwargs):
+        conn = get_backend().connect()
+        try:
+            return generate_catalog(conn, batch_size=100, **kwargs)
+        finally:
+            conn.close()
+
+    def test_sizes_and_open_loans(self):
+        written = self.generate(books=1000)
+
+        self.assertEqual(
+            written,
+            {
+                "Author": 50,
+                "Patron": 100,
+                "Book": 1000,
+                "Transaction": 530,
+                "TransactionRecord": 530,
+                "OpenLoan": 30,
+            },
+        )
+        # Every checked-out book's latest transaction is its open loan
+        self.assertEqual(
+            self.query("SELECT COUNT(*) FROM Book WHERE is_checked = 1"), [(30,)]
+        )
+        self.assertEqual(
+            self.query(
+                "SELECT COUNT(*) FROM Book WHERE is_checked = 1 AND book_id NOT IN "
+                "(SELECT book_id FROM Transaction)"
+            ),
+            [(0,)],
+        )
+        # Only open loans lack a return date
+        self.assertEqual(
+            self.query(
+                "SELECT COUNT(*) FROM TransactionRecord "
+                "WHERE date_return IS NULL AND transaction_id IN "
+                "(SELECT transaction_id FROM OpenLoan)"
+            ),
+            [(30,)],
+        )
+        self.assertEqual(
+            self.query(
+                "SELECT COUNT(*) FROM TransactionRecord WHERE date_return IS NULL"
+            ),
+            [(30,)],
+        )
+
+    def test_same_seed_same_rows(self):
+        self.generate(books=200, seed=7)
+        first = self.query("SELECT book_title, author_id FROM Book WHERE book_id > 5")
+        self.query("DELETE FROM OpenLoan")
+        self.query("DELETE FROM TransactionRecord")
+        self.query("DELETE FROM Transaction WHERE book_id > 5")
+        self.query("DELETE FROM Book WHERE book_id > 5")
+        self.query("DELETE FROM Author WHERE author_id > 5")
+
+        self.generate(books=200, seed=7)
+
+        self.assertEqual(
+            self.query("SELECT book_title, author_id FROM Book WHERE book_id > 5"),
+            first,
+        )
@@ -0,0 +1,174 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from library_app import repository
+from library_app.backends import MySQLBackend
+from library_app.importer import CatalogImporter, import_catalog
+from tests.helpers import SQLiteTestCase
+
+
+class TestImportCatalog(SQLiteTestCase):
+    def setUp(self):
+        super().setUp()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.dir = tmpdir.name
+
+    def write(self, name, content):
+        path = os.path.join(self.dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def test_imports_csv_and_jsonl_in_batches(self):
+        authors = self.write("authors.csv", "author_name\nOctavia Butler\n")
+        patrons = self.write("patrons.jsonl", '{"patron_name": "Ada"}\n\n')
+        books = self.write(
+            "books.jsonl",
+            "".join(
+                json.dumps(record) + "\n"
+                for record in [
+                    {
+                        "book_title": "Kindred",
+                        "publish_year": 1979,
+                        "author_name": "Octavia Butler",
+                    },
+                    {
+                        "book_title": "Dune",
+                        "publish_year": 1965,
+                        "author_name": "Frank Herbert",
+                    },
+                    {"book_title": "Emma", "publish_year": 1815, "author_id": 1},
+                ]
+            ),
+        )
+
+        loaded = import_catalog(
+            {"books": books, "authors": authors, "patrons": patrons},
+            batch_size=2,
+            progress=False,
+        )
+
+        self.assertEqual(loaded, {"authors": 1, "patrons": 1, "books": 3})
+        rows = self.query(
+            "SELECT book_title, author_name FROM Book JOIN Author "
+            "ON Book.author_id = Author.author_id WHERE book_title IN "
+            "('Kindred', 'Dune', 'Emma') ORDER BY book_title"
+        )
+        # Known names reuse their author; unknown ones are created once
+        self.assertEqual(
+            rows,
+            [
+                ("Dune", "Frank Herbert"),
+                ("Emma", "Jane Austen"),
+                ("Kindred", "Octavia Butler"),
+            ],
+        )
+        self.assertEqual(
+            self.query(
+                "SELECT COUNT(*) FROM Author WHERE author_name = 'Frank Herbert'"
+            ),
+            [(1,)],
+        )
+        # Imported books are searchable straight away
+        self.assertEqual(repository.search_books("kindred")[0][1], "Kindred")
+
+    def test_new_authors_get_database_ids_alongside_concurrent_inserts(self):
+        books = self.write(
+            "books.csv",
+            "book_title,publish_year,author_name\n"
+            "Dune,1965,Frank Herbert\n"
+            "Kindred,1979,Octavia Butler\n"
+            "Children of Dune,1976,Frank Herbert\n",
+        )
+        load_author_map = CatalogImporter._load_author_map
+
+        def load_then_race(importer):
+            load_author_map(importer)
+            # Another client adds an author after the map was read
+            self.query("INSERT INTO Author (author_name) VALUES ('Ursula Le Guin')")
+
+        with patch.object(CatalogImporter, "_load_author_map", load_then_race):
+            loaded = import_catalog({"books": books}, batch_size=2, progress=False)
+
+        self.assertEqual(loaded, {"books": 3})
+        self.assertEqual(
+            self.query(
+                "SELECT book_title, author_name FROM Book JOIN Author "
+                "ON Book.author_id = Author.author_id WHERE book_title IN "
+                "('Dune', 'Kindred', 'Children of Dune') ORDER BY book_title"
+            ),
+            [
+                ("Children of Dune", "Frank Herbert"),
+                ("Dune", "Frank Herbert"),
+                ("Kindred", "Octavia Butler"),
+            ],
+        )
+        self.assertEqual(
+            self.query(
+                "SELECT COUNT(DISTINCT author_id) FROM Author WHERE author_name IN "
+                "('Frank Herbert', 'Octavia Butler', 'Ursula Le Guin')"
+            ),
+            [(3,)],
+        )
+
+    def test_missing_field_reports_the_line(self):
+        books = self.write("books.csv", "book_title,publish_year\nDune,\n")
+
+        with self.assertRaisesRegex(ValueError, r"books.csv:2: missing publish_year"):
+            import_catalog({"books": books}, progress=False)
+
+    def test_rejects_checked_out_books_without_a_loan(self):
+        books = self.write(
+            "books.csv",
+            "book_title,publish_year,author_id,is_checked\n"
+            "Dune,1965,1,0\nEmma,1815,1,1\n",
+        )
+
+        with self.assertRaisesRegex(ValueError, r"books.csv:3: is_checked"):
+            import_catalog({"books": books}, progress=False)
+        # Nothing half-loaded: the batch with the bad row is not committed
+        self.assertEqual(
+            self.query("SELECT COUNT(*) FROM Book WHERE book_title = 'Emma'"),
+            [(0,)],
+        )
+        self.assertEqual(
+            self.query(
+                "SELECT COUNT(*) FROM Book LEFT JOIN OpenLoan "
+                "ON OpenLoan.book_id = Book.book_id "
+                "WHERE Book.is_checked = 1 AND OpenLoan.book_id IS NULL"
+            ),
+            [(0,)],
+        )
+
+    def test_rejects_unknown_formats_and_kinds(self):
+        path = self.write("books.xml", "")
+
+        with self.assertRaisesRegex(ValueError, "expected a .csv or .jsonl"):
+            import_catalog({"books": path}, progress=False)
+        with self.assertRaisesRegex(ValueError, "Unknown import kind"):
+            import_catalog({"loans": path}, progress=False)
+
+
+class TestMySQLLoadRows(unittest.TestCase):
+    def test_load_data_file_quotes_strings_and_nulls(self):
+        cursor = MagicMock()
+        with tempfile.TemporaryDirectory() as staging_dir:
+            MySQLBackend().load_rows(
+                cursor,
+                "Book",
+                ("book_title", "publish_year", "author_id"),
+                [('Say "NULL"', 2001, None)],
+                staging_dir,
+            )
+            with open(os.path.join(staging_dir, "Book.csv")) as f:
+                content = f.read()
+
+        self.assertEqual(content, '"Say ""NULL""",2001,NULL\n')
+        sql = cursor.execute.call_args.args[0]
+        self.assertIn("LOAD DATA LOCAL INFILE", sql)
+        self.assertIn("(book_title, publish_year, author_id)", sql)
+        cursor.executemany.assert_not_called()
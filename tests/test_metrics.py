@@ -0,0 +1,90 @@
+import json
+import os
+import sqlite3
+import tempfile
+from unittest.mock import patch
+
+from library_app import config, metrics, repository
+from tests.helpers import SQLiteTestCase
+
+
+class TestMetrics(SQLiteTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        patcher = patch.object(config, "DB_METRICS_ENABLED", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_records_calls_rows_and_latency(self):
+        repository.get_authors()
+        repository.get_authors()
+        self.assertEqual(len(list(repository.iter_patrons())), 3)
+
+        functions = metrics.snapshot()["functions"]
+        authors = functions["get_authors"]
+        self.assertEqual((authors["calls"], authors["rows"]), (2, 10))
+        self.assertEqual(authors["latency_seconds"]["buckets"]["+Inf"], 2)
+        self.assertEqual(functions["iter_patrons"]["rows"], 3)
+
+    def test_counts_database_errors(self):
+        with patch(
+            "library_app.statements._execute",
+            side_effect=sqlite3.OperationalError("disk I/O error"),
+        ):
+            self.assertEqual(repository.get_patrons(), [])
+
+        self.assertEqual(metrics.snapshot()["functions"]["get_patrons"]["errors"], 1)
+
+    def test_slow_query_log(self):
+        log_path = os.path.join(tempfile.mkdtemp(), "slow.log")
+        with patch.object(config, "DB_SLOW_QUERY_MS", 0), patch.object(
+            config, "DB_SLOW_QUERY_LOG", log_path
+        ):
+            repository.get_patrons_with_book(1)
+
+        (entry,) = metrics.slow_queries()
+        self.assertEqual(entry["function"], "get_patrons_with_book")
+        self.assertEqual(entry["statement"], "patrons_with_book")
+        self.assertEqual(entry["params"], [1])
+        self.assertIn("FROM OpenLoan", entry["sql"])
+        with open(log_path) as log:
+            self.assertEqual(json.loads(log.read()), entry)
+
+    def test_prometheus_text(self):
+        repository.get_authors()
+
+        text = metrics.prometheus_text()
+
+        self.assertIn('library_repository_calls_total{function="get_authors"} 1', text)
+        self.assertIn(
+            'library_repository_call_duration_seconds_bucket{function="get_authors",le="+Inf"} 1',  # noqa: E501
+            text,
+        )
+        self.assertIn("# TYPE library_repository_call_duration_seconds histogram", text)
+
+    def test_disabled_records_nothing(self):
+        with patch.object(config, "DB_METRICS_ENABLED", False):
+            repository.get_authors()
+
+        self.assertEqual(metrics.snapshot()["functions"], {})
+
+
+class TestSpanHooks(SQLiteTestCase):
+    def test_hook_runs_without_metrics(self):
+        spans = []
+        metrics.add_span_hook(spans.append)
+        self.addCleanup(metrics.remove_span_hook, spans.append)
+
+        repository.check_out_book_transaction(1, 1)
+
+        statement_spans = [span for span in spans if span.kind == "statement"]
+        call = spans[-1]
+        self.assertEqual(
+            (call.kind, call.name, call.status),
+            ("call", "check_out_book_transaction", "OK"),
+        )
+        self.assertEqual(statement_spans[0].attributes["db.operation"], "reserve_book")
+        self.assertTrue(all(span.parent is call for span in statement_spans))
+        self.assertEqual(metrics.snapshot()["functions"], {})
@@ -0,0 +1,94 @@
+from unittest.mock import patch
+
+from library_app import repository, statements
+from library_app.backends import get_backend
+from library_app.migrations import applied_versions, discover, migrate
+from library_app.query_plans import find_full_scans
+from tests.helpers import SQLiteTestCase
+
+
+class TestMigrations(SQLiteTestCase):
+    def test_versions_are_ordered_and_recorded(self):
+        versions = [version for version, _, _ in discover()]
+        self.assertEqual(versions, sorted(versions))
+
+        conn = get_backend().connect()
+        try:
+            self.assertEqual(applied_versions(conn), set(versions))
+            # Everything is already applied, so a second run is a no-op
+            self.assertEqual(migrate(conn), [])
+        finally:
+            conn.close()
+
+    def test_up_migrations_are_idempotent(self):
+        conn = get_backend().connect()
+        try:
+            for _, _, module in discover():
+                module.up(conn.cursor(), get_backend())
+        finally:
+            conn.close()
+
+    def test_hot_query_indexes_exist(self):
+        indexes = {
+            row[0]
+            for row in self.query("SELECT name FROM sqlite_master WHERE type = 'index'")
+        }
+        self.assertTrue(
+            {
+                "idx_book_is_checked",
+                "idx_book_author",
+                "idx_transaction_book_patron",
+                "idx_open_loan_patron",
+            }
+            <= indexes
+        )
+
+
+class TestQueryPlans(SQLiteTestCase):
+    def test_repository_queries_use_indexes(self):
+        conn = get_backend().connect()
+        try:
+            self.assertEqual(find_full_scans(conn), [])
+        finally:
+            conn.close()
+
+    def test_missing_index_is_reported(self):
+        self.query("DROP INDEX idx_open_loan_patron")
+        repository.close_pool()
+
+        conn = get_backend().connect()
+        try:
+            problems = find_full_scans(conn)
+        finally:
+            conn.close()
+
+        functions = {problem["function"] for problem in problems}
+        self.assertEqual(
+            functions,
+            {
+                "get_borrowed_books_for_patron",
+                "get_loans_for_patron",
+                "get_return_context",
+            },
+        )
+
+    def test_statements_no_call_runs_are_reported(self):
+        new_query = "SELECT patron_id FROM Patron WHERE patron_name = %s"
+        with patch.dict(statements.STATEMENTS, {"patron_by_name": new_query}):
+            conn = get_backend().connect()
+            try:
+                problems = find_full_scans(conn)
+            finally:
+                conn.close()
+
+        self.assertEqual(
+            problems,
+            [
+                {
+                    "function": None,
+                    "statement": "patron_by_name",
+                    "sql": new_query,
+                    "tables": [],
+                }
+            ],
+        )
@@ -0,0 +1,106 @@
+import importlib
+
+from library_app import repository
+from library_app.backends import get_backend
+from tests.helpers import SQLiteTestCase
+
+
+class TestOpenLoans(SQLiteTestCase):
+    def open_loans(self):
+        return self.query("SELECT book_id, patron_id FROM OpenLoan ORDER BY book_id")
+
+    def test_checkout_and_return_are_dated(self):
+        repository.check_out_book_transaction(1, 1)
+
+        self.assertEqual(self.open_loans(), [(1, 1)])
+        self.assertEqual(
+            self.query(
+                "SELECT date_issue IS NOT NULL, date_return IS NULL FROM TransactionRecord"
+            ),
+            [(1, 1)],
+        )
+
+        result = repository.return_book_transaction(1, 1)
+
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(self.open_loans(), [])
+        self.assertEqual(
+            self.query("SELECT date_return IS NOT NULL FROM TransactionRecord"), [(1,)]
+        )
+
+    def test_only_the_current_holder_can_return(self):
+        repository.check_out_book_transaction(1, 1)
+        repository.return_book_transaction(1, 1)
+        repository.check_out_book_transaction(2, 1)
+
+        self.assertEqual(repository.get_patrons_with_book(1), [(2, "Bob Johnson")])
+        result = repository.return_book_transaction(1, 1)
+        self.assertEqual(result["status"], "error")
+        self.assertEqual(self.open_loans(), [(1, 2)])
+
+    def test_borrowed_books_for_patron(self):
+        repository.check_out_books_bulk([(1, 1), (1, 3), (2, 2)])
+
+        self.assertEqual(
+            [row[0] for row in repository.get_borrowed_books_for_patron(1)], [1, 3]
+        )
+        self.assertEqual(
+            self.query(
+                "SELECT COUNT(*) FROM TransactionRecord WHERE date_issue IS NULL"
+            ),
+            [(0,)],
+        )
+
+        repository.return_books_bulk([(1, 3)])
+
+        self.assertEqual(
+            [row[0] for row in repository.get_borrowed_books_for_patron(1)], [1]
+        )
+
+    def test_loans_and_return_context_for_patron(self):
+        name = self.query("SELECT patron_name FROM Patron WHERE patron_id = 1")[0][0]
+        self.assertEqual(repository.get_loans_for_patron(1), [])
+        self.assertEqual(
+            repository.get_return_context(1), [(name, None, None, None, None)]
+        )
+        self.assertEqual(repository.get_return_context(999), [])
+
+        repository.check_out_books_bulk([(1, 3), (1, 1), (2, 2)])
+        loans = repository.get_loans_for_patron(1)
+        self.assertEqual(
+            [row[:3] for row in loans],
+            [
+                row
+                for book_id in (1, 3)
+                for row in self.query(
+                    "SELECT book_id, book_title, author_name FROM Book"
+                    " JOIN Author ON Author.author_id = Book.author_id"
+                    " WHERE book_id = ?",
+                    (book_id,),
+                )
+            ],
+        )
+        self.assertTrue(all(row[3] is not None for row in loans))
+        self.assertEqual(
+            repository.get_return_context(1), [(name, *row) for row in loans]
+        )
+
+        repository.return_book_transaction(1, 1)
+        self.assertEqual([row[0] for row in repository.get_loans_for_patron(1)], [3])
+        self.assertEqual([row[1] for row in repository.get_return_context(1)], [3])
+
+    def test_migration_backfills_open_loans(self):
+        repository.check_out_book_transaction(2, 4)
+        self.query("DELETE FROM OpenLoan")
+        self.query("DELETE FROM TransactionRecord")
+
+        migration = importlib.import_module("library_app.migrations.0005_open_loans")
+        conn = get_backend().connect()
+        try:
+            migration.up(conn.cursor(), get_backend())
+            conn.commit()
+        finally:
+            conn.close()
+
+        self.assertEqual(self.open_loans(), [(4, 2)])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM TransactionRecord"), [(1,)])
@@ -0,0 +1,107 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+from library_app import repository
+from library_app.backends import get_backend
+from library_app.importer import import_catalog
+from library_app.outbox import EventsCompacted, Subscriber, compact
+from tests.helpers import SQLiteTestCase
+
+
+class TestOutbox(SQLiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.events = []
+        self.subscriber = Subscriber(self.events.append, batch_size=2)
+
+    def compact(self, keep):
+        conn = get_backend().connect()
+        try:
+            return compact(conn, keep=keep, batch_size=2)
+        finally:
+            conn.close()
+
+    def delivered(self):
+        return [(event.event, event.book_id, event.patron_id) for event in self.events]
+
+    def test_writes_append_events_in_their_transaction(self):
+        repository.check_out_book_transaction(1, 1)
+        repository.check_out_book_transaction(2, 1)
+        repository.return_book_transaction(1, 1)
+        repository.check_out_books_bulk([(1, 2), (2, 3)])
+        repository.return_books_bulk([(1, 2)])
+
+        self.assertEqual(self.subscriber.catch_up(), 5)
+        self.assertEqual(
+            self.delivered(),
+            [
+                ("checked_out", 1, 1),
+                ("returned", 1, 1),
+                ("checked_out", 2, 1),
+                ("checked_out", 3, 2),
+                ("returned", 2, 1),
+            ],
+        )
+        self.assertEqual(self.subscriber.poll(), 0)
+
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        path = os.path.join(tmpdir.name, "books.jsonl")
+        with open(path, "w") as f:
+            f.write('{"book_title": "Lud-in-the-Mist", "publish_year": 1926,')
+            f.write(' "author_name": "Hope Mirrlees"}\n')
+        import_catalog({"books": path}, progress=False)
+        self.subscriber.poll()
+        self.assertEqual(
+            self.delivered()[5:],
+            [("books_added", None, None), ("authors_added", None, None)],
+        )
+
+    def test_skipped_event_is_delivered_when_it_appears(self):
+        repository.check_out_book_transaction(1, 1)
+        repository.check_out_book_transaction(1, 2)
+        # Hide the first event, as if its transaction had not committed yet
+        hidden = self.query("SELECT * FROM Outbox ORDER BY event_id")[0]
+        self.query("DELETE FROM Outbox WHERE event_id = ?", (hidden[0],))
+
+        self.subscriber.poll()
+        self.assertEqual(self.delivered(), [("checked_out", 2, 1)])
+        self.query("INSERT INTO Outbox VALUES (?, ?, ?, ?)", hidden)
+        self.subscriber.poll()
+        self.assertEqual(self.delivered()[1:], [("checked_out", 1, 1)])
+        self.assertEqual(self.subscriber._gaps, {})
+
+    def test_compaction_resets_subscribers_that_fell_behind(self):
+        for book_id in (1, 2, 3):
+            repository.check_out_book_transaction(1, book_id)
+        self.assertEqual(self.compact(keep=5), 0)
+        self.assertEqual(self.compact(keep=1), 2)
+        self.assertEqual(self.query("SELECT COUNT(*) FROM Outbox"), [(1,)])
+
+        with self.assertRaises(EventsCompacted):
+            self.subscriber.poll()
+        resets = []
+        self.subscriber.on_reset = lambda: resets.append(True)
+        self.assertEqual(self.subscriber.poll(), 0)
+        self.assertEqual((resets, self.events), ([True], []))
+
+        repository.return_book_transaction(1, 3)
+        self.subscriber.poll()
+        self.assertEqual(self.delivered(), [("returned", 3, 1)])
+        with self.assertRaises(ValueError):
+            self.compact(keep=0)
+
+    def test_started_subscriber_tails_the_outbox(self):
+        delivered = []
+        subscriber = Subscriber(delivered.append)
+        with patch("builtins.print"):
+            subscriber.start(interval=0.01)
+            self.addCleanup(subscriber.stop)
+            repository.check_out_book_transaction(1, 1)
+            for _ in range(200):
+                if delivered:
+                    break
+                subscriber._stop.wait(0.01)
+            subscriber.stop()
+        self.assertEqual([event.book_id for event in delivered], [1])
@@ -0,0 +1,62 @@
+from library_app import repository
+from tests.helpers import SQLiteTestCase
+
+
+class TestKeysetPagination(SQLiteTestCase):
+    def test_pages_cover_the_table_once(self):
+        pages = []
+        after_id = 0
+        while True:
+            page = repository.get_authors_page(after_id=after_id, limit=2)
+            if not page:
+                break
+            pages.append(page)
+            after_id = page[-1][0]
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(
+            [row for page in pages for row in page], repository.get_authors()
+        )
+
+    def test_book_pages_follow_availability(self):
+        repository.check_out_book_transaction(1, 2)
+
+        self.assertEqual(
+            [
+                row[0]
+                for row in repository.get_available_books_page(after_id=1, limit=2)
+            ],
+            [3, 4],
+        )
+        self.assertEqual(
+            repository.get_borrowed_books_page(),
+            [(2, "Great Expectations", "Charles Dickens")],
+        )
+
+
+class TestStreaming(SQLiteTestCase):
+    def test_streams_match_list_queries(self):
+        repository.check_out_book_transaction(1, 2)
+
+        self.assertEqual(
+            list(repository.iter_authors(fetch_size=2)), repository.get_authors()
+        )
+        self.assertEqual(
+            list(repository.iter_patrons(fetch_size=2)), repository.get_patrons()
+        )
+        self.assertEqual(
+            list(repository.iter_available_books(fetch_size=2)),
+            repository.get_available_books(),
+        )
+        self.assertEqual(
+            list(repository.iter_borrowed_books()), repository.get_borrowed_books()
+        )
+
+    def test_abandoned_stream_returns_its_connection(self):
+        stream = repository.iter_authors(fetch_size=1)
+        next(stream)
+        self.assertEqual(repository.get_pool().status()["checked_out"], 1)
+
+        stream.close()
+
+        self.assertEqual(repository.get_pool().status()["checked_out"], 0)
@@ -0,0 +1,125 @@
+import gc
+import threading
+import unittest
+import weakref
+from unittest.mock import MagicMock, patch
+
+from library_app import config, repository, statements
+from library_app.pool import ConnectionPool, PoolTimeout
+from tests.helpers import SQLiteTestCase
+
+
+class TestConnectionPool(unittest.TestCase):
+    def make_pool(self, **kwargs):
+        creator = MagicMock(side_effect=lambda: MagicMock())
+        return ConnectionPool(creator, **kwargs), creator
+
+    def test_returned_connection_is_reused(self):
+        pool, creator = self.make_pool(size=1, max_overflow=0)
+
+        first = pool.connect()
+        raw = first._conn
+        first.close()
+        second = pool.connect()
+
+        self.assertIs(second._conn, raw)
+        self.assertEqual(creator.call_count, 1)
+        raw.rollback.assert_called_once()
+
+    def test_overflow_connections_are_closed_on_return(self):
+        pool, creator = self.make_pool(size=1, max_overflow=1)
+
+        first = pool.connect()
+        second = pool.connect()
+        overflow = second._conn
+        first.close()
+        second.close()
+
+        overflow.close.assert_called_once()
+        self.assertEqual(pool.status()["open"], 1)
+
+    def test_checkout_times_out_when_exhausted(self):
+        pool, _ = self.make_pool(size=1, max_overflow=0, timeout=0.05)
+
+        pool.connect()
+
+        with self.assertRaises(PoolTimeout):
+            pool.connect()
+
+    def test_waiter_gets_connection_when_one_is_returned(self):
+        pool, _ = self.make_pool(size=1, max_overflow=0, timeout=5)
+        held = pool.connect()
+        borrowed = []
+
+        waiter = threading.Thread(target=lambda: borrowed.append(pool.connect()))
+        waiter.start()
+        held.close()
+        waiter.join(timeout=5)
+
+        self.assertEqual(len(borrowed), 1)
+
+    def test_failed_health_check_replaces_connection(self):
+        pool, creator = self.make_pool(size=1, max_overflow=0, pre_ping=True)
+        conn = pool.connect()
+        stale = conn._conn
+        stale.is_connected.return_value = False
+        conn.close()
+
+        fresh = pool.connect()
+
+        self.assertIsNot(fresh._conn, stale)
+        stale.close.assert_called_once()
+        self.assertEqual(creator.call_count, 2)
+
+    def test_connections_past_max_lifetime_are_recycled(self):
+        pool, creator = self.make_pool(size=1, max_overflow=0, recycle=0.001)
+        conn = pool.connect()
+        old = conn._conn
+        conn.close()
+        threading.Event().wait(0.01)
+
+        self.assertIsNot(pool.connect()._conn, old)
+        self.assertEqual(creator.call_count, 2)
+
+    def test_failed_connect_frees_slot(self):
+        creator = MagicMock(side_effect=[RuntimeError("down"), MagicMock()])
+        pool = ConnectionPool(creator, size=1, max_overflow=0, timeout=0.05)
+
+        with self.assertRaises(RuntimeError):
+            pool.connect()
+
+        self.assertIsNotNone(pool.connect())
+
+    def test_connection_state_lives_and_closes_with_the_connection(self):
+        pool, _ = self.make_pool(size=1, max_overflow=1)
+        first = pool.connect()
+        overflow = pool.connect()
+        cached = MagicMock()
+        first.state["cursors"] = MagicMock()
+        overflow.state["cursors"] = cached
+        kept = first.state
+        first.close()
+        overflow.close()
+
+        cached.close.assert_called_once()
+        self.assertEqual(overflow.state, {})
+        self.assertIs(pool.connect().state, kept)
+
+
+class TestStatementCursors(SQLiteTestCase):
+    def test_closed_overflow_connections_release_their_cursors(self):
+        with patch.object(config, "DB_POOL_SIZE", 1), patch.object(
+            config, "DB_POOL_MAX_OVERFLOW", 50
+        ):
+            repository.close_pool()
+            held = [repository.get_connection() for _ in range(20)]
+            refs = []
+            for conn in held:
+                statements.execute(conn, "patrons_with_book", (1,)).fetchall()
+                refs.append(weakref.ref(conn.driver_connection))
+                conn.close()
+            del held, conn
+            gc.collect()
+
+            self.assertEqual(repository.get_pool().status()["open"], 1)
+            self.assertEqual(sum(ref() is not None for ref in refs), 1)
@@ -0,0 +1,213 @@
+import asyncio
+import http.client
+import json
+import os
+import sqlite3
+import threading
+import unittest
+from unittest.mock import patch
+
+from library_app import aio_repository, config, repository
+from library_app.replicas import Replica, ReplicaSet
+from library_app.server import LibraryServer
+from tests.helpers import SQLiteTestCase
+
+
+class FakePool:
+    def __init__(self, error=None):
+        self.error = error
+
+    def connect(self):
+        if self.error:
+            raise self.error
+        return self
+
+    def close(self):
+        pass
+
+
+class TestReplicaSet(unittest.TestCase):
+    def test_round_robin_skips_ejected_replicas(self):
+        first, second = Replica("a", FakePool()), Replica("b", FakePool())
+        replicas = ReplicaSet([first, second], eject_seconds=60)
+
+        self.assertEqual({replicas.choose(), replicas.choose()}, {first, second})
+        with patch("builtins.print"):
+            replicas.eject(first, "down")
+        self.assertEqual([replicas.choose() for _ in range(3)], [second] * 3)
+        self.assertEqual(replicas.status()[0]["healthy"], False)
+
+    def test_least_latency(self):
+        slow, fast = Replica("slow", FakePool()), Replica("fast", FakePool())
+        replicas = ReplicaSet([slow, fast], selection="least_latency")
+        replicas.record_read(slow, 0.05)
+        replicas.record_read(fast, 0.01)
+
+        picks = [replicas.choose() for _ in range(32)]
+        self.assertGreater(picks.count(fast), 28)
+        # Occasional reads still measure the slow replica
+        self.assertIn(slow, picks)
+
+    def test_ejected_replica_is_checked_before_readmission(self):
+        pool = FakePool(error=OSError("refused"))
+        replica = Replica("a", pool)
+        replicas = ReplicaSet([replica], eject_seconds=0)
+
+        with patch("builtins.print"):
+            replicas.eject(replica, "down")
+            self.assertIsNone(replicas.choose())
+        self.assertEqual(replica.failures, 2)
+
+        pool.error = None
+        self.assertIs(replicas.choose(), replica)
+
+    def test_unknown_selection(self):
+        with self.assertRaises(ValueError):
+            ReplicaSet([], selection="random")
+
+
+class TestReplicaRouting(SQLiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.replica_path = os.path.join(os.path.dirname(self.db_path), "replica.db")
+        self.copy_to_replica()
+        # Only the replica knows this name, so reads show where they went
+        self.replica_query(
+            "UPDATE Author SET author_name = 'Replica' WHERE author_id = 1"
+        )
+
+        for name, value in [
+            ("SQLITE_REPLICA_PATHS", [self.replica_path]),
+            ("DB_REPLICA_STICKY_SECONDS", 60.0),
+        ]:
+            patcher = patch.object(config, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch.object(repository.query_cache, "enabled", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Forget writes made on this thread by earlier tests
+        token = repository._last_write.set(None)
+        self.addCleanup(repository._last_write.reset, token)
+        repository.close_pool()
+
+    def copy_to_replica(self):
+        source, target = sqlite3.connect(self.db_path), sqlite3.connect(
+            self.replica_path
+        )
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+
+    def replica_query(self, sql):
+        conn = sqlite3.connect(self.replica_path)
+        try:
+            conn.execute(sql)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def author_one(self):
+        return dict(repository.get_authors())[1]
+
+    def test_reads_go_to_the_replica_and_writes_to_the_primary(self):
+        self.assertEqual(self.author_one(), "Replica")
+        self.assertEqual(dict(repository.iter_authors())[1], "Replica")
+
+        result = repository.check_out_book_transaction(1, 1)
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(self.query("SELECT book_id FROM OpenLoan"), [(1,)])
+        self.assertEqual(repository.replica_status()[0]["reads"], 1)
+
+    def test_reads_after_a_write_stick_to_the_primary(self):
+        with repository.read_from_primary():
+            self.assertEqual(self.author_one(), "Jane Austen")
+
+        repository.check_out_book_transaction(1, 1)
+        self.assertEqual(self.author_one(), "Jane Austen")
+        with patch.object(config, "DB_REPLICA_STICKY_SECONDS", 0):
+            self.assertEqual(self.author_one(), "Replica")
+
+    def test_only_committed_writes_stick_to_the_primary(self):
+        self.assertEqual(
+            repository.check_out_book_transaction(1, 9999)["status"], "error"
+        )
+        self.assertEqual(repository.return_book_transaction(1, 1)["status"], "error")
+        self.assertEqual(self.author_one(), "Replica")
+
+        repository.check_out_book_transaction(1, 1)
+        self.assertEqual(self.author_one(), "Jane Austen")
+
+    def test_server_reads_after_a_write_follow_the_client(self):
+        server = LibraryServer(("127.0.0.1", 0), workers=2, request_timeout=2)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        def request(method, path, body=None, cookie=None):
+            # A new connection each time, so any worker may serve it
+            conn = http.client.HTTPConnection("127.0.0.1", server.server_port)
+            try:
+                headers = {"Cookie": cookie} if cookie else {}
+                conn.request(method, path, body and json.dumps(body), headers)
+                response = conn.getresponse()
+                return response, json.loads(response.read())
+            finally:
+                conn.close()
+
+        def holders(cookie=None):
+            _, patrons = request("GET", "/books/1/patrons", cookie=cookie)
+            return [patron["patron_id"] for patron in patrons]
+
+        checkout = {"patron_id": 1, "book_id": 1}
+        response, _ = request("POST", "/checkout", checkout)
+        cookie = response.getheader("Set-Cookie").split(";")[0]
+
+        # The writer reads its checkout; other clients still use the replica
+        for _ in range(server.workers):
+            self.assertEqual(holders(cookie), [1])
+            self.assertEqual(holders(), [])
+
+        # A rejected checkout commits nothing and sets no cookie
+        response, _ = request("POST", "/checkout", checkout)
+        self.assertEqual(response.status, 409)
+        self.assertIsNone(response.getheader("Set-Cookie"))
+
+    def test_async_reads_after_a_write_stick_to_the_primary(self):
+        self.addCleanup(aio_repository.shutdown)
+
+        async def author_one():
+            return dict(await aio_repository.get_authors())[1]
+
+        async def session():
+            names = [await author_one()]
+            with repository.read_from_primary():
+                names.append(await author_one())
+            await aio_repository.check_out_book_transaction(1, 1)
+            names.append(await author_one())
+            return names
+
+        self.assertEqual(
+            asyncio.run(session()), ["Replica", "Jane Austen", "Jane Austen"]
+        )
+        # The write was the task's; this thread's reads still use the replica
+        self.assertEqual(self.author_one(), "Replica")
+
+    def test_failed_replica_is_ejected_and_readmitted(self):
+        os.remove(self.replica_path)
+        # An empty database stands in for a replica that lost its data
+        sqlite3.connect(self.replica_path).close()
+
+        with patch("builtins.print"):
+            self.assertEqual(self.author_one(), "Jane Austen")
+        status = repository.replica_status()[0]
+        self.assertEqual((status["healthy"], status["failures"]), (False, 1))
+
+        # Restored, and due for its health check
+        self.copy_to_replica()
+        repository.get_replicas().replicas[0].ejected_until = 0.0
+        self.assertEqual(self.author_one(), "Jane Austen")
+        status = repository.replica_status()[0]
+        self.assertEqual((status["healthy"], status["reads"]), (True, 1))
@@ -0,0 +1,89 @@
+import datetime
+import importlib
+
+from library_app import reporting, repository
+from library_app.backends import get_backend
+from library_app.datagen import generate_catalog
+from tests.helpers import SQLiteTestCase
+
+
+class TestCirculationReports(SQLiteTestCase):
+    def summaries(self):
+        return [
+            self.query(f"SELECT * FROM {table} ORDER BY 1")
+            for table in reporting.SUMMARY_TABLES
+        ]
+
+    def rebuild(self, **kwargs):
+        conn = get_backend().connect()
+        try:
+            return reporting.rebuild_circulation_stats(conn, **kwargs)
+        finally:
+            conn.close()
+
+    def test_checkout_and_return_update_summaries(self):
+        repository.check_out_book_transaction(1, 3)
+        repository.return_book_transaction(1, 3)
+        repository.check_out_book_transaction(2, 3)
+        repository.check_out_books_bulk([(1, 1), (1, 2)])
+
+        self.assertEqual(
+            reporting.top_books(2),
+            [
+                (3, "Harry Potter and the Philosopher's Stone", "J.K. Rowling", 2),
+                (2, "Great Expectations", "Charles Dickens", 1),
+            ],
+        )
+        self.assertEqual(reporting.top_authors(1), [(3, "J.K. Rowling", 2)])
+        # SQLite's CURRENT_DATE is in UTC
+        today = datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+        self.assertEqual(reporting.daily_circulation(), [(today, 4, 1)])
+        self.assertEqual(reporting.daily_circulation(end="2000-01-01"), [])
+
+    def test_rebuild_matches_incremental_maintenance(self):
+        repository.check_out_books_bulk([(1, 1), (2, 2), (3, 3)])
+        repository.return_books_bulk([(1, 1), (3, 3)])
+        repository.check_out_book_transaction(2, 1)
+        before = self.summaries()
+
+        self.assertEqual(self.rebuild(batch_size=2), 4)
+        self.assertEqual(self.summaries(), before)
+
+    def test_rebuild_is_one_transaction(self):
+        repository.check_out_books_bulk([(1, 1), (2, 2), (3, 3)])
+        repository.return_books_bulk([(1, 1)])
+        before = self.summaries()
+        seen = []
+
+        def read_and_fail(loans):
+            # Another connection still reads the old totals
+            seen.append(self.summaries())
+            if len(seen) == 2:
+                raise RuntimeError("interrupted")
+
+        with self.assertRaises(RuntimeError):
+            self.rebuild(batch_size=1, progress=read_and_fail)
+        self.assertEqual(seen, [before, before])
+        # Nothing was cleared
+        self.assertEqual(self.summaries(), before)
+
+    def test_rebuild_matches_migration_backfill(self):
+        conn = get_backend().connect()
+        try:
+            generate_catalog(conn, 500, batch_size=100)
+            migration = importlib.import_module(
+                "library_app.migrations.0006_circulation_stats"
+            )
+            migration.up(conn.cursor(), get_backend())
+            conn.commit()
+        finally:
+            conn.close()
+        backfilled = self.summaries()
+
+        progress = []
+        self.assertEqual(self.rebuild(batch_size=100, progress=progress.append), 265)
+        self.assertEqual(progress, [100, 200, 265])
+        self.assertEqual(self.summaries(), backfilled)
+        self.assertEqual(
+            self.query("SELECT SUM(checked_out) FROM BookCirculation"), [(265,)]
+        )
@@ -1,10 +1,23 @@
+import itertools
 import unittest
 from unittest.mock import MagicMock, patch
+
+import mysql.connector
 from library_app import repository
 
 
 class TestRepository(unittest.TestCase):
-    @patch("library_app.repository.mysql.connector.connect")
+    def setUp(self):
+        # Each test patches connect(), so never reuse a pooled connection
+        # or a cached result.
+        repository.close_pool()
+        repository.query_cache.clear()
+
+    def tearDown(self):
+        repository.close_pool()
+        repository.query_cache.clear()
+
+    @patch("library_app.backends.mysql.connector.connect")
     def test_get_authors(self, mock_connect):
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
@@ -16,10 +29,10 @@ class TestRepository(unittest.TestCase):
 
         self.assertEqual(authors, [(1, "Jane Austen")])
         mock_cursor.execute.assert_called_with(
-            "SELECT author_id, author_name FROM Author"
+            "SELECT author_id, author_name FROM Author", ()
         )
 
-    @patch("library_app.repository.mysql.connector.connect")
+    @patch("library_app.backends.mysql.connector.connect")
     def test_get_available_books(self, mock_connect):
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
@@ -31,10 +44,10 @@ class TestRepository(unittest.TestCase):
 
         self.assertEqual(books, [(1, "Pride and Prejudice")])
         mock_cursor.execute.assert_called_with(
-            "SELECT book_id, book_title FROM Book WHERE is_checked < 1"
+            "SELECT book_id, book_title FROM Book WHERE is_checked < 1", ()
         )
 
-    @patch("library_app.repository.mysql.connector.connect")
+    @patch("library_app.backends.mysql.connector.connect")
     def test_search_books_by_author(self, mock_connect):
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
@@ -53,47 +66,114 @@ class TestRepository(unittest.TestCase):
         self.assertIn("WHERE Book.author_id = %s", args[0])
         self.assertEqual(args[1], (1,))
 
-    @patch("library_app.repository.mysql.connector.connect")
+    @patch("library_app.backends.mysql.connector.connect")
     def test_check_out_book_transaction_success(self, mock_connect):
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         mock_connect.return_value = mock_conn
         mock_conn.cursor.return_value = mock_cursor
 
-        # Mock finding the book, available (is_checked=0)
-        mock_cursor.fetchone.return_value = ("Book Title", 0)
+        # The conditional update reserves the book (is_checked was 0)
+        mock_cursor.rowcount = 1
 
         result = repository.check_out_book_transaction(1, 1)
 
         self.assertEqual(result["status"], "success")
         self.assertTrue(mock_conn.commit.called)
+        args, _ = mock_cursor.execute.call_args_list[0]
+        self.assertIn("WHERE book_id = %s AND is_checked = 0", args[0])
 
-    @patch("library_app.repository.mysql.connector.connect")
+    @patch("library_app.backends.mysql.connector.connect")
     def test_check_out_book_transaction_fail_checked_out(self, mock_connect):
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         mock_connect.return_value = mock_conn
         mock_conn.cursor.return_value = mock_cursor
 
-        # Mock finding the book, already checked out (is_checked=1)
-        mock_cursor.fetchone.return_value = ("Book Title", 1)
+        # The conditional update matches nothing: already checked out
+        mock_cursor.rowcount = 0
+        mock_cursor.fetchall.return_value = [("Book Title",)]
 
         result = repository.check_out_book_transaction(1, 1)
 
         self.assertEqual(result["status"], "error")
+        self.assertEqual(result["message"], "Book Title is not available for checkout.")
         self.assertFalse(mock_conn.commit.called)
 
-    @patch("library_app.repository.mysql.connector.connect")
+    @patch("library_app.backends.mysql.connector.connect")
     def test_return_book_transaction_success(self, mock_connect):
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         mock_connect.return_value = mock_conn
         mock_conn.cursor.return_value = mock_cursor
 
-        # Mock finding the transaction (Book Title, patron_id, is_checked)
-        mock_cursor.fetchone.return_value = ("Book Title", 1, 1)
+        # Mock finding the transaction and flipping is_checked back to 0
+        mock_cursor.fetchall.return_value = [("Book Title",)]
+        mock_cursor.rowcount = 1
 
         result = repository.return_book_transaction(1, 1)
 
         self.assertEqual(result["status"], "success")
         self.assertTrue(mock_conn.commit.called)
+
+    @patch("library_app.backends.mysql.connector.connect")
+    def test_return_book_transaction_already_available(self, mock_connect):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [("Book Title",)]
+        mock_cursor.rowcount = 0
+
+        result = repository.return_book_transaction(1, 1)
+
+        self.assertEqual(result["message"], "Book is already available.")
+        self.assertFalse(mock_conn.commit.called)
+
+    @patch("library_app.repository.time.sleep")
+    @patch("library_app.backends.mysql.connector.connect")
+    def test_check_out_retries_on_deadlock(self, mock_connect, mock_sleep):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.rowcount = 1
+        deadlock = mysql.connector.errors.InternalError(errno=1213)
+        # Only the first statement deadlocks
+        mock_cursor.execute.side_effect = itertools.chain(
+            [deadlock], itertools.repeat(None)
+        )
+
+        result = repository.check_out_book_transaction(1, 1)
+
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(mock_sleep.call_count, 1)
+        self.assertEqual(mock_conn.commit.call_count, 1)
+
+    @patch("library_app.backends.mysql.connector.connect")
+    def test_check_out_does_not_retry_other_errors(self, mock_connect):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.execute.side_effect = mysql.connector.errors.ProgrammingError(
+            msg="bad", errno=1064
+        )
+
+        result = repository.check_out_book_transaction(1, 1)
+
+        self.assertEqual(result["status"], "error")
+        self.assertEqual(mock_cursor.execute.call_count, 1)
+
+    @patch("library_app.backends.mysql.connector.connect")
+    def test_connections_are_reused_from_pool(self, mock_connect):
+        mock_conn = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value.fetchall.return_value = []
+
+        repository.get_authors()
+        repository.get_patrons()
+
+        mock_connect.assert_called_once()
+        self.assertTrue(mock_conn.rollback.called)
+        self.assertFalse(mock_conn.close.called)
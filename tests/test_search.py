@@ -0,0 +1,51 @@
+from library_app import repository
+from tests.helpers import SQLiteTestCase
+
+
+class TestBookSearch(SQLiteTestCase):
+    def test_matches_title_and_author_prefixes(self):
+        self.assertEqual(
+            repository.search_books("prid aust"),
+            [(1, "Pride and Prejudice", "Jane Austen", 1813, 10)],
+        )
+        self.assertEqual(
+            [row[1] for row in repository.search_books("TWAIN")],
+            ["The Adventures of Tom Sawyer"],
+        )
+
+    def test_results_are_ranked_by_relevance(self):
+        self.query(
+            "INSERT INTO Book (book_title, publish_year, times_checked_out, is_checked, author_id) "
+            "VALUES ('A Note on Romeo', 2001, 0, 0, 1)"
+        )
+        self.query(
+            "INSERT INTO Book (book_title, publish_year, times_checked_out, is_checked, author_id) "
+            "VALUES ('Romeo Romeo Romeo', 2002, 0, 0, 1)"
+        )
+
+        titles = [row[1] for row in repository.search_books("romeo", limit=2)]
+
+        self.assertEqual(titles[0], "Romeo Romeo Romeo")
+        self.assertEqual(len(titles), 2)
+
+    def test_index_follows_catalog_writes(self):
+        self.query(
+            "UPDATE Author SET author_name = 'Samuel Clemens' WHERE author_id = 4"
+        )
+        self.query(
+            "UPDATE Book SET book_title = 'Great Expectations Revisited' WHERE book_id = 2"
+        )
+
+        self.assertEqual([row[0] for row in repository.search_books("clemens")], [4])
+        self.assertEqual([row[0] for row in repository.search_books("revisit")], [2])
+        self.assertEqual(repository.search_books("twain"), [])
+
+    def test_operators_in_query_are_ignored(self):
+        self.assertEqual(repository.search_books('"'), [])
+        self.assertEqual(len(repository.search_books('harry* "potter')), 1)
+
+    def test_checkout_refreshes_cached_results(self):
+        repository.search_books("pride")
+        repository.check_out_book_transaction(1, 1)
+
+        self.assertEqual(repository.search_books("pride")[0][4], 11)
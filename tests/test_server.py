@@ -0,0 +1,178 @@
+import http.client
+import json
+import socket
+import sqlite3
+import threading
+import time
+from unittest.mock import patch
+
+from library_app import config, metrics, repository, statements
+from library_app.server import LibraryServer
+from tests.helpers import SQLiteTestCase
+
+
+class TestServer(SQLiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = LibraryServer(("127.0.0.1", 0), workers=2, request_timeout=2)
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        # One keep-alive connection carries every request in a test
+        self.conn = http.client.HTTPConnection("127.0.0.1", self.server.server_port)
+        self.addCleanup(self.conn.close)
+
+    def request(self, method, path, body=None):
+        payload = None if body is None else json.dumps(body)
+        self.conn.request(method, path, payload)
+        response = self.conn.getresponse()
+        return response.status, json.loads(response.read())
+
+    def test_lists_and_searches_books(self):
+        status, books = self.request("GET", "/books?limit=2")
+        self.assertEqual(status, 200)
+        self.assertEqual(len(books), 2)
+        self.assertEqual(set(books[0]), {"book_id", "book_title"})
+
+        status, results = self.request("GET", "/books/search?q=pride")
+        self.assertEqual(status, 200)
+        self.assertEqual(results[0]["book_title"], "Pride and Prejudice")
+
+        status, books = self.request("GET", "/authors/1/books")
+        self.assertEqual(status, 200)
+        self.assertTrue(all(book["author_name"] == "Jane Austen" for book in books))
+
+    def test_checkout_and_return(self):
+        status, result = self.request(
+            "POST", "/checkout", {"patron_id": 1, "book_id": 1}
+        )
+        self.assertEqual((status, result["status"]), (200, "success"))
+
+        status, result = self.request(
+            "POST", "/checkout", {"patron_id": 2, "book_id": 1}
+        )
+        self.assertEqual((status, result["status"]), (409, "error"))
+
+        status, patrons = self.request("GET", "/books/1/patrons")
+        self.assertIn(1, [patron["patron_id"] for patron in patrons])
+
+        status, borrowed = self.request("GET", "/books/borrowed")
+        self.assertEqual([book["book_id"] for book in borrowed], [1])
+        status, borrowed = self.request("GET", "/patrons/1/books")
+        self.assertEqual([book["book_id"] for book in borrowed], [1])
+        status, history = self.request("GET", "/patrons/1/history?limit=1")
+        self.assertEqual((history[0]["book_id"], history[0]["date_return"]), (1, None))
+
+        status, result = self.request("POST", "/return", {"patron_id": 1, "book_id": 1})
+        self.assertEqual((status, result["status"]), (200, "success"))
+
+    def test_idle_keep_alive_connections_do_not_hold_workers(self):
+        # As many idle keep-alive clients as there are workers
+        idle = []
+        for _ in range(self.server.workers):
+            conn = http.client.HTTPConnection("127.0.0.1", self.server.server_port)
+            self.addCleanup(conn.close)
+            conn.request("GET", "/books?limit=1")
+            conn.getresponse().read()
+            idle.append(conn)
+
+        start = time.monotonic()
+        status, _ = self.request("GET", "/books?limit=1")
+        self.assertEqual(status, 200)
+        self.assertLess(time.monotonic() - start, 1)
+
+        # The parked connections still serve their next request
+        idle[0].request("GET", "/books?limit=1")
+        self.assertEqual(idle[0].getresponse().status, 200)
+
+    def test_pipelined_requests_are_all_answered(self):
+        sock = socket.create_connection(("127.0.0.1", self.server.server_port))
+        self.addCleanup(sock.close)
+        request = b"GET /health HTTP/1.1\r\nHost: test\r\n\r\n"
+        sock.sendall(request * 3)
+        sock.settimeout(2)
+        received = b""
+        while received.count(b"HTTP/1.1 200") < 3:
+            received += sock.recv(4096)
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.request("GET", "/nowhere")[0], 404)
+        self.assertEqual(self.request("GET", "/books?limit=abc")[0], 400)
+        self.assertEqual(self.request("POST", "/checkout", {"book_id": 1})[0], 400)
+
+        self.conn.request("POST", "/checkout", "not json")
+        response = self.conn.getresponse()
+        response.read()
+        self.assertEqual(response.status, 400)
+
+        for path in (
+            "/books/search?q=pride&limit=-1",
+            "/books/search?q=pride&limit=1001",
+            "/patrons/1/history?limit=0",
+            "/patrons/1/history?limit=100000",
+        ):
+            self.assertEqual(self.request("GET", path)[0], 400, path)
+        self.assertEqual(self.request("GET", "/books/search?q=pride&limit=1")[0], 200)
+
+        self.conn.putrequest("POST", "/checkout")
+        self.conn.putheader("Content-Length", "lots")
+        self.conn.endheaders()
+        response = self.conn.getresponse()
+        self.assertEqual(response.status, 400)
+        self.assertIn("Content-Length", json.loads(response.read())["message"])
+
+    def test_database_failures_are_errors_not_conflicts_or_empty_lists(self):
+        with patch.object(repository, "get_connection", return_value=None):
+            self.assertEqual(self.request("GET", "/patrons?limit=3")[0], 503)
+            status, result = self.request(
+                "POST", "/checkout", {"patron_id": 1, "book_id": 1}
+            )
+            self.assertEqual((status, result["status"]), (503, "error"))
+
+        failing = patch.object(
+            statements, "execute", side_effect=sqlite3.OperationalError("disk I/O")
+        )
+        with failing:
+            status, result = self.request("GET", "/patrons?limit=4")
+            self.assertEqual(status, 500)
+            self.assertIn("disk I/O", result["message"])
+            status, result = self.request(
+                "POST", "/checkout", {"patron_id": 1, "book_id": 1}
+            )
+            self.assertEqual((status, result["status"]), (500, "error"))
+
+        # The failures were not cached as empty pages
+        status, patrons = self.request("GET", "/patrons?limit=3")
+        self.assertEqual((status, len(patrons)), (200, 3))
+
+    def test_rejects_bodies_over_the_limit(self):
+        with patch.object(config, "SERVE_MAX_BODY_BYTES", 16):
+            self.conn.request(
+                "POST", "/checkout", json.dumps({"patron_id": 1, "book_id": 1})
+            )
+            response = self.conn.getresponse()
+            response.read()
+        self.assertEqual(response.status, 413)
+
+    def test_metrics(self):
+        with patch.object(config, "DB_METRICS_ENABLED", True):
+            metrics.reset()
+            self.addCleanup(metrics.reset)
+            self.request("GET", "/books")
+
+            status, snapshot = self.request("GET", "/metrics.json")
+            self.assertEqual(
+                snapshot["functions"]["get_available_books_page"]["calls"], 1
+            )
+
+            self.conn.request("GET", "/metrics")
+            response = self.conn.getresponse()
+            self.assertEqual(
+                response.getheader("Content-Type").split(";")[0], "text/plain"
+            )
+            self.assertIn(
+                'library_repository_calls_total{function="get_available_books_page"} 1',
+                response.read().decode(),
+            )
@@ -0,0 +1,100 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import mysql.connector
+from library_app import config, repository, statements
+from library_app.backends import BACKENDS
+from tests.helpers import SQLiteTestCase
+
+
+class TestStatementRegistry(unittest.TestCase):
+    def test_every_statement_resolves_on_every_backend(self):
+        for backend in BACKENDS:
+            for name, sql in statements.STATEMENTS.items():
+                count = 3 if "{ids}" in str(sql) else None
+                table = "LoanArchive_202401" if "{table}" in str(sql) else None
+                resolved = statements.statement_sql(name, backend, count, table)
+                self.assertNotIn("{ids}", resolved)
+                self.assertNotIn("{table}", resolved)
+                # The same object every time, so drivers can reuse preparation
+                self.assertIs(
+                    resolved, statements.statement_sql(name, backend, count, table)
+                )
+
+    def test_id_lists_expand_to_one_placeholder_per_id(self):
+        sql = statements.statement_sql("books_by_ids", "mysql", 3)
+        self.assertIn("IN (%s, %s, %s)", sql)
+
+
+class TestPreparedStatements(SQLiteTestCase):
+    def setUp(self):
+        super().setUp()
+        statements.reset_stats()
+        self.addCleanup(statements.reset_stats)
+        patcher = patch.object(repository.query_cache, "enabled", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_prepared_once_per_connection(self):
+        for _ in range(3):
+            repository.get_patrons_with_book(1)
+
+        self.assertEqual(
+            repository.statement_stats()["patrons_with_book"],
+            {"prepares": 1, "executes": 3, "fallbacks": 0},
+        )
+
+    def test_disabled_prepares_nothing(self):
+        with patch.object(config, "DB_PREPARED_STATEMENTS", False):
+            repository.close_pool()
+            repository.get_patrons_with_book(1)
+            repository.get_patrons_with_book(1)
+
+        self.assertEqual(statements.stats()["total"]["prepares"], 0)
+        self.assertEqual(statements.stats()["total"]["executes"], 2)
+
+
+class TestMySQLPreparedStatements(unittest.TestCase):
+    def setUp(self):
+        repository.close_pool()
+        repository.query_cache.clear()
+        statements.reset_stats()
+        self.addCleanup(repository.close_pool)
+        self.addCleanup(repository.query_cache.clear)
+        self.addCleanup(statements.reset_stats)
+        self.addCleanup(statements._unpreparable.clear)
+
+    @patch("library_app.backends.mysql.connector.connect")
+    def test_reuses_one_prepared_cursor_per_statement(self, mock_connect):
+        mock_conn = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value.fetchall.return_value = []
+
+        repository.search_books_by_author(1)
+        repository.search_books_by_author(2)
+
+        mock_conn.cursor.assert_called_once_with(prepared=True)
+        self.assertEqual(mock_conn.cursor.return_value.execute.call_count, 2)
+
+    @patch("library_app.backends.mysql.connector.connect")
+    def test_falls_back_when_the_server_cannot_prepare(self, mock_connect):
+        mock_conn = MagicMock()
+        prepared, plain = MagicMock(), MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.side_effect = lambda **kwargs: (
+            prepared if kwargs.get("prepared") else plain
+        )
+        prepared.execute.side_effect = mysql.connector.errors.ProgrammingError(
+            msg="not supported", errno=1295
+        )
+        plain.fetchall.return_value = [(1, "Jane Austen")]
+
+        self.assertEqual(repository.get_authors_page(), [(1, "Jane Austen")])
+        repository.query_cache.clear()
+        self.assertEqual(repository.get_authors_page(), [(1, "Jane Austen")])
+
+        self.assertEqual(prepared.execute.call_count, 1)
+        self.assertEqual(
+            statements.stats()["authors_page"],
+            {"prepares": 0, "executes": 2, "fallbacks": 2},
+        )
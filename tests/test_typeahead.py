@@ -0,0 +1,114 @@
+import threading
+import unittest
+from unittest.mock import patch
+
+from library_app import config, typeahead
+from library_app.backends import get_backend
+from library_app.catalog import changes_since, compact_changes
+from library_app.typeahead import NameIndex, find_authors, find_patrons
+from tests.helpers import SQLiteTestCase
+
+
+class TestNameIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = NameIndex(
+            [
+                (1, "Jane Austen"),
+                (2, "Zoë Ångström"),
+                (3, "Austin Reed"),
+                (4, "Charles Dickens"),
+                (5, None),
+            ]
+        )
+
+    def test_matches_any_word_ignoring_case_and_accents(self):
+        self.assertEqual(
+            self.index.find("aus", 10), [(1, "Jane Austen"), (3, "Austin Reed")]
+        )
+        self.assertEqual(self.index.find("  JANE   a", 10), [(1, "Jane Austen")])
+        self.assertEqual(self.index.find("zoe ang", 10), [(2, "Zoë Ångström")])
+        self.assertEqual(self.index.find("ÅNG", 10), [(2, "Zoë Ångström")])
+        self.assertEqual(self.index.find("aus", 1), [(1, "Jane Austen")])
+        self.assertEqual(self.index.find("", 10), [])
+        self.assertEqual(self.index.find("dickensian", 10), [])
+        self.assertEqual(len(self.index), 4)
+
+    def test_incremental_updates(self):
+        self.index.set(6, "Jane Eyre")
+        self.index.set(1, "Jane Smith")
+        self.assertEqual(
+            self.index.find("jane", 10), [(6, "Jane Eyre"), (1, "Jane Smith")]
+        )
+        self.assertEqual(self.index.find("aus", 10), [(3, "Austin Reed")])
+
+        self.index.remove(6)
+        self.index.set(3, None)
+        self.index.remove(99)
+        self.assertEqual(self.index.find("j", 10), [(1, "Jane Smith")])
+        self.assertEqual(self.index.find("aus", 10), [])
+        self.assertEqual(len(self.index), 3)
+
+    def test_names_sharing_a_suffix(self):
+        index = NameIndex([(1, "Ann Lee"), (2, "Bo Lee"), (3, "Lee")])
+        index.remove(2)
+        self.assertCountEqual(index.find("lee", 10), [(3, "Lee"), (1, "Ann Lee")])
+
+
+class TestFindNames(SQLiteTestCase):
+    def setUp(self):
+        super().setUp()
+        typeahead.reset()
+        self.addCleanup(typeahead.reset)
+
+    def test_finds_and_follows_catalog_writes(self):
+        self.assertEqual(find_authors("dick"), [(2, "Charles Dickens")])
+        self.assertEqual(find_patrons("bob", 5), [(2, "Bob Johnson")])
+
+        self.query("UPDATE Patron SET patron_name = 'Bob Smith' WHERE patron_id = 2")
+        self.query("INSERT INTO Author (author_name) VALUES ('Émile Zola')")
+        # Within TYPEAHEAD_REFRESH_SECONDS the loaded index answers
+        self.assertEqual(find_authors("emile"), [])
+
+        with patch.object(config, "TYPEAHEAD_REFRESH_SECONDS", 0):
+            self.assertEqual(find_patrons("bob smi"), [(2, "Bob Smith")])
+            self.assertEqual(find_authors("emile"), [(6, "Émile Zola")])
+            self.query("DELETE FROM Author WHERE author_id = 6")
+            self.assertEqual(find_authors("zola"), [])
+
+    def test_reloads_after_the_change_log_is_compacted(self):
+        self.assertEqual(find_patrons("bob"), [(2, "Bob Johnson")])
+        self.query("UPDATE Patron SET patron_name = 'Bob Smith' WHERE patron_id = 2")
+        self.query("UPDATE Author SET author_name = 'C. Dickens' WHERE author_id = 2")
+        # Only the author's change is left
+        conn = get_backend().connect()
+        try:
+            compact_changes(conn, keep=1)
+        finally:
+            conn.close()
+
+        with patch.object(config, "TYPEAHEAD_REFRESH_SECONDS", 0):
+            self.assertEqual(find_patrons("bob smi"), [(2, "Bob Smith")])
+            self.assertEqual(find_authors("c. d"), [(2, "C. Dickens")])
+
+    def test_lookups_do_not_wait_for_a_refresh(self):
+        self.assertEqual(find_patrons("bob"), [(2, "Bob Johnson")])
+        self.query("UPDATE Patron SET patron_name = 'Bob Smith' WHERE patron_id = 2")
+        reading = threading.Event()
+        release = threading.Event()
+
+        def slow_changes(*args):
+            reading.set()
+            release.wait(5)
+            return changes_since(*args)
+
+        with patch.object(config, "TYPEAHEAD_REFRESH_SECONDS", 0), patch.object(
+            typeahead, "changes_since", slow_changes
+        ):
+            refresh = threading.Thread(target=find_patrons, args=("bob",))
+            refresh.start()
+            self.assertTrue(reading.wait(5))
+            # Served from the current index while the refresh reads changes
+            self.assertEqual(find_patrons("bob"), [(2, "Bob Johnson")])
+            release.set()
+            refresh.join()
+            self.assertEqual(find_patrons("bob smi"), [(2, "Bob Smith")])